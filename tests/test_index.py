@@ -0,0 +1,94 @@
+import json
+import os
+import sys
+from array import array
+
+import pytest
+
+from vibot import index
+from vibot.index import (
+    HEADER_LENGTH, INDEX_MAGIC, SearchIndex, contains_trigrams, decode_index, encode_index,
+    extract_trigrams, keyword_trigrams, normalize_content,
+)
+
+ROOT = '/project'
+
+
+def sample_files():
+    return {
+        '/project/a.py': (12, 1000, extract_trigrams(b'import os\n')),
+        '/project/empty.txt': (0, 2000, array('I')),
+        '/project/b.py': (30, 3000, extract_trigrams(normalize_content(b'print("Hello")\n'))),
+    }
+
+
+def rewrite_header(data, **changes):
+    header_length, = HEADER_LENGTH.unpack_from(data, len(INDEX_MAGIC))
+    start = len(INDEX_MAGIC) + HEADER_LENGTH.size
+    header = json.loads(data[start:start + header_length].decode('utf-8'))
+    header.update(changes)
+    encoded = json.dumps(header).encode('utf-8')
+    return INDEX_MAGIC + HEADER_LENGTH.pack(len(encoded)) + encoded + data[start + header_length:]
+
+
+def test_encode_decode_round_trip():
+    files = sample_files()
+    assert decode_index(encode_index(ROOT, files), ROOT) == files
+
+
+@pytest.mark.parametrize('changes', [
+    {'version': index.INDEX_VERSION + 1},
+    {'root': '/elsewhere'},
+    {'byteorder': 'big' if sys.byteorder == 'little' else 'little'},
+    {'itemsize': 8},
+])
+def test_foreign_index_is_rejected(changes):
+    data = rewrite_header(encode_index(ROOT, sample_files()), **changes)
+    with pytest.raises(ValueError):
+        decode_index(data, ROOT)
+
+
+def test_truncated_index_is_rejected():
+    data = encode_index(ROOT, sample_files())
+    with pytest.raises(ValueError):
+        decode_index(data[:-4], ROOT)
+    with pytest.raises(ValueError):
+        decode_index(data[:-1], ROOT)
+    with pytest.raises(ValueError):
+        decode_index(b'not an index', ROOT)
+
+
+@pytest.mark.parametrize('content, keyword', [
+    (b'def Hello_World():\n', 'hello_world'),
+    ('Straße = 1\n'.encode('utf-8'), 'STRASSE'),
+    ('İstanbul\n'.encode('utf-8'), 'istanbul'),
+])
+def test_keyword_trigrams_are_found_in_matching_content(content, keyword):
+    file_trigrams = extract_trigrams(normalize_content(content))
+    assert contains_trigrams(file_trigrams, keyword_trigrams(keyword))
+
+
+def test_keyword_trigrams_rule_out_other_content():
+    file_trigrams = extract_trigrams(normalize_content(b'nothing to see\n'))
+    assert not contains_trigrams(file_trigrams, keyword_trigrams('needle'))
+
+
+def test_foreign_index_file_is_rebuilt(tmp_path):
+    root = tmp_path / 'src'
+    root.mkdir()
+    (root / 'a.txt').write_text('needle\n')
+    cache_dir = str(tmp_path / 'cache')
+    
+    search_index = SearchIndex(str(root), cache_dir)
+    assert search_index.select(os.scandir(str(root)), ['needle']) == [str(root / 'a.txt')]
+    
+    # An index written on a machine of the other byte order is read as stale
+    with open(search_index.index_path, 'rb') as f:
+        data = f.read()
+    with open(search_index.index_path, 'wb') as f:
+        f.write(rewrite_header(data, byteorder='big' if sys.byteorder == 'little' else 'little'))
+    
+    search_index = SearchIndex(str(root), cache_dir)
+    assert search_index.files == {}
+    assert search_index.select(os.scandir(str(root)), ['needle']) == [str(root / 'a.txt')]
+    assert search_index.indexed == 1
\ No newline at end of file
@@ -0,0 +1,98 @@
+import re
+
+import pytest
+
+from vibot.commands.search import compile_byte_pattern, compile_search_pattern, search_file
+
+
+def find_all(pattern, text):
+    return [match.group() for match in pattern.finditer(text)]
+
+
+def test_literal_keywords_prefer_the_longest():
+    pattern = compile_search_pattern(['foo', 'foobar'])
+    assert find_all(pattern, 'foobar foo') == ['foobar', 'foo']
+
+
+@pytest.mark.parametrize('keywords, expected', [
+    (['(?i)abc'], ['ABC', 'abc']),
+    (['(?i)abc', 'def'], ['ABC', 'abc', 'def']),
+    (['def', '(?i)(?s)abc'], ['ABC', 'abc', 'def']),
+    (['(?x) a b c  # letters'], ['abc']),
+])
+def test_regex_keywords_keep_leading_inline_flags(keywords, expected):
+    pattern = compile_search_pattern(keywords, regex=True)
+    assert find_all(pattern, 'ABC abc def DEF') == expected
+
+
+def test_inline_flags_apply_to_their_own_keyword_only():
+    pattern = compile_search_pattern(['(?i)abc', 'def'], regex=True)
+    assert find_all(pattern, 'DEF def') == ['def']
+
+
+def test_inline_flags_with_word_match():
+    pattern = compile_search_pattern(['(?i)abc'], regex=True, word=True)
+    assert find_all(pattern, 'xABC ABC') == ['ABC']
+
+
+def test_ascii_flag_applies_to_the_whole_pattern():
+    pattern = compile_search_pattern(['(?a)\\w+', '(?u)x'], regex=True)
+    assert find_all(pattern, 'café') == ['caf']
+
+
+def test_invalid_combination_reports_an_error(capsys):
+    assert compile_search_pattern(['(?P<name>a)', '(?P<name>b)'], regex=True) is None
+    assert "Error: Invalid regular expression '(?P<name>a)', '(?P<name>b)'" in capsys.readouterr().out
+
+
+def test_invalid_keyword_reports_an_error(capsys):
+    assert compile_search_pattern(['(unclosed'], regex=True) is None
+    assert "Error: Invalid regular expression '(unclosed'" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize('keyword', ['caf\\u00e9', '\\N{LATIN SMALL LETTER E WITH ACUTE}', '(?u)caf.'])
+def test_text_only_syntax_has_no_byte_pattern(keyword):
+    assert compile_byte_pattern(re.compile(keyword)) is None
+
+
+def test_non_ascii_keyword_has_no_byte_pattern():
+    assert compile_byte_pattern(compile_search_pattern(['café'])) is None
+
+
+def test_ascii_keyword_has_byte_pattern():
+    byte_pattern = compile_byte_pattern(compile_search_pattern(['abc'], ignore_case=True))
+    assert byte_pattern.search(b'xx ABC')
+
+
+@pytest.mark.parametrize('keyword', ['caf\\u00e9', '(?u)caf.'])
+def test_search_with_text_only_syntax(tmp_path, keyword):
+    file_path = tmp_path / 'menu.txt'
+    file_path.write_bytes('tea\ncafé\n'.encode('utf-8'))
+    pattern = compile_search_pattern([keyword], regex=True)
+    _, records, error = search_file(str(file_path), pattern, compile_byte_pattern(pattern))
+    assert error is None
+    assert records == [(2, 'café', [(0, 4)])]
+
+
+def test_byte_pre_check_rules_out_ascii_files(tmp_path):
+    file_path = tmp_path / 'plain.txt'
+    file_path.write_bytes(b'nothing here\n')
+    pattern = compile_search_pattern(['abc'])
+    assert search_file(str(file_path), pattern, compile_byte_pattern(pattern)) == (str(file_path), [], None)
+
+
+@pytest.mark.parametrize('keyword, content, expected', [
+    ('b+', 'a\nbb b\nb\n', [(2, 'bb b', [(0, 2), (3, 4)])]),
+    ('^$', 'a\n\nb\n', [(2, '', [(0, 0)])]),
+    ('^$', 'a\n', []),
+    ('x', 'a\nx', [(2, 'x', [(0, 1)])]),
+    ('a\nb', 'a\nb\nb\n', []),
+])
+def test_first_match_only(tmp_path, keyword, content, expected):
+    file_path = tmp_path / 'lines.txt'
+    file_path.write_bytes(content.encode('utf-8'))
+    pattern = compile_search_pattern([keyword], regex=True)
+    byte_pattern = compile_byte_pattern(pattern)
+    _, records, _ = search_file(str(file_path), pattern, byte_pattern, max_count=1)
+    _, all_records, _ = search_file(str(file_path), pattern, byte_pattern)
+    assert records == expected == all_records[:1]
\ No newline at end of file
@@ -0,0 +1,86 @@
+import pytest
+
+from vibot.commands import multi, ustalony
+
+
+@pytest.mark.parametrize('line', [
+    'password = "hunter2hunter"',
+    'DB_PASSWORD = "hunter2hunter"',
+    'db_password = "hunter22"',
+    'MYSQL_PWD="s3cretpass"',
+    'api_token = "tok_1234"',
+    'config["client_secret"] = "abcd1234"',
+    "API_KEY: 'abcd1234'",
+])
+def test_hardcoded_credential_matches_prefixed_names(line):
+    candidates = ustalony.scan_for_secrets(line + '\n')
+    assert [candidate['issue_type'] for candidate in candidates] == ['Hardcoded Credential']
+
+
+@pytest.mark.parametrize('line', [
+    'password = os.getenv("DB_PASSWORD")',
+    'token_count = 3',
+    'username = "admin_user"',
+])
+def test_hardcoded_credential_ignores_non_literals(line):
+    assert ustalony.scan_for_secrets(line + '\n') == []
+
+
+def make_item(tmp_path, content):
+    file_path = tmp_path / 'settings.py'
+    file_path.write_text(content)
+    return str(file_path), 'settings.py', content
+
+
+def test_file_without_candidates_still_goes_to_ai(tmp_path):
+    item = make_item(tmp_path, 'SETTING = load_value("name")\n')
+    plan = ustalony.plan_secrets_file(item, 'key', 'proxy', 'model', candidates=[])
+    assert len(plan.tasks) == 1
+
+
+def test_clean_file_dropped_by_scan_is_read_again(tmp_path):
+    file_path, relative_path, _ = make_item(tmp_path, 'SETTING = load_value("name")\n')
+    plan = ustalony.plan_secrets_file((file_path, relative_path, None), 'key', 'proxy', 'model', candidates=[])
+    assert len(plan.tasks) == 1
+
+
+def test_offline_reports_candidates_without_ai(tmp_path):
+    item = make_item(tmp_path, 'DB_PASSWORD = "hunter2hunter"\n')
+    plan = ustalony.plan_secrets_file(item, None, None, 'model', offline=True)
+    assert plan.tasks == []
+    result = plan.run()
+    assert result['has_issues'] and result['issues'][0]['line_number'] == 1
+
+
+def test_offline_clean_file_needs_no_ai(tmp_path):
+    item = make_item(tmp_path, 'SETTING = load_value("name")\n')
+    plan = ustalony.plan_secrets_file(item, None, None, 'model', offline=True)
+    assert plan.tasks == []
+    assert not plan.run()['has_issues']
+
+
+@pytest.fixture
+def no_ai(monkeypatch):
+    monkeypatch.setattr(multi, 'OPENAI_AVAILABLE', False)
+    monkeypatch.delenv('VIBOT_API_KEY', raising=False)
+    monkeypatch.delenv('VIBOT_API_PROXY', raising=False)
+
+    def refuse_install(*args, **kwargs):
+        raise AssertionError("tried to install openai")
+
+    monkeypatch.setattr(multi.subprocess, 'check_call', refuse_install)
+
+
+def test_offline_secret_check_runs_without_openai_or_api(tmp_path, capsys, no_ai):
+    make_item(tmp_path, 'DB_PASSWORD = "hunter2hunter"\n')
+    multi.analyze_all_in_directory(str(tmp_path), checks='ustalony', offline=True)
+    output = capsys.readouterr().out
+    assert 'Hardcoded Credential' in output
+    assert 'configuration missing' not in output
+
+
+def test_offline_with_other_checks_still_needs_api(tmp_path, capsys, no_ai, monkeypatch):
+    monkeypatch.setattr(multi, 'OPENAI_AVAILABLE', True)
+    make_item(tmp_path, 'DB_PASSWORD = "hunter2hunter"\n')
+    multi.analyze_all_in_directory(str(tmp_path), checks='ustalony,name', offline=True)
+    assert 'configuration missing' in capsys.readouterr().out
\ No newline at end of file
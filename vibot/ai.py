@@ -0,0 +1,570 @@
+#!/usr/bin/env python3
+"""vibot shared AI analysis engine"""
+
+import os
+import json
+import threading
+from functools import partial
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from .utils import should_skip_file, read_text_file
+from .discovery import iter_file_entries
+from .chunking import split_into_chunks
+from .cache import HashedText, hash_content
+from .manifest import get_manifest
+
+# Default number of concurrent AI requests
+DEFAULT_JOBS = 4
+
+# Default HTTP connection pool settings for the shared AI client
+DEFAULT_POOL_SIZE = 32
+DEFAULT_TIMEOUT = 120.0
+
+# Read-ahead limits: files are read and decoded on a small pool while earlier AI requests are in flight
+DEFAULT_READ_WORKERS = 4
+DEFAULT_READ_AHEAD_FILES = 64
+DEFAULT_READ_AHEAD_MB = 64
+
+# Limits for packing several small files into one AI request
+MAX_BATCH_FILES = 10
+MAX_BATCH_COMPLETION_TOKENS = 8000
+
+# Process-wide OpenAI clients keyed by (api_key, api_proxy)
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client_settings():
+    """Return (pool_size, timeout) from VIBOT_API_POOL_SIZE / VIBOT_API_TIMEOUT"""
+    try:
+        pool_size = max(1, int(os.getenv('VIBOT_API_POOL_SIZE', DEFAULT_POOL_SIZE)))
+    except ValueError:
+        pool_size = DEFAULT_POOL_SIZE
+    try:
+        timeout = float(os.getenv('VIBOT_API_TIMEOUT', DEFAULT_TIMEOUT))
+    except ValueError:
+        timeout = DEFAULT_TIMEOUT
+    return pool_size, timeout
+
+
+def get_client(api_key, api_proxy):
+    """Return the shared keep-alive OpenAI client for the given credentials, creating it on first use"""
+    key = (api_key, api_proxy)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            import httpx
+            import openai
+
+            pool_size, timeout = get_client_settings()
+            http_client = httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=pool_size,
+                    max_keepalive_connections=pool_size
+                ),
+                timeout=timeout
+            )
+            client = openai.OpenAI(
+                api_key=api_key,
+                base_url=api_proxy,
+                http_client=http_client
+            )
+            _clients[key] = client
+        return client
+
+
+def get_read_ahead_bytes():
+    """Return the memory cap for prefetched file content from VIBOT_READ_AHEAD_MB"""
+    try:
+        return max(1, int(float(os.getenv('VIBOT_READ_AHEAD_MB', DEFAULT_READ_AHEAD_MB)) * 1024 * 1024))
+    except ValueError:
+        return DEFAULT_READ_AHEAD_MB * 1024 * 1024
+
+
+def iter_source_entries(path, supported_extensions=None, files=None):
+    """Yield the file entry of every file under path that an AI command may analyze"""
+    for entry in iter_file_entries(path, files):
+        file = entry.name
+
+        # Skip non-code files
+        if should_skip_file(file):
+            continue
+
+        # Only analyze supported file types
+        if supported_extensions is not None:
+            _, ext = os.path.splitext(file)
+            if ext.lower() not in supported_extensions:
+                continue
+
+        yield entry
+
+
+def iter_source_paths(path, supported_extensions=None, files=None):
+    """Yield the path of every file under path that an AI command may analyze"""
+    for entry in iter_source_entries(path, supported_extensions, files):
+        yield entry.path
+
+
+def read_source_file(file_path, min_content_length=20):
+    """Return the text of a source file, or None if it is binary, cannot be read or is too small to analyze"""
+    try:
+        file_content = read_text_file(file_path)
+        if file_content is None:
+            return None
+    except (UnicodeDecodeError, PermissionError, IsADirectoryError):
+        return None
+    except Exception as e:
+        print(f"Error reading file {file_path}: {e}")
+        return None
+
+    # Skip empty files or too small files
+    if len(file_content.strip()) < min_content_length:
+        return None
+
+    return file_content
+
+
+def entry_size(entry):
+    """Return the size of a file entry from its cached stat, or 0 if it cannot be stat'ed"""
+    try:
+        return entry.stat().st_size
+    except OSError:
+        return 0
+
+
+def iter_prefetched(func, items, weigh, workers=DEFAULT_READ_WORKERS,
+                    max_items=DEFAULT_READ_AHEAD_FILES, max_bytes=None):
+    """Run func over items on a background pool ahead of the consumer, yielding (item, result) in order
+
+    weigh(item) estimates the memory a result holds; read-ahead pauses while the results not yet
+    taken by the consumer would exceed max_bytes or max_items.
+    """
+    if max_bytes is None:
+        max_bytes = get_read_ahead_bytes()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        buffered_bytes = 0
+        for item in items:
+            weight = weigh(item)
+            # Hand finished results to the consumer before going over the memory cap
+            while pending and (buffered_bytes + weight > max_bytes or len(pending) >= max_items):
+                done_item, done_weight, future = pending.popleft()
+                buffered_bytes -= done_weight
+                yield done_item, future.result()
+            pending.append((item, weight, executor.submit(func, item)))
+            buffered_bytes += weight
+
+        while pending:
+            done_item, _, future = pending.popleft()
+            yield done_item, future.result()
+
+
+def read_hashed_source_file(entry, manifest, min_content_length=20):
+    """Read a walked source file, carrying the content hash the manifest stored for it when unchanged
+
+    The hash is computed and stored once per file version, so the AI result cache does not hash the
+    same text on every run; known binary files are not opened.
+    """
+    if manifest.is_known_binary(entry):
+        return None
+    file_content = read_source_file(entry.path, min_content_length)
+    if file_content is None:
+        return None
+    try:
+        stat = entry.stat()
+    except OSError:
+        return file_content
+
+    content_hash = manifest.get(entry.path, stat, 'content_hash')
+    if content_hash is None:
+        content_hash = hash_content(file_content)
+        manifest.put(entry.path, stat, content_hash=content_hash)
+    return HashedText(file_content, content_hash)
+
+
+def iter_source_files(path, supported_extensions=None, min_content_length=20, files=None):
+    """Yield (file_path, relative_path, file_content) for every analyzable file under path
+
+    Files are read and decoded ahead of time on a reader pool, so disk I/O overlaps with AI requests.
+    """
+    manifest = get_manifest()
+
+    def read(entry):
+        if manifest is not None:
+            return read_hashed_source_file(entry, manifest, min_content_length)
+        return read_source_file(entry.path, min_content_length)
+
+    entries = iter_source_entries(path, supported_extensions, files)
+    for entry, file_content in iter_prefetched(read, entries, entry_size):
+        if file_content is None:
+            continue
+
+        yield entry.path, os.path.relpath(entry.path, path), file_content
+
+
+def run_in_order(func, items, jobs=1):
+    """Apply func to each item with at most `jobs` calls in flight, yielding (item, result) in input order"""
+    if jobs <= 1:
+        for item in items:
+            yield item, func(item)
+        return
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        pending = deque()
+        for item in items:
+            pending.append((item, executor.submit(func, item)))
+            # Keep a small window of queued work so results are printed as soon as they are ready
+            if len(pending) >= jobs * 2:
+                done_item, future = pending.popleft()
+                yield done_item, future.result()
+
+        while pending:
+            done_item, future = pending.popleft()
+            yield done_item, future.result()
+
+
+def _map_entry_lines(entry, excerpt, line_key, end_key):
+    """Return a copy of entry with file line numbers, plus whether it touches changed lines"""
+    if not isinstance(entry, dict):
+        return None, False
+    start_line = excerpt.to_file_line(entry.get(line_key))
+    if start_line is None:
+        return None, False
+    end_line = None
+    if end_key and entry.get(end_key) is not None:
+        end_line = excerpt.to_file_line(entry.get(end_key))
+
+    entry = dict(entry)
+    entry[line_key] = start_line
+    if end_key and end_line is not None:
+        entry[end_key] = end_line
+    return entry, excerpt.touches_changes(start_line, end_line)
+
+
+def scope_result(result, excerpt, list_key, flag_key, count_key=None,
+                 line_key='line_number', end_key=None, nested_key=None):
+    """Map excerpt line numbers in an AI result back to file lines and drop findings outside the excerpt's scope
+
+    `excerpt` is a DiffExcerpt or FileChunk; `list_key`, `line_key`, `end_key` and `nested_key`
+    describe where a command's AI result keeps its findings and their line numbers.
+    """
+    if result is None or excerpt is None:
+        return result
+
+    entries = []
+    for entry in result.get(list_key) or []:
+        if nested_key:
+            # Grouped findings (duplication instances, naming examples) are kept whole
+            # when at least one of their locations falls on a changed line
+            if not isinstance(entry, dict):
+                continue
+            nested_entries = []
+            touches_changes = False
+            for nested_entry in entry.get(nested_key) or []:
+                mapped_entry, touches = _map_entry_lines(nested_entry, excerpt, line_key, end_key)
+                if mapped_entry is not None:
+                    nested_entries.append(mapped_entry)
+                    touches_changes = touches_changes or touches
+            if touches_changes:
+                entry = dict(entry)
+                entry[nested_key] = nested_entries
+                entries.append(entry)
+        else:
+            mapped_entry, touches = _map_entry_lines(entry, excerpt, line_key, end_key)
+            if mapped_entry is not None and touches:
+                entries.append(mapped_entry)
+
+    result = dict(result)
+    result[list_key] = entries
+    result[flag_key] = bool(entries)
+    if count_key:
+        result[count_key] = len(entries)
+    return result
+
+
+def _finding_key(entry, line_key, end_key, nested_key):
+    """Identify a finding so the same issue reported by two overlapping chunks is kept once"""
+    if nested_key:
+        locations = tuple(sorted(
+            (str(nested.get(line_key)), str(nested.get(end_key) if end_key else ''))
+            for nested in entry.get(nested_key) or [] if isinstance(nested, dict)
+        ))
+    else:
+        locations = (str(entry.get(line_key)), str(entry.get(end_key) if end_key else ''))
+    issue_type = entry.get('issue_type') or entry.get('duplication_type') or ''
+    return locations, issue_type
+
+
+def merge_chunk_results(results, list_key, flag_key, count_key=None,
+                        line_key='line_number', end_key=None, nested_key=None, covered_lines=None):
+    """Merge per-chunk AI results (already in file line numbers) into one result for the file
+
+    covered_lines, when given, replaces the summed lines_analyzed, which counts the lines shared by
+    overlapping chunks twice.
+    """
+    results = [result for result in results if result is not None]
+    if not results:
+        return None
+
+    merged = {}
+    entries = []
+    seen = set()
+    for result in results:
+        for key, value in result.items():
+            # Sum per-chunk counters such as functions_analyzed or lines_analyzed
+            if isinstance(value, int) and not isinstance(value, bool):
+                merged[key] = merged.get(key, 0) + value
+        for entry in result.get(list_key) or []:
+            finding_key = _finding_key(entry, line_key, end_key, nested_key)
+            if finding_key in seen:
+                continue
+            seen.add(finding_key)
+            entries.append(entry)
+
+    if covered_lines is not None and 'lines_analyzed' in merged:
+        merged['lines_analyzed'] = covered_lines
+    merged[list_key] = entries
+    merged[flag_key] = bool(entries)
+    if count_key:
+        merged[count_key] = len(entries)
+    return merged
+
+
+class AnalysisPlan:
+    """The AI requests one file needs and how their answers combine into the file's result
+
+    Each task is a callable making one request. run_planned runs the tasks of all files on the same
+    pool of --jobs workers, so the chunks of a large file are analyzed concurrently without a nested pool.
+    """
+
+    def __init__(self, tasks, combine):
+        self.tasks = tasks
+        self.combine = combine
+
+    @classmethod
+    def done(cls, result):
+        """Return a plan for a result that is already known without asking the model"""
+        return cls([], lambda results: result)
+
+    def finish(self, results):
+        """Combine the answers of the tasks, given in task order, into the file's result"""
+        return self.combine(results)
+
+    def run(self):
+        """Run the tasks one after another and return the combined result"""
+        return self.finish([task() for task in self.tasks])
+
+
+def plan_file(analyze_text, item, result_fields, diff_scope=None, chunk_chars=None):
+    """Plan the requests for one file through analyze_text(content, label), applying diff scoping and chunking
+
+    The finished plan returns the AI result with line numbers relative to the real file.
+    """
+    file_path, relative_path, file_content = item
+
+    # Send only the changed hunks when scoped to a diff
+    excerpt = diff_scope.excerpt_for(file_path, file_content) if diff_scope else None
+    if excerpt is not None:
+        file_content, relative_path = excerpt.text, excerpt.describe(relative_path)
+
+    # Split content that is too large for one prompt
+    chunks = split_into_chunks(file_content, file_path, chunk_chars) if chunk_chars else None
+    if not chunks:
+        return AnalysisPlan(
+            [lambda: analyze_text(file_content, relative_path)],
+            lambda results: scope_result(results[0], excerpt, **result_fields)
+        )
+
+    def analyze_chunk(chunk):
+        return scope_result(analyze_text(chunk.text, chunk.describe(relative_path)), chunk, **result_fields)
+
+    def combine(chunk_results):
+        covered_lines = len({line for chunk in chunks for line in range(chunk.start_line, chunk.end_line + 1)})
+        analysis_result = merge_chunk_results(chunk_results, covered_lines=covered_lines, **result_fields)
+        return scope_result(analysis_result, excerpt, **result_fields)
+
+    return AnalysisPlan([partial(analyze_chunk, chunk) for chunk in chunks], combine)
+
+
+def analyze_file(analyze_text, item, result_fields, diff_scope=None, chunk_chars=None):
+    """Run one file through analyze_text(content, label) in the calling thread, see plan_file"""
+    return plan_file(analyze_text, item, result_fields, diff_scope, chunk_chars).run()
+
+
+def run_planned(plan, items, jobs=1):
+    """Like run_in_order, but plan(item) returns an AnalysisPlan whose requests all share the `jobs` pool"""
+    def iter_tasks():
+        for item in items:
+            item_plan = plan(item)
+            if not item_plan.tasks:
+                yield item, item_plan, None, True
+            for index, task in enumerate(item_plan.tasks):
+                yield item, item_plan, task, index == len(item_plan.tasks) - 1
+
+    def run_task(entry):
+        task = entry[2]
+        return task() if task is not None else None
+
+    results = []
+    for (item, item_plan, task, is_last), result in run_in_order(run_task, iter_tasks(), jobs):
+        if task is not None:
+            results.append(result)
+        if is_last:
+            yield item, item_plan.finish(results)
+            results = []
+
+
+def estimate_tokens(text):
+    """Roughly estimate the number of prompt tokens for a piece of text"""
+    return len(text) // 4 + 1
+
+
+def extract_json_text(ai_response):
+    """Strip markdown code fences the model may wrap around its JSON answer"""
+    if "```json" in ai_response:
+        json_start = ai_response.find("```json") + 7
+        json_end = ai_response.find("```", json_start)
+        return ai_response[json_start:json_end].strip()
+    if ai_response.startswith("```") and ai_response.endswith("```"):
+        return ai_response[3:-3].strip()
+    return ai_response
+
+
+def build_batch_prompt(batch_prompt, labeled_files):
+    """Build one prompt asking for a separate result for each (label, content) file"""
+    file_sections = "\n\n".join(
+        f"File {index}: {label}\n```\n{content}\n```"
+        for index, (label, content) in enumerate(labeled_files, 1)
+    )
+    result_format = batch_prompt['result_format'].replace('\n', '\n      ')
+    return f"""
+{batch_prompt['intro']}
+Analyze each file independently; line numbers are relative to the start of each file.
+
+{file_sections}
+
+Please return analysis results strictly in the following JSON format, with one entry per file:
+
+{{
+  "files": [
+    {{
+      "file_index": file_number_from_above,
+      "result": {result_format}
+    }}
+  ]
+}}
+
+{batch_prompt['criteria']}
+
+Return valid JSON only, no additional text.
+"""
+
+
+def analyze_batch_with_ai(items, batch_prompt, api_key, api_proxy, model, cache=None):
+    """Analyze several small files in one request, returning one result (or None) per item"""
+    results = [None] * len(items)
+    pending = []
+    for index, (_, relative_path, file_content) in enumerate(items):
+        cache_key = None
+        if cache is not None:
+            # The multi-file prompt differs from the single-file one, so its results are cached apart
+            cache_key = cache.make_key(
+                file_content, batch_prompt['command'], model, batch_prompt['prompt_version'], {'batched': True}
+            )
+            cached_result = cache.get(cache_key)
+            if cached_result is not None:
+                results[index] = cached_result
+                continue
+        pending.append((index, cache_key, relative_path, file_content))
+
+    if not pending:
+        return results
+
+    prompt = build_batch_prompt(batch_prompt, [(label, content) for _, _, label, content in pending])
+    try:
+        client = get_client(api_key, api_proxy)
+        response = client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": batch_prompt['system_prompt']},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=min(MAX_BATCH_COMPLETION_TOKENS, batch_prompt['max_tokens_per_file'] * len(pending)),
+            temperature=0.1
+        )
+
+        # Track token usage
+        if hasattr(response, 'usage'):
+            batch_prompt['tracker'].add_usage(response.usage)
+
+        data = json.loads(extract_json_text(response.choices[0].message.content.strip()))
+    except Exception as e:
+        # Files left without a result are analyzed one by one by the caller
+        print(f"Warning: Batched AI request failed, analyzing files individually: {e}")
+        return results
+
+    file_results = data.get('files') if isinstance(data, dict) else None
+    for position, entry in enumerate(file_results or [], 1):
+        if not isinstance(entry, dict) or not isinstance(entry.get('result'), dict):
+            continue
+        try:
+            file_index = int(entry.get('file_index', position))
+        except (TypeError, ValueError):
+            continue
+        if not 1 <= file_index <= len(pending):
+            continue
+        index, cache_key, _, _ = pending[file_index - 1]
+        results[index] = entry['result']
+        if cache_key is not None:
+            cache.put(cache_key, entry['result'])
+
+    return results
+
+
+def iter_batches(items, batch_tokens):
+    """Group consecutive small items into batches whose estimated code size stays under batch_tokens"""
+    batch = []
+    batch_size = 0
+    for item in items:
+        size = estimate_tokens(item[2])
+        # Files that would take up most of a batch are sent on their own
+        if size * 2 > batch_tokens:
+            if batch:
+                yield batch
+                batch, batch_size = [], 0
+            yield [item]
+            continue
+
+        if batch and (batch_size + size > batch_tokens or len(batch) >= MAX_BATCH_FILES):
+            yield batch
+            batch, batch_size = [], 0
+        batch.append(item)
+        batch_size += size
+
+    if batch:
+        yield batch
+
+
+def run_batched(plan, analyze_batch, items, batch_tokens=0, jobs=1):
+    """Like run_planned, but packs small items into batches handled by one analyze_batch call"""
+    if not batch_tokens:
+        for item, result in run_planned(plan, items, jobs):
+            yield item, result
+        return
+
+    def plan_group(batch):
+        if len(batch) == 1:
+            item_plan = plan(batch[0])
+            return AnalysisPlan(item_plan.tasks, lambda results: [item_plan.finish(results)])
+
+        def analyze_group():
+            batch_results = analyze_batch(batch)
+            # Files missing from the batched answer fall back to a request of their own
+            return [result if result is not None else plan(item).run() for item, result in zip(batch, batch_results)]
+
+        return AnalysisPlan([analyze_group], lambda results: results[0])
+
+    for batch, results in run_planned(plan_group, iter_batches(items, batch_tokens), jobs):
+        for item, result in zip(batch, results):
+            yield item, result
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""vibot content-addressed on-disk cache of AI analysis results"""
+
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from .utils import Colors
+
+# Default cache size limit, overridable with VIBOT_CACHE_MAX_MB
+DEFAULT_CACHE_MAX_MB = 256
+
+
+def default_cache_dir():
+    """Return the default cache directory ($XDG_CACHE_HOME/vibot or ~/.cache/vibot)"""
+    base = os.getenv('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'vibot')
+
+
+class HashedText(str):
+    """File text that carries its already known content hash"""
+
+    def __new__(cls, text, content_hash):
+        self = super().__new__(cls, text)
+        self.content_hash = content_hash
+        return self
+
+
+def hash_content(content):
+    """Return the sha256 hex digest of a text or bytes payload"""
+    if isinstance(content, HashedText):
+        return content.content_hash
+    if isinstance(content, str):
+        content = content.encode('utf-8', errors='surrogatepass')
+    return hashlib.sha256(content).hexdigest()
+
+
+class ResultCache:
+    """Size-bounded LRU cache of AI results stored as one JSON file per key"""
+
+    def __init__(self, cache_dir=None, max_bytes=None):
+        self.cache_dir = os.path.abspath(os.path.expanduser(cache_dir or default_cache_dir()))
+        if max_bytes is None:
+            try:
+                max_bytes = int(float(os.getenv('VIBOT_CACHE_MAX_MB', DEFAULT_CACHE_MAX_MB)) * 1024 * 1024)
+            except ValueError:
+                max_bytes = DEFAULT_CACHE_MAX_MB * 1024 * 1024
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._total_size = None
+        self._lock = threading.Lock()
+
+    def make_key(self, file_content, command, model, prompt_version, params=None):
+        """Build a cache key from the file content hash and everything that shapes the prompt"""
+        key_data = json.dumps(
+            [hash_content(file_content), command, model, prompt_version, params or {}],
+            sort_keys=True
+        )
+        return hash_content(key_data)
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + '.json')
+
+    def get(self, key):
+        """Return the cached result for key, or None on a miss"""
+        entry_path = self._entry_path(key)
+        try:
+            with open(entry_path, 'r', encoding='utf-8') as f:
+                result = json.load(f)
+            # Refresh the modification time so eviction is least-recently-used
+            os.utime(entry_path, None)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return result
+
+    def put(self, key, result):
+        """Store a result under key and evict old entries when the cache grows too large"""
+        entry_path = self._entry_path(key)
+        try:
+            os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(entry_path), suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False)
+            os.replace(tmp_path, entry_path)
+            entry_size = os.path.getsize(entry_path)
+        except OSError:
+            return
+
+        with self._lock:
+            if self._total_size is None:
+                self._total_size = self._scan_size()
+            else:
+                self._total_size += entry_size
+            if self._total_size > self.max_bytes:
+                self._evict()
+
+    def _list_entries(self):
+        entries = []
+        for root, dirs, files in os.walk(self.cache_dir):
+            for file in files:
+                if not file.endswith('.json'):
+                    continue
+                entry_path = os.path.join(root, file)
+                try:
+                    stat = os.stat(entry_path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry_path))
+        return entries
+
+    def _scan_size(self):
+        return sum(size for _, size, _ in self._list_entries())
+
+    def _evict(self):
+        """Delete least recently used entries until the cache is back under 90% of its limit"""
+        entries = sorted(self._list_entries())
+        total_size = sum(size for _, size, _ in entries)
+        target_size = self.max_bytes * 0.9
+        for _, size, entry_path in entries:
+            if total_size <= target_size:
+                break
+            try:
+                os.remove(entry_path)
+                total_size -= size
+            except OSError:
+                continue
+        self._total_size = total_size
+
+    def print_summary(self):
+        if self.hits or self.misses:
+            print(f"\n{Colors.YELLOW}💾 AI Result Cache:{Colors.RESET}")
+            print(f"  Cache Hits: {self.hits}")
+            print(f"  Cache Misses: {self.misses}")
+            print(f"  Cache Directory: {self.cache_dir}")
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""vibot chunking - split files that are too large for one AI prompt"""
+
+import ast
+import os
+
+# Default maximum characters of code sent in one prompt (roughly 10k tokens)
+DEFAULT_CHUNK_CHARS = 40000
+
+# Lines repeated between neighbouring line-window chunks so findings at the seam are not lost
+WINDOW_OVERLAP_LINES = 20
+
+
+class FileChunk:
+    """A contiguous line range of a file, with a map from chunk lines back to file lines"""
+
+    def __init__(self, lines, start_line, end_line, total_lines):
+        self.start_line = start_line
+        self.end_line = end_line
+        self.total_lines = total_lines
+        self.text = '\n'.join(lines[start_line - 1:end_line])
+
+    def describe(self, relative_path):
+        """Label the file path shown to the model so it knows it is reading part of a file"""
+        return (f"{relative_path} (part: lines {self.start_line}-{self.end_line} of {self.total_lines}; "
+                f"report line numbers relative to the code shown)")
+
+    def to_file_line(self, chunk_line):
+        """Translate a 1-based line number within the chunk into a file line number"""
+        try:
+            offset = int(chunk_line) - 1
+        except (TypeError, ValueError):
+            return None
+        if 0 <= offset <= self.end_line - self.start_line:
+            return self.start_line + offset
+        return None
+
+    def touches_changes(self, start_line, end_line=None):
+        """Every line of a chunk is in scope"""
+        return True
+
+
+def _python_boundaries(file_content, line_sizes, max_chars):
+    """Return start lines of top-level definitions, descending into classes that are too large"""
+    try:
+        tree = ast.parse(file_content)
+    except (SyntaxError, ValueError):
+        return set()
+
+    boundaries = set()
+
+    def node_start(node):
+        # Keep decorators attached to the definition they decorate
+        decorators = getattr(node, 'decorator_list', None) or []
+        return min([node.lineno] + [decorator.lineno for decorator in decorators])
+
+    def visit(body):
+        for node in body:
+            start = node_start(node)
+            boundaries.add(start)
+            end = getattr(node, 'end_lineno', None)
+            if isinstance(node, ast.ClassDef) and end is not None:
+                if sum(line_sizes[start - 1:end]) > max_chars:
+                    visit(node.body)
+
+    visit(tree.body)
+    return boundaries
+
+
+def _window_segments(start, end, line_sizes, max_chars, overlap=0):
+    """Split a line range into windows of at most max_chars, each at least one line long"""
+    segments = []
+    window_start = start
+    while window_start <= end:
+        window_end = window_start
+        size = line_sizes[window_start - 1]
+        while window_end < end and size + line_sizes[window_end] <= max_chars:
+            size += line_sizes[window_end]
+            window_end += 1
+        segments.append((window_start, window_end))
+        if window_end >= end:
+            break
+        window_start = max(window_start + 1, window_end + 1 - overlap)
+    return segments
+
+
+def split_into_chunks(file_content, file_path, max_chars=DEFAULT_CHUNK_CHARS):
+    """Split file content into FileChunks of at most max_chars, or return None if it fits in one prompt"""
+    if not max_chars or len(file_content) <= max_chars:
+        return None
+
+    lines = file_content.split('\n')
+    total_lines = len(lines)
+    line_sizes = [len(line) + 1 for line in lines]
+
+    boundaries = set()
+    _, ext = os.path.splitext(file_path)
+    if ext.lower() == '.py':
+        boundaries = _python_boundaries(file_content, line_sizes, max_chars)
+
+    if not boundaries:
+        # No structure to follow: overlapping line windows
+        segments = _window_segments(1, total_lines, line_sizes, max_chars, WINDOW_OVERLAP_LINES)
+        return [FileChunk(lines, start, end, total_lines) for start, end in segments]
+
+    # Segments run from one definition to the next; module header code joins the first one
+    starts = sorted(boundary for boundary in boundaries if 1 < boundary <= total_lines)
+    starts = [1] + starts
+    segments = []
+    for i, start in enumerate(starts):
+        end = starts[i + 1] - 1 if i + 1 < len(starts) else total_lines
+        if sum(line_sizes[start - 1:end]) > max_chars:
+            segments.extend(_window_segments(start, end, line_sizes, max_chars))
+        else:
+            segments.append((start, end))
+
+    # Pack whole segments into chunks up to the size budget
+    chunks = []
+    chunk_start, chunk_end, chunk_size = None, None, 0
+    for start, end in segments:
+        size = sum(line_sizes[start - 1:end])
+        if chunk_start is not None and chunk_size + size > max_chars:
+            chunks.append(FileChunk(lines, chunk_start, chunk_end, total_lines))
+            chunk_start, chunk_size = None, 0
+        if chunk_start is None:
+            chunk_start = start
+        chunk_end = end
+        chunk_size += size
+    if chunk_start is not None:
+        chunks.append(FileChunk(lines, chunk_start, chunk_end, total_lines))
+
+    return chunks
@@ -10,7 +10,14 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from vibot import __version__
 from .utils import print_logo
-from .commands import detect_files_in_directory, search_keyword_in_files, find_prolix_files, detect_hardcoded_secrets, analyze_functions_in_directory, analyze_readability_in_directory, analyze_comments_in_directory, analyze_magic_in_directory, analyze_overlap_in_directory, analyze_naming_in_directory
+from .ai import DEFAULT_JOBS
+from .cache import ResultCache
+from .index import SearchIndex
+from .discovery import configure_walk
+from .manifest import configure_manifest, save_manifest
+from .chunking import DEFAULT_CHUNK_CHARS
+from .gitdiff import get_changed_files, get_changed_line_ranges, DiffScope, DEFAULT_DIFF_CONTEXT
+from .commands import detect_files_in_directory, search_keyword_in_files, find_prolix_files, detect_hardcoded_secrets, analyze_functions_in_directory, analyze_readability_in_directory, analyze_comments_in_directory, analyze_magic_in_directory, analyze_overlap_in_directory, analyze_naming_in_directory, analyze_all_in_directory
 
 
 def main():
@@ -105,6 +112,25 @@ def main():
         help='🤖 AI-powered naming convention analysis - detects oversimplified names, obscure abbreviations, inconsistent styles, meaningless names, and constant naming issues'
     )
     
+    parser.add_argument(
+        '--offline',
+        action='store_true',
+        help='with --ustalony or the ustalony check of --all/--checks, report the local regex/entropy scanner findings without calling the AI API'
+    )
+    
+    parser.add_argument(
+        '--all',
+        action='store_true',
+        help='🤖 run every AI-powered check (-u -f -r -c -m -o -n) in a single pass - each file is read once and reported in one unified report'
+    )
+    
+    parser.add_argument(
+        '--checks',
+        type=str,
+        metavar='LIST',
+        help='comma-separated AI checks to run in a single pass, implies --all (ustalony,function,readability,comment,magic,overlap,name)'
+    )
+    
     parser.add_argument(
         '-g',
         '--gluttonous',
@@ -129,7 +155,86 @@ def main():
     parser.add_argument(
         '--key',
         type=str,
-        help='keyword or pattern to search for in code files (required with --search) - e.g., function names, TODO, FIXME, API calls'
+        action='append',
+        help='keyword or pattern to search for in code files (required with --search) - e.g., function names, TODO, FIXME, API calls; repeat to search for several at once'
+    )
+    
+    parser.add_argument(
+        '--files-with-matches',
+        action='store_true',
+        help='with --search, only list the files that contain a match, reading each file up to its first match'
+    )
+    
+    parser.add_argument(
+        '--max-count',
+        type=int,
+        metavar='N',
+        help='with --search, report at most N matching lines per file'
+    )
+    
+    parser.add_argument(
+        '--max-total',
+        type=int,
+        metavar='N',
+        help='with --search, stop after N matching lines overall'
+    )
+    
+    parser.add_argument(
+        '-q',
+        '--quiet',
+        action='store_true',
+        help='with --search, print nothing and stop at the first match; exit status is 0 if a match was found, 1 if not'
+    )
+    
+    parser.add_argument(
+        '-A',
+        '--after-context',
+        type=int,
+        metavar='N',
+        help='with --search, show N lines after each match'
+    )
+    
+    parser.add_argument(
+        '-B',
+        '--before-context',
+        type=int,
+        metavar='N',
+        help='with --search, show N lines before each match'
+    )
+    
+    parser.add_argument(
+        '-C',
+        '--context',
+        type=int,
+        default=0,
+        metavar='N',
+        help='with --search, show N lines before and after each match (default: 0)'
+    )
+    
+    parser.add_argument(
+        '--index',
+        action='store_true',
+        help='with --search, keep a trigram index of the tree in the cache directory and only read files that can match'
+    )
+    
+    parser.add_argument(
+        '--regex',
+        action='store_true',
+        help='with --search, treat --key values as regular expressions'
+    )
+    
+    parser.add_argument(
+        '-i',
+        '--ignore-case',
+        action='store_true',
+        help='with --search, match case-insensitively'
+    )
+    
+    parser.add_argument(
+        '-w',
+        '--word',
+        action='store_true',
+        help='with --search, only match whole words'
     )
     
     parser.add_argument(
@@ -139,6 +244,38 @@ def main():
         help='maximum line count threshold for detecting overly long files that may need refactoring (default: 200)'
     )
     
+    parser.add_argument(
+        '--max-depth',
+        type=int,
+        metavar='N',
+        help='with --detect, expand only N directory levels of the tree and summarise deeper directories'
+    )
+    
+    parser.add_argument(
+        '--summary-only',
+        action='store_true',
+        help='with --detect, print only the file statistics without the tree'
+    )
+    
+    parser.add_argument(
+        '--line-stats',
+        action='store_true',
+        help='with --detect, read every file to add cloc-style line, code, comment and blank counts per extension'
+    )
+    
+    parser.add_argument(
+        '--duplicates',
+        action='store_true',
+        help='with --detect, list groups of files with identical contents and the bytes their extra copies waste'
+    )
+    
+    parser.add_argument(
+        '--top',
+        type=int,
+        metavar='N',
+        help='with --prolix, only list the N longest files'
+    )
+    
     parser.add_argument(
         '--max-lines',
         type=int,
@@ -167,58 +304,206 @@ def main():
         help='minimum number of lines required to consider code as duplicate - smaller duplicates will be ignored (default: 3)'
     )
     
+    parser.add_argument(
+        '--exclude',
+        type=str,
+        action='append',
+        metavar='GLOB',
+        help='skip files and directories matching a .gitignore-style glob, repeatable or comma-separated (e.g. "*.min.js,vendor/")'
+    )
+    
+    parser.add_argument(
+        '--no-ignore',
+        action='store_true',
+        help='do not read .gitignore / .vibotignore files when collecting files'
+    )
+    
+    parser.add_argument(
+        '-j',
+        '--jobs',
+        type=int,
+        default=DEFAULT_JOBS,
+        help=f'number of files analyzed concurrently by AI-powered commands - output order is unaffected (default: {DEFAULT_JOBS})'
+    )
+    
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='disable the on-disk AI result cache and send every file to the model'
+    )
+    
+    parser.add_argument(
+        '--no-manifest',
+        action='store_true',
+        help='do not reuse or record per-file line counts, binary verdicts and content hashes from earlier runs'
+    )
+    
+    parser.add_argument(
+        '--chunk-chars',
+        type=int,
+        default=DEFAULT_CHUNK_CHARS,
+        help=f'split files larger than this many characters into chunks along function/class boundaries for AI commands, 0 to disable (default: {DEFAULT_CHUNK_CHARS})'
+    )
+    
+    parser.add_argument(
+        '--batch-tokens',
+        type=int,
+        default=0,
+        help='pack several small files into one AI request up to this estimated token budget for --comment, --magic and --name (default: 0, disabled)'
+    )
+    
+    parser.add_argument(
+        '--cache-dir',
+        type=str,
+        help='directory for the AI result cache, the search index and the file manifest (default: $XDG_CACHE_HOME/vibot or ~/.cache/vibot)'
+    )
+    
+    parser.add_argument(
+        '--since',
+        type=str,
+        metavar='GIT_REF',
+        help='only analyze files changed since the given git ref (e.g. origin/main, HEAD~1)'
+    )
+    
+    parser.add_argument(
+        '--staged',
+        action='store_true',
+        help='only analyze files staged in the git index'
+    )
+    
+    parser.add_argument(
+        '--hunks-only',
+        action='store_true',
+        help='with --since/--staged, send only the changed hunks to AI commands and report findings on changed lines only'
+    )
+    
+    parser.add_argument(
+        '--diff-context',
+        type=int,
+        default=DEFAULT_DIFF_CONTEXT,
+        help=f'number of unchanged lines sent around each changed hunk with --hunks-only (default: {DEFAULT_DIFF_CONTEXT})'
+    )
+    
 
     
 
     # Check if logo should be displayed (except for --version, --logo, and --gluttonous arguments)
-    if not any(arg in sys.argv for arg in ['-v', '--version', '-l', '--logo', '-g', '--gluttonous']):
+    if not any(arg in sys.argv for arg in ['-v', '--version', '-l', '--logo', '-g', '--gluttonous', '-q', '--quiet']):
         print_logo()
     
     
     args = parser.parse_args()
     
+    # Apply ignore files and --exclude globs to every directory walk
+    exclude = [pattern.strip() for value in args.exclude or [] for pattern in value.split(',') if pattern.strip()]
+    configure_walk(exclude, use_ignore_files=not args.no_ignore)
+    
+    # Reuse what earlier runs learned about unchanged files; the manifest is loaded on first use
+    configure_manifest(args.path, args.cache_dir, enabled=not args.no_manifest)
+    
+    # Restrict every command to the files touched by the git diff
+    changed_files = None
+    diff_scope = None
+    if args.since or args.staged:
+        if args.hunks_only:
+            line_ranges = get_changed_line_ranges(args.path, args.since, args.staged)
+            if line_ranges is None:
+                return
+            diff_scope = DiffScope(line_ranges, max(0, args.diff_context))
+            changed_files = diff_scope.files
+        else:
+            changed_files = get_changed_files(args.path, args.since, args.staged)
+            if changed_files is None:
+                return
+        scope = f"since {args.since}" if args.since else "in the index"
+        if args.staged and args.since:
+            scope = f"staged since {args.since}"
+        print(f"Limiting analysis to {len(changed_files)} changed files {scope}")
+    elif args.hunks_only:
+        print("Error: --hunks-only requires --since or --staged")
+        return
+    
+    # Options shared by all AI-powered commands
+    ai_options = {
+        'jobs': args.jobs,
+        'cache': None if args.no_cache else ResultCache(args.cache_dir),
+        'files': changed_files,
+        'diff_scope': diff_scope,
+        'chunk_chars': max(0, args.chunk_chars)
+    }
+    
 
     if args.logo:
         print_logo()
+    elif args.all or args.checks:
+        analyze_all_in_directory(
+            args.path,
+            args.checks,
+            getattr(args, 'max_lines', 50),
+            getattr(args, 'max_params', 5),
+            getattr(args, 'max_line_length', 80),
+            getattr(args, 'min_duplicate_lines', 3),
+            offline=args.offline,
+            **ai_options
+        )
     elif args.detect:
-        detect_files_in_directory(args.path)
+        detect_files_in_directory(args.path, files=changed_files, max_depth=args.max_depth,
+                                  summary_only=args.summary_only, duplicates=args.duplicates,
+                                  line_stats=args.line_stats)
     elif args.search:
         if not args.key:
             print("Error: --key is required when using --search")
             parser.print_help()
             return
-        search_keyword_in_files(args.path, args.key)
+        total_matches = search_keyword_in_files(
+            args.path, args.key, files=changed_files, regex=args.regex,
+            ignore_case=args.ignore_case, word=args.word,
+            index=SearchIndex(args.path, args.cache_dir) if args.index else None,
+            files_with_matches=args.files_with_matches, max_count=args.max_count,
+            max_total=args.max_total, quiet=args.quiet,
+            before=args.context if args.before_context is None else args.before_context,
+            after=args.context if args.after_context is None else args.after_context
+        )
+        if args.quiet:
+            save_manifest()
+            # Exit status as in grep: 0 when something matched, 1 when nothing did, 2 on errors
+            sys.exit(2 if total_matches is None else 0 if total_matches else 1)
     elif args.prolix:
-        find_prolix_files(args.path, getattr(args, 'max'))
+        find_prolix_files(args.path, getattr(args, 'max'), files=changed_files, top=args.top)
     elif args.ustalony:
-        detect_hardcoded_secrets(args.path)
+        detect_hardcoded_secrets(args.path, offline=args.offline, **ai_options)
     elif args.function:
         analyze_functions_in_directory(
             args.path, 
             getattr(args, 'max_lines', 50),
-            getattr(args, 'max_params', 5)
+            getattr(args, 'max_params', 5),
+            **ai_options
         )
     elif args.readability:
         analyze_readability_in_directory(
             args.path,
-            getattr(args, 'max_line_length', 80)
+            getattr(args, 'max_line_length', 80),
+            **ai_options
         )
     elif args.comment:
-        analyze_comments_in_directory(args.path)
+        analyze_comments_in_directory(args.path, batch_tokens=args.batch_tokens, **ai_options)
     elif args.magic:
-        analyze_magic_in_directory(args.path)
+        analyze_magic_in_directory(args.path, batch_tokens=args.batch_tokens, **ai_options)
     elif args.overlap:
         analyze_overlap_in_directory(
             args.path,
-            getattr(args, 'min_duplicate_lines', 3)
+            getattr(args, 'min_duplicate_lines', 3),
+            **ai_options
         )
     elif args.name:
-        analyze_naming_in_directory(args.path)
+        analyze_naming_in_directory(args.path, batch_tokens=args.batch_tokens, **ai_options)
     elif args.gluttonous:
         from vibot.commands.gluttonous import main as snake_main
         snake_main(getattr(args, 'map_size', 10))
     elif len(sys.argv) == 1:
         parser.print_help()
+    
+    save_manifest()
 
 
 if __name__ == '__main__':
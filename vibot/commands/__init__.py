@@ -11,6 +11,7 @@ from .comment import analyze_comments_in_directory
 from .magic import analyze_magic_in_directory
 from .overlap import analyze_overlap_in_directory
 from .naming import analyze_naming_in_directory
+from .multi import analyze_all_in_directory
 
 __all__ = [
     'detect_files_in_directory',
@@ -22,5 +23,6 @@ __all__ = [
     'analyze_comments_in_directory',
     'analyze_magic_in_directory',
     'analyze_overlap_in_directory',
-    'analyze_naming_in_directory'
+    'analyze_naming_in_directory',
+    'analyze_all_in_directory'
 ]
\ No newline at end of file
@@ -6,7 +6,10 @@ import json
 import sys
 import subprocess
 import time
-from ..utils import should_skip_file, Colors
+import threading
+from ..utils import Colors
+from ..ai import iter_source_files, run_batched, get_client, plan_file, analyze_batch_with_ai
+from ..chunking import DEFAULT_CHUNK_CHARS
 
 # Try to import openai, provide installation hint if failed
 try:
@@ -15,6 +18,18 @@ try:
 except ImportError:
     OPENAI_AVAILABLE = False
 
+# Bump when the prompt or result format changes to invalidate cached results
+PROMPT_VERSION = 1
+
+# Supported file extensions for this analysis
+SUPPORTED_EXTENSIONS = {'.py', '.js', '.ts', '.java', '.cpp', '.c', '.cs', '.php', '.rb', '.go', '.kt', '.swift', '.rs'}
+
+# Files with less content than this are skipped
+MIN_CONTENT_LENGTH = 20
+
+# Where findings and their line numbers live in the AI result
+RESULT_FIELDS = {'list_key': 'issues', 'flag_key': 'has_issues', 'end_key': 'line_end'}
+
 # Token usage tracking for comment analysis
 class CommentTokenTracker:
     def __init__(self):
@@ -24,19 +39,21 @@ class CommentTokenTracker:
         self.total_tokens = 0
         self.model_name = ""
         self.start_time = None
+        self._lock = threading.Lock()
         
     def start_tracking(self, model):
         self.model_name = model
         self.start_time = time.time()
         
     def add_usage(self, usage):
-        self.total_api_calls += 1
-        if hasattr(usage, 'prompt_tokens'):
-            self.total_prompt_tokens += usage.prompt_tokens
-        if hasattr(usage, 'completion_tokens'):
-            self.total_completion_tokens += usage.completion_tokens
-        if hasattr(usage, 'total_tokens'):
-            self.total_tokens += usage.total_tokens
+        with self._lock:
+            self.total_api_calls += 1
+            if hasattr(usage, 'prompt_tokens'):
+                self.total_prompt_tokens += usage.prompt_tokens
+            if hasattr(usage, 'completion_tokens'):
+                self.total_completion_tokens += usage.completion_tokens
+            if hasattr(usage, 'total_tokens'):
+                self.total_tokens += usage.total_tokens
             
     def print_summary(self):
         if self.total_api_calls > 0:
@@ -56,37 +73,15 @@ class CommentTokenTracker:
 # Global token tracker for comment analysis
 comment_token_tracker = CommentTokenTracker()
 
+# System prompt for comment analysis requests
+SYSTEM_PROMPT = "You are a professional code documentation analysis expert. Analyze code for comment-related issues and return results in the specified JSON format only."
 
-def analyze_code_comments_with_ai(file_content, file_path, api_key, api_proxy, model):
-    """Analyze code comments using AI"""
-    if not OPENAI_AVAILABLE:
-        return None
-        
-    try:
-        # Configure OpenAI client
-        client = openai.OpenAI(
-            api_key=api_key,
-            base_url=api_proxy
-        )
-        
-        # Build analysis prompt
-        prompt = f"""
-As a code documentation expert, analyze the following code file for comment-related issues.
-
-File path: {file_path}
-
-Code content:
-```
-{file_content}
-```
-
-Please analyze the code and return results strictly in the following JSON format:
-
-{{
+# JSON result format the model returns for each file
+RESULT_FORMAT = """{
   "has_issues": true/false,
   "lines_analyzed": number_of_lines_analyzed,
   "issues": [
-    {{
+    {
       "line_number": line_number,
       "line_end": line_end_number_for_multiline_issues,
       "column_start": column_start_position_for_single_line,
@@ -96,11 +91,12 @@ Please analyze the code and return results strictly in the following JSON format
       "severity": "high|medium|low",
       "description": "detailed description of the comment issue",
       "suggestion": "specific suggestion to improve comments"
-    }}
+    }
   ]
-}}
+}"""
 
-Analysis criteria:
+# Analysis instructions shared by single-file and batched prompts
+ANALYSIS_CRITERIA = """Analysis criteria:
 1. Useless Comments: Comments that don't add value, are outdated, state the obvious, inconsistent with code behavior, or contain code snippets
 2. Missing Comments: Complex logic blocks (algorithms, calculations, business logic) without explanatory comments
 
@@ -149,7 +145,54 @@ Ignore:
 Severity guidelines:
 - High: Completely misleading comments, complex algorithms without any explanation
 - Medium: Outdated comments, moderately complex logic without comments
-- Low: Minor comment improvements, slightly unclear code sections
+- Low: Minor comment improvements, slightly unclear code sections"""
+
+# Prompt pieces used to analyze several small files in one request
+BATCH_PROMPT = {
+    'command': 'comment',
+    'prompt_version': PROMPT_VERSION,
+    'intro': "As a code documentation expert, analyze the following code files for comment-related issues.",
+    'system_prompt': SYSTEM_PROMPT,
+    'result_format': RESULT_FORMAT,
+    'criteria': ANALYSIS_CRITERIA,
+    'max_tokens_per_file': 3000,
+    'tracker': comment_token_tracker
+}
+
+
+def analyze_code_comments_with_ai(file_content, file_path, api_key, api_proxy, model, cache=None):
+    """Analyze code comments using AI"""
+    if not OPENAI_AVAILABLE:
+        return None
+    
+    # Reuse the cached result if this exact content was analyzed before
+    cache_key = None
+    if cache is not None:
+        cache_key = cache.make_key(file_content, 'comment', model, PROMPT_VERSION)
+        cached_result = cache.get(cache_key)
+        if cached_result is not None:
+            return cached_result
+        
+    try:
+        # Reuse the shared, connection-pooled OpenAI client
+        client = get_client(api_key, api_proxy)
+        
+        # Build analysis prompt
+        prompt = f"""
+As a code documentation expert, analyze the following code file for comment-related issues.
+
+File path: {file_path}
+
+Code content:
+```
+{file_content}
+```
+
+Please analyze the code and return results strictly in the following JSON format:
+
+{RESULT_FORMAT}
+
+{ANALYSIS_CRITERIA}
 
 Return valid JSON only, no additional text.
 """
@@ -157,7 +200,7 @@ Return valid JSON only, no additional text.
         response = client.chat.completions.create(
             model=model,
             messages=[
-                {"role": "system", "content": "You are a professional code documentation analysis expert. Analyze code for comment-related issues and return results in the specified JSON format only."},
+                {"role": "system", "content": SYSTEM_PROMPT},
                 {"role": "user", "content": prompt}
             ],
             max_tokens=3000,
@@ -181,6 +224,8 @@ Return valid JSON only, no additional text.
         
         try:
             result = json.loads(ai_response)
+            if cache_key is not None:
+                cache.put(cache_key, result)
             return result
         except json.JSONDecodeError as e:
             print(f"Warning: Failed to parse AI response as JSON: {e}")
@@ -201,7 +246,7 @@ Return valid JSON only, no additional text.
         return None
 
 
-def analyze_comments_in_directory(path):
+def analyze_comments_in_directory(path, jobs=1, cache=None, files=None, diff_scope=None, chunk_chars=DEFAULT_CHUNK_CHARS, batch_tokens=0):
     """Analyze code comments in directory using AI"""
     try:
         # Check if openai package is available
@@ -257,100 +302,87 @@ def analyze_comments_in_directory(path):
         total_lines_analyzed = 0
         files_with_issues = 0
         
-        # Supported file extensions for comment analysis
-        supported_extensions = {'.py', '.js', '.ts', '.java', '.cpp', '.c', '.cs', '.php', '.rb', '.go', '.kt', '.swift', '.rs'}
+        source_files = iter_source_files(path, SUPPORTED_EXTENSIONS, min_content_length=MIN_CONTENT_LENGTH, files=files)
+        
+        def analyze_text(content, label):
+            return analyze_code_comments_with_ai(
+                content, label, api_key, api_proxy, model, cache=cache
+            )
         
-        for root, dirs, files in os.walk(path):
-            for file in files:
-                file_path = os.path.join(root, file)
+        def plan(item):
+            return plan_file(analyze_text, item, RESULT_FIELDS, diff_scope, chunk_chars)
+        
+        def analyze_batch(items):
+            return analyze_batch_with_ai(items, BATCH_PROMPT, api_key, api_proxy, model, cache=cache)
+        
+        # Batches carry whole files, so they are not used when only diff hunks are analyzed
+        if diff_scope is not None:
+            batch_tokens = 0
+        
+        for (file_path, relative_path, file_content), analysis_result in run_batched(plan, analyze_batch, source_files, batch_tokens, jobs):
+            try:
+                total_files_scanned += 1
                 
-                # Skip non-code files
-                if should_skip_file(file):
-                    continue
-                    
-                # Only analyze supported file types
-                _, ext = os.path.splitext(file)
-                if ext.lower() not in supported_extensions:
+                print(f"Analyzing: {relative_path}...", end=" ")
+                
+                if analysis_result is None:
+                    print(f"{Colors.BRIGHT_ORANGE_RED}Failed{Colors.RESET}")
                     continue
                 
-                try:
-                    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                        file_content = f.read()
-                    
-                    # Skip empty files or too small files
-                    if len(file_content.strip()) < 20:
-                        continue
-                    
-                    total_files_scanned += 1
-                    relative_path = os.path.relpath(file_path, path)
-                    
-                    print(f"Analyzing: {relative_path}...", end=" ")
-                    
-                    # Analyze file with AI
-                    analysis_result = analyze_code_comments_with_ai(
-                        file_content, relative_path, api_key, api_proxy, model
-                    )
-                    
-                    if analysis_result is None:
-                        print(f"{Colors.BRIGHT_ORANGE_RED}Failed{Colors.RESET}")
-                        continue
-                    
-                    # Update lines count
-                    total_lines_analyzed += analysis_result.get('lines_analyzed', 0)
+                # Update lines count
+                total_lines_analyzed += analysis_result.get('lines_analyzed', 0)
+                
+                if analysis_result.get('has_issues', False) and analysis_result.get('issues'):
+                    files_with_issues += 1
+                    print(f"{Colors.BRIGHT_ORANGE_RED}Issues found{Colors.RESET}")
                     
-                    if analysis_result.get('has_issues', False) and analysis_result.get('issues'):
-                        files_with_issues += 1
-                        print(f"{Colors.BRIGHT_ORANGE_RED}Issues found{Colors.RESET}")
+                    # Display found issues
+                    for issue in analysis_result['issues']:
+                        issue_type = issue.get('issue_type', 'Comment Issue')
                         
-                        # Display found issues
-                        for issue in analysis_result['issues']:
-                            issue_type = issue.get('issue_type', 'Comment Issue')
-                            
-                            # Handle single-line vs multi-line issues
-                            if issue_type == 'Useless Comments':
-                                # Single-line issues with column positions
-                                col_start = issue.get('column_start', '?')
-                                col_end = issue.get('column_end', '?')
-                                print(f"\n{Colors.YELLOW}Line {issue.get('line_number', '?')}:{col_start}-{col_end}:{Colors.RESET}")
-                                print(f"   File: {relative_path}")
-                                print(f"   Code: {issue.get('line_content', '').strip()}")
+                        # Handle single-line vs multi-line issues
+                        if issue_type == 'Useless Comments':
+                            # Single-line issues with column positions
+                            col_start = issue.get('column_start', '?')
+                            col_end = issue.get('column_end', '?')
+                            print(f"\n{Colors.YELLOW}Line {issue.get('line_number', '?')}:{col_start}-{col_end}:{Colors.RESET}")
+                            print(f"   File: {relative_path}")
+                            print(f"   Code: {issue.get('line_content', '').strip()}")
+                        else:
+                            # Multi-line issues with start and end lines
+                            line_start = issue.get('line_number', '?')
+                            line_end = issue.get('line_end', line_start)
+                            if line_end and line_end != line_start:
+                                print(f"\n{Colors.YELLOW}Lines {line_start}-{line_end}:{Colors.RESET}")
                             else:
-                                # Multi-line issues with start and end lines
-                                line_start = issue.get('line_number', '?')
-                                line_end = issue.get('line_end', line_start)
-                                if line_end and line_end != line_start:
-                                    print(f"\n{Colors.YELLOW}Lines {line_start}-{line_end}:{Colors.RESET}")
-                                else:
-                                    print(f"\n{Colors.YELLOW}Line {line_start}:{Colors.RESET}")
-                                print(f"   File: {relative_path}")
-                                if issue.get('line_content'):
-                                    print(f"   Code: {issue.get('line_content', '').strip()}")
-                            
-                            severity_color = Colors.BRIGHT_ORANGE_RED if issue.get('severity') == 'high' else Colors.YELLOW
-                            print(f"   {severity_color}⚠️  {issue_type}: {issue.get('description', '')}{Colors.RESET}")
-                            if issue.get('suggestion'):
-                                print(f"   💡 {issue.get('suggestion', '')}")
-                            
-                            # Add to total results
-                            all_issues.append({
-                                'file': relative_path,
-                                'line': issue.get('line_number'),
-                                'line_end': issue.get('line_end'),
-                                'column_start': issue.get('column_start'),
-                                'column_end': issue.get('column_end'),
-                                'type': issue_type,
-                                'severity': issue.get('severity'),
-                                'description': issue.get('description'),
-                                'suggestion': issue.get('suggestion'),
-                                'line_content': issue.get('line_content', '')
-                            })
-                    else:
-                        print(f"{Colors.YELLOW}Clean{Colors.RESET}")
-                
-                except (UnicodeDecodeError, PermissionError, IsADirectoryError):
-                    continue
-                except Exception as e:
-                    print(f"Error analyzing file {file_path}: {e}")
+                                print(f"\n{Colors.YELLOW}Line {line_start}:{Colors.RESET}")
+                            print(f"   File: {relative_path}")
+                            if issue.get('line_content'):
+                                print(f"   Code: {issue.get('line_content', '').strip()}")
+                        
+                        severity_color = Colors.BRIGHT_ORANGE_RED if issue.get('severity') == 'high' else Colors.YELLOW
+                        print(f"   {severity_color}⚠️  {issue_type}: {issue.get('description', '')}{Colors.RESET}")
+                        if issue.get('suggestion'):
+                            print(f"   💡 {issue.get('suggestion', '')}")
+                        
+                        # Add to total results
+                        all_issues.append({
+                            'file': relative_path,
+                            'line': issue.get('line_number'),
+                            'line_end': issue.get('line_end'),
+                            'column_start': issue.get('column_start'),
+                            'column_end': issue.get('column_end'),
+                            'type': issue_type,
+                            'severity': issue.get('severity'),
+                            'description': issue.get('description'),
+                            'suggestion': issue.get('suggestion'),
+                            'line_content': issue.get('line_content', '')
+                        })
+                else:
+                    print(f"{Colors.YELLOW}Clean{Colors.RESET}")
+            
+            except Exception as e:
+                print(f"Error analyzing file {file_path}: {e}")
         
         print("\n" + "=" * 70)
         print(f"🔍 AI Code Comments Analysis Results:")
@@ -399,6 +431,8 @@ def analyze_comments_in_directory(path):
         
         # Print token usage summary
         comment_token_tracker.print_summary()
+        if cache is not None:
+            cache.print_summary()
         
     except Exception as e:
         print(f"Error: {e}")
\ No newline at end of file
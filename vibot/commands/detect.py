@@ -2,72 +2,441 @@
 """vibot detect command implementation"""
 
 import os
-from ..utils import should_skip_file
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from ..utils import BufferedOutput, should_skip_file, read_binary_file
+from ..discovery import iter_directories, iter_file_entries
+from ..manifest import get_manifest
+from .prolix import count_file_lines, COUNT_BLOCK_SIZE
 
+# Comment syntax per extension: (line comment prefixes, (block start, block end) pairs)
+HASH_COMMENTS = ((b'#',), ())
+C_COMMENTS = ((b'//',), ((b'/*', b'*/'),))
+COMMENT_SYNTAX = {
+    '.py': HASH_COMMENTS, '.sh': HASH_COMMENTS, '.bash': HASH_COMMENTS, '.rb': HASH_COMMENTS,
+    '.pl': HASH_COMMENTS, '.r': HASH_COMMENTS, '.yaml': HASH_COMMENTS, '.yml': HASH_COMMENTS,
+    '.toml': HASH_COMMENTS, '.cfg': HASH_COMMENTS, '.ini': ((b'#', b';'), ()),
+    '.c': C_COMMENTS, '.h': C_COMMENTS, '.cpp': C_COMMENTS, '.cc': C_COMMENTS, '.hpp': C_COMMENTS,
+    '.cs': C_COMMENTS, '.java': C_COMMENTS, '.kt': C_COMMENTS, '.swift': C_COMMENTS, '.go': C_COMMENTS,
+    '.rs': C_COMMENTS, '.js': C_COMMENTS, '.jsx': C_COMMENTS, '.ts': C_COMMENTS, '.tsx': C_COMMENTS,
+    '.scss': C_COMMENTS, '.dart': C_COMMENTS, '.scala': C_COMMENTS,
+    '.php': ((b'//', b'#'), ((b'/*', b'*/'),)),
+    '.css': ((), ((b'/*', b'*/'),)),
+    '.sql': ((b'--',), ((b'/*', b'*/'),)),
+    '.lua': ((b'--',), ((b'--[[', b']]'),)),
+    '.html': ((), ((b'<!--', b'-->'),)), '.xml': ((), ((b'<!--', b'-->'),)),
+    '.vue': ((b'//',), ((b'/*', b'*/'), (b'<!--', b'-->'))),
+}
 
-def print_file_tree(path, prefix="", is_last=True):
-    """Recursively print file tree"""
-    try:
-        items = sorted(os.listdir(path))
-        dirs = [item for item in items if os.path.isdir(os.path.join(path, item))]
-        files = [item for item in items if os.path.isfile(os.path.join(path, item))]
+# Line statistics of fewer files than this are computed in-process
+PARALLEL_STATS_MIN_FILES = 64
+
+# Bytes hashed from the start of same-size files before the remaining candidates are hashed in full
+PARTIAL_HASH_BYTES = 4096
+
+
+class DirectoryNode:
+    """One directory of a scanned tree, with counts aggregated over everything below it"""
+    
+    def __init__(self, name):
+        self.name = name
+        # Entries of the files directly in this directory and child nodes, both sorted by name
+        self.files = []
+        self.children = []
+        # Error raised while listing this directory, if any
+        self.error = None
+        # Aggregates over the whole subtree
+        self.file_count = 0
+        self.dir_count = 0
+        self.extension_count = {}
+
+
+def get_extension(file_name):
+    """Return the lowercase extension used in the statistics, or '[no extension]'"""
+    _, ext = os.path.splitext(file_name)
+    # If no extension, use special identifier
+    return ext.lower() if ext else "[no extension]"
+
+
+def scan_directory(path, files=None):
+    """Build the directory tree of path in a single walk and aggregate its counts bottom-up
+
+    When files is given, the tree holds only those files and the directories leading to them.
+    """
+    root = DirectoryNode(os.path.basename(os.path.abspath(path)))
+    # Every node in the order it was created, so parents always precede their children
+    nodes = [root]
+    
+    if files is None:
+        nodes_by_dir = {'': root}
         
-        # Print files first
-        for i, file in enumerate(files):
-            is_last_file = (i == len(files) - 1) and len(dirs) == 0
-            connector = "└── " if is_last_file else "├── "
-            print(f"{prefix}{connector}{file}")
+        def on_error(relative_dir, error):
+            nodes_by_dir[relative_dir].error = error
         
-        # Then print directories
-        for i, dir_name in enumerate(dirs):
-            is_last_dir = (i == len(dirs) - 1)
-            connector = "└── " if is_last_dir else "├── "
-            print(f"{prefix}{connector}{dir_name}/")
-            
-            # Recursively print subdirectories
-            new_prefix = prefix + ("    " if is_last_dir else "│   ")
-            print_file_tree(os.path.join(path, dir_name), new_prefix, is_last_dir)
-            
-    except PermissionError:
-        print(f"{prefix}├── [Permission Denied]")
-    except Exception as e:
-        print(f"{prefix}├── [Error: {e}]")
+        for relative_dir, file_entries, subdirectories in iter_directories(path, on_error):
+            node = nodes_by_dir[relative_dir]
+            node.files = file_entries
+            for entry in subdirectories:
+                child = DirectoryNode(entry.name)
+                node.children.append(child)
+                nodes_by_dir[f"{relative_dir}/{entry.name}" if relative_dir else entry.name] = child
+                nodes.append(child)
+    else:
+        for entry in iter_file_entries(path, files):
+            node = root
+            for part in os.path.relpath(entry.path, path).split(os.sep)[:-1]:
+                child = next((child for child in node.children if child.name == part), None)
+                if child is None:
+                    child = DirectoryNode(part)
+                    node.children.append(child)
+                    nodes.append(child)
+                node = child
+            node.files.append(entry)
+        for node in nodes:
+            node.children.sort(key=lambda child: child.name)
+    
+    # Children come after their parents, so walking backwards finishes every subtree before its parent;
+    # a directory's own files are counted before its children, keeping extensions in walk order
+    for node in nodes:
+        node.file_count = len(node.files)
+        for entry in node.files:
+            ext = get_extension(entry.name)
+            node.extension_count[ext] = node.extension_count.get(ext, 0) + 1
+    for node in reversed(nodes):
+        for child in node.children:
+            node.file_count += child.file_count
+            node.dir_count += child.dir_count + 1
+            for ext, count in child.extension_count.items():
+                node.extension_count[ext] = node.extension_count.get(ext, 0) + count
+    
+    return root
 
 
-def count_files_by_extension(path):
-    """Recursively count files by extension in specified path"""
-    extension_count = {}
-    total_files = 0
+def classify_lines(data, syntax):
+    """Count (code, comment, blank) lines of a file's bytes, cloc-style
+
+    A line is blank if it holds only whitespace and a comment line if it holds nothing but comment;
+    comment markers inside strings are not recognised.
+    """
+    line_prefixes, block_pairs = syntax
+    # Block starts that also begin with a line prefix (such as Lua's '--[[') are checked first
+    starts = tuple(start for start, _ in block_pairs)
+    code = comment = blank = 0
+    block_end = None
+    
+    lines = data.split(b'\n')
+    if not lines[-1]:
+        # The text after a final newline is not a line
+        lines.pop()
+    for line in lines:
+        line = line.strip()
+        if block_end is not None:
+            # Inside a block comment; code after its end makes it a code line
+            position = line.find(block_end)
+            if position == -1:
+                comment += 1
+                continue
+            rest = line[position + len(block_end):].strip()
+            block_end = None
+            if not rest:
+                comment += 1
+                continue
+            line = rest
+        elif not line:
+            blank += 1
+            continue
+        
+        if line.startswith(starts):
+            start, end = next(pair for pair in block_pairs if line.startswith(pair[0]))
+            position = line.find(end, len(start))
+            if position == -1:
+                block_end = end
+                comment += 1
+                continue
+            if not line[position + len(end):].strip():
+                comment += 1
+                continue
+        elif line.startswith(line_prefixes):
+            comment += 1
+            continue
+        
+        code += 1
+        # A block comment opened after code continues on the following lines
+        for start, end in block_pairs:
+            position = line.find(start)
+            if position != -1 and line.find(end, position + len(start)) == -1:
+                block_end = end
+                break
+    
+    return code, comment, blank
+
+
+def count_file_stats(file_path):
+    """Return (lines, code, comment, blank) for a text file, with None for the last three if its
+    language is unknown, or None for binary and unreadable files"""
+    file_name = os.path.basename(file_path)
+    # Known binary types are not opened at all
+    if should_skip_file(file_name):
+        return None
     
     try:
-        for root, dirs, files in os.walk(path):
-            for file in files:
-                total_files += 1
-                # Get file extension
-                _, ext = os.path.splitext(file)
-                
-                # If no extension, use special identifier
-                if not ext:
-                    ext = "[no extension]"
-                else:
-                    # Convert to lowercase
-                    ext = ext.lower()
-                
-                # Count
-                extension_count[ext] = extension_count.get(ext, 0) + 1
-                
-    except PermissionError:
-        print(f"Error: Permission denied for path '{path}'")
-        return {}, 0
-    except Exception as e:
-        print(f"Error: {e}")
-        return {}, 0
+        syntax = COMMENT_SYNTAX.get(get_extension(file_name))
+        if syntax is None:
+            # Only the total is needed, so count newlines without splitting the file into lines
+            line_count = count_file_lines(file_path)
+            return None if line_count is None else (line_count, None, None, None)
+        
+        data = read_binary_file(file_path)
+        if data is None:
+            return None
+        code, comment, blank = classify_lines(data, syntax)
+        return code + comment + blank, code, comment, blank
+    except OSError:
+        return None
+
+
+def iter_file_stats(file_paths):
+    """Yield count_file_stats results in input order, spreading large trees across all CPU cores"""
+    if len(file_paths) < PARALLEL_STATS_MIN_FILES or (os.cpu_count() or 1) < 2:
+        yield from map(count_file_stats, file_paths)
+        return
     
-    return extension_count, total_files
+    with ProcessPoolExecutor() as executor:
+        yield from executor.map(count_file_stats, file_paths, chunksize=32)
+
+
+def stored_file_stats(manifest, entry, stat):
+    """Return the count_file_stats result an earlier run stored for an unchanged file, or None"""
+    stats = manifest.get(entry.path, stat, 'line_stats')
+    if stats is None and get_extension(entry.name) not in COMMENT_SYNTAX:
+        # A line count from --prolix is all the statistics need for unknown languages
+        line_count = manifest.get(entry.path, stat, 'lines')
+        if line_count is not None:
+            stats = (line_count, None, None, None)
+    return stats
+
+
+def list_tree_files(root):
+    """Return the entries of every file in a scanned tree"""
+    entries = []
+    nodes = [root]
+    while nodes:
+        node = nodes.pop()
+        entries.extend(node.files)
+        nodes.extend(node.children)
+    return entries
+
+
+def collect_line_statistics(root, count_lines=True):
+    """Sum files, bytes and line counts per extension over every file of a scanned tree
+
+    Returns extension -> [files, bytes, lines, code, comment, blank], where code, comment and blank
+    stay None for extensions whose comment syntax is unknown. Files whose statistics are in the
+    manifest and unchanged are not read again; without count_lines no file is read and only the
+    files and bytes are filled in from the walk.
+    """
+    entries = list_tree_files(root)
+    manifest = get_manifest()
+    file_stats = [None] * len(entries)
+    changed = []
+    for position, entry in enumerate(entries if count_lines else ()):
+        stat = None
+        if manifest is not None:
+            try:
+                stat = entry.stat()
+            except OSError:
+                pass
+        if stat is not None:
+            # Known binary files have no line statistics
+            if manifest.get(entry.path, stat, 'binary'):
+                continue
+            file_stats[position] = stored_file_stats(manifest, entry, stat)
+            if file_stats[position] is not None:
+                continue
+        changed.append((position, stat))
+    
+    for (position, stat), stats in zip(changed, iter_file_stats([entries[position].path for position, _ in changed])):
+        file_stats[position] = stats
+        if stats is not None and stat is not None:
+            manifest.put(entries[position].path, stat, lines=stats[0], line_stats=stats)
+    
+    statistics = {}
+    for entry, stats in zip(entries, file_stats):
+        ext = get_extension(entry.name)
+        totals = statistics.get(ext)
+        if totals is None:
+            known = ext in COMMENT_SYNTAX
+            totals = statistics[ext] = [0, 0, 0, 0 if known else None, 0 if known else None, 0 if known else None]
+        totals[0] += 1
+        try:
+            totals[1] += entry.stat().st_size
+        except OSError:
+            pass
+        if stats is None:
+            continue
+        for index, value in enumerate(stats, 2):
+            if value is not None and totals[index] is not None:
+                totals[index] += value
+    return statistics
+
+
+def hash_file(file_path, limit=None):
+    """Return the sha256 hex digest of the first limit bytes of a file, or of the whole file"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        if limit is not None:
+            digest.update(f.read(limit))
+        else:
+            while True:
+                block = f.read(COUNT_BLOCK_SIZE)
+                if not block:
+                    break
+                digest.update(block)
+    return digest.hexdigest()
 
 
-def detect_files_in_directory(path):
-    """Detect and display directory information"""
+def split_by_hash(groups, field, limit=None, manifest=None):
+    """Split groups of (entry, stat) pairs by a hash of their contents, dropping files left without a twin
+
+    Hashes are stored in the manifest under field, so unchanged files are not read again.
+    """
+    def file_hash(item):
+        entry, stat = item
+        if manifest is not None:
+            digest = manifest.get(entry.path, stat, field)
+            if digest is not None:
+                return digest
+        try:
+            digest = hash_file(entry.path, limit)
+        except OSError:
+            return None
+        if manifest is not None:
+            manifest.put(entry.path, stat, **{field: digest})
+        return digest
+    
+    items = [item for group in groups for item in group]
+    with ThreadPoolExecutor() as executor:
+        digests = iter(list(executor.map(file_hash, items)))
+    
+    refined = []
+    for group in groups:
+        by_hash = {}
+        for item in group:
+            digest = next(digests)
+            if digest is not None:
+                by_hash.setdefault(digest, []).append(item)
+        refined.extend(same_hash for same_hash in by_hash.values() if len(same_hash) > 1)
+    return refined
+
+
+def find_duplicate_files(root):
+    """Return (size, entries) for every group of files in a scanned tree with identical contents
+
+    Files are grouped by size first; only same-size files have their first PARTIAL_HASH_BYTES hashed,
+    and only files still sharing a partial hash are hashed in full. Empty files are left out. Groups
+    are sorted by the bytes their extra copies waste, largest first.
+    """
+    by_size = {}
+    for entry in list_tree_files(root):
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue
+        if stat.st_size:
+            by_size.setdefault(stat.st_size, []).append((entry, stat))
+    
+    manifest = get_manifest()
+    groups = split_by_hash([group for group in by_size.values() if len(group) > 1], 'partial_hash',
+                           PARTIAL_HASH_BYTES, manifest)
+    # The partial hash already covers the whole of small files
+    small_groups = [group for group in groups if group[0][1].st_size <= PARTIAL_HASH_BYTES]
+    large_groups = [group for group in groups if group[0][1].st_size > PARTIAL_HASH_BYTES]
+    groups = small_groups + split_by_hash(large_groups, 'file_hash', manifest=manifest)
+    
+    duplicates = [
+        (group[0][1].st_size, sorted((entry for entry, _ in group), key=lambda entry: entry.path))
+        for group in groups
+    ]
+    duplicates.sort(key=lambda duplicate: (-duplicate[0] * (len(duplicate[1]) - 1), duplicate[1][0].path))
+    return duplicates
+
+
+def format_count(value):
+    """Format a statistic with thousands separators, or '-' when it is unknown"""
+    return "-" if value is None else f"{value:,}"
+
+
+def describe_collapsed(node):
+    """Return the summary line that stands in for a directory's hidden contents"""
+    return f"+ {node.file_count:,} files, {node.dir_count:,} dirs"
+
+
+def print_file_tree(node, output, prefix="", max_depth=None, depth=0):
+    """Recursively print the file tree of a scanned directory
+
+    Directories deeper than max_depth are not expanded; their contents are summarised in one line
+    from the aggregated counts instead.
+    """
+    if max_depth is not None and depth >= max_depth:
+        if node.file_count or node.dir_count:
+            output.line(f"{prefix}└── {describe_collapsed(node)}")
+        return
+    
+    if node.error is not None:
+        if isinstance(node.error, PermissionError):
+            output.line(f"{prefix}├── [Permission Denied]")
+        else:
+            output.line(f"{prefix}├── [Error: {node.error}]")
+    
+    # Print files first
+    for i, entry in enumerate(node.files):
+        is_last_file = (i == len(node.files) - 1) and len(node.children) == 0
+        connector = "└── " if is_last_file else "├── "
+        output.line(f"{prefix}{connector}{entry.name}")
+    
+    # Then print directories
+    for i, child in enumerate(node.children):
+        is_last_dir = (i == len(node.children) - 1)
+        connector = "└── " if is_last_dir else "├── "
+        output.line(f"{prefix}{connector}{child.name}/")
+        
+        # Recursively print subdirectories
+        new_prefix = prefix + ("    " if is_last_dir else "│   ")
+        print_file_tree(child, output, new_prefix, max_depth, depth + 1)
+
+
+def print_duplicate_files(duplicates, path, output):
+    """Print groups of identical files with the bytes wasted by each group's extra copies"""
+    output.line("\nDuplicate files:")
+    output.line("-" * 60)
+    if not duplicates:
+        output.line("  No duplicate files found.")
+        return
+    
+    total_files = 0
+    total_wasted = 0
+    for size, entries in duplicates:
+        wasted = size * (len(entries) - 1)
+        total_files += len(entries)
+        total_wasted += wasted
+        output.line(f"  {len(entries)} copies of {size:,} bytes, {wasted:,} bytes wasted:")
+        for entry in entries:
+            output.line(f"    {os.path.relpath(entry.path, path)}")
+    
+    output.line("-" * 60)
+    output.line(f"  Duplicate groups: {len(duplicates):,}, files: {total_files:,}, wasted bytes: {total_wasted:,}")
+
+
+def detect_files_in_directory(path, files=None, max_depth=None, summary_only=False, duplicates=False,
+                              line_stats=False):
+    """Detect and display directory information
+
+    max_depth limits how many directory levels of the tree are expanded and summary_only leaves the
+    tree out; the statistics always cover the whole directory. Only the walk's stat results are used
+    unless line_stats adds cloc-style line counts or duplicates a report of files with identical
+    contents.
+    """
+    output = BufferedOutput()
     try:
         if not os.path.exists(path):
             print(f"Error: Path '{path}' does not exist")
@@ -77,34 +446,72 @@ def detect_files_in_directory(path):
             print(f"Error: '{path}' is not a directory")
             return
         
-        print(f"Directory tree for: {os.path.abspath(path)}")
-        print("=" * 50)
-        
-        # Print root directory name
-        print(f"{os.path.basename(os.path.abspath(path))}/")
-        
-        # Print file tree
-        print_file_tree(path)
+        if max_depth is not None and max_depth < 0:
+            print("Error: --max-depth cannot be negative")
+            return
         
-        print("=" * 50)
+        # One walk builds the tree and every statistic below
+        root = scan_directory(path, files)
         
-        # Recursively count files and extension distribution
-        extension_count, total_files = count_files_by_extension(path)
+        if not summary_only:
+            output.line(f"Directory tree for: {os.path.abspath(path)}")
+            output.line("=" * 50)
+            
+            # Print root directory name
+            output.line(f"{root.name}/")
+            
+            # Print file tree, limited to the selected files when a subset is given
+            print_file_tree(root, output, max_depth=max_depth)
+            
+            output.line("=" * 50)
+        else:
+            output.line(f"Directory summary for: {os.path.abspath(path)}")
+            output.line("=" * 50)
         
-        print(f"Total files found: {total_files}")
+        output.line(f"Total files found: {root.file_count}")
+        output.line(f"Total directories found: {root.dir_count}")
         
-        if extension_count:
-            print("\nFile extension statistics:")
-            print("-" * 30)
+        if root.extension_count:
+            output.line("\nFile extension statistics:")
+            output.line("-" * 30)
             
             # Sort by file count in descending order
-            sorted_extensions = sorted(extension_count.items(), key=lambda x: x[1], reverse=True)
+            sorted_extensions = sorted(root.extension_count.items(), key=lambda x: x[1], reverse=True)
             
             for ext, count in sorted_extensions:
-                if ext == "[no extension]":
-                    print(f"  {ext:<15}: {count:>4} files")
-                else:
-                    print(f"  {ext:<15}: {count:>4} files")
+                output.line(f"  {ext:<15}: {count:>4} files")
+            
+            # Bytes, plus cloc-style line counts with line_stats, sorted by total lines or bytes
+            statistics = collect_line_statistics(root, count_lines=line_stats)
+            headers = ('Files', 'Bytes', 'Lines', 'Code', 'Comment', 'Blank')
+            widths = (8, 14, 11, 11, 10, 10)
+            columns = 6 if line_stats else 2
+            rule = "-" * (17 + sum(widths[:columns]) + columns - 1)
+            output.line("\nFile line statistics:" if line_stats else "\nFile size statistics:")
+            output.line(rule)
+            output.line(f"  {'Extension':<15} " + " ".join(
+                f"{header:>{width}}" for header, width in zip(headers[:columns], widths)
+            ))
+            
+            totals = [0] * columns
+            sort_column = 2 if line_stats else 1
+            for ext, values in sorted(statistics.items(), key=lambda x: x[1][sort_column], reverse=True):
+                output.line(f"  {ext:<15} " + " ".join(
+                    f"{format_count(value):>{width}}" for value, width in zip(values[:columns], widths)
+                ))
+                for index, value in enumerate(values[:columns]):
+                    totals[index] += value or 0
+            
+            output.line(rule)
+            output.line(f"  {'Total':<15} " + " ".join(
+                f"{format_count(value):>{width}}" for value, width in zip(totals, widths)
+            ))
         
+        if duplicates:
+            print_duplicate_files(find_duplicate_files(root), path, output)
+        
+        output.flush()
+    
     except Exception as e:
+        output.flush()
         print(f"Error: {e}")
\ No newline at end of file
@@ -2,11 +2,15 @@
 """vibot function command implementation - AI-powered function quality analysis"""
 
 import os
+import ast
 import json
 import sys
 import subprocess
 import time
-from ..utils import should_skip_file, Colors
+import threading
+from ..utils import Colors
+from ..ai import iter_source_files, run_planned, get_client, AnalysisPlan, plan_file
+from ..chunking import DEFAULT_CHUNK_CHARS
 
 # Try to import openai, provide installation hint if failed
 try:
@@ -15,6 +19,21 @@ try:
 except ImportError:
     OPENAI_AVAILABLE = False
 
+# Bump when the prompt or result format changes to invalidate cached results
+PROMPT_VERSION = 2
+
+# Supported file extensions for this analysis
+SUPPORTED_EXTENSIONS = {'.py', '.js', '.ts', '.java', '.cpp', '.c', '.cs', '.php', '.rb', '.go', '.kt', '.swift', '.rs'}
+
+# Files with less content than this are skipped
+MIN_CONTENT_LENGTH = 20
+
+# Functions exempt from the type annotation check
+ANNOTATION_EXEMPT_FUNCTIONS = {'__init__', '__str__', '__repr__'}
+
+# Where findings and their line numbers live in the AI result
+RESULT_FIELDS = {'list_key': 'issues', 'flag_key': 'has_issues'}
+
 # Token usage tracking for function analysis
 class FunctionTokenTracker:
     def __init__(self):
@@ -24,19 +43,21 @@ class FunctionTokenTracker:
         self.total_tokens = 0
         self.model_name = ""
         self.start_time = None
+        self._lock = threading.Lock()
         
     def start_tracking(self, model):
         self.model_name = model
         self.start_time = time.time()
         
     def add_usage(self, usage):
-        self.total_api_calls += 1
-        if hasattr(usage, 'prompt_tokens'):
-            self.total_prompt_tokens += usage.prompt_tokens
-        if hasattr(usage, 'completion_tokens'):
-            self.total_completion_tokens += usage.completion_tokens
-        if hasattr(usage, 'total_tokens'):
-            self.total_tokens += usage.total_tokens
+        with self._lock:
+            self.total_api_calls += 1
+            if hasattr(usage, 'prompt_tokens'):
+                self.total_prompt_tokens += usage.prompt_tokens
+            if hasattr(usage, 'completion_tokens'):
+                self.total_completion_tokens += usage.completion_tokens
+            if hasattr(usage, 'total_tokens'):
+                self.total_tokens += usage.total_tokens
             
     def print_summary(self):
         if self.total_api_calls > 0:
@@ -57,17 +78,105 @@ class FunctionTokenTracker:
 function_token_tracker = FunctionTokenTracker()
 
 
-def analyze_code_functions_with_ai(file_content, file_path, api_key, api_proxy, model, max_lines=50, max_params=5):
+def measure_python_functions(file_content):
+    """Return exact metrics of every function in Python source, or None if it cannot be parsed"""
+    try:
+        tree = ast.parse(file_content)
+    except (SyntaxError, ValueError):
+        return None
+
+    function_metrics = []
+
+    def visit(node, in_class):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                function_metrics.append(measure_function(child, in_class))
+                visit(child, False)
+            else:
+                visit(child, in_class or isinstance(child, ast.ClassDef))
+
+    visit(tree, False)
+    if any(metrics['lines'] is None for metrics in function_metrics):
+        return None
+    return function_metrics
+
+
+def measure_function(node, is_method):
+    """Return line count, parameter count and missing annotations of one function definition"""
+    args = node.args
+    params = list(getattr(args, 'posonlyargs', [])) + list(args.args) + list(args.kwonlyargs)
+    if args.vararg:
+        params.append(args.vararg)
+    if args.kwarg:
+        params.append(args.kwarg)
+
+    # self / cls are not counted as parameters of a method
+    decorators = {getattr(decorator, 'id', None) for decorator in node.decorator_list}
+    if is_method and 'staticmethod' not in decorators and params and params[0].arg in ('self', 'cls'):
+        params = params[1:]
+
+    end_line = getattr(node, 'end_lineno', None)
+    exempt = node.name in ANNOTATION_EXEMPT_FUNCTIONS
+    return {
+        'function_name': node.name,
+        'line_number': node.lineno,
+        'lines': end_line - node.lineno + 1 if end_line is not None else None,
+        'parameters': len(params),
+        'missing_return_type': not exempt and node.returns is None,
+        'missing_param_types': 0 if exempt else sum(1 for param in params if param.annotation is None)
+    }
+
+
+def has_function_candidates(function_metrics, max_lines=50, max_params=5):
+    """Return True if any function exceeds a threshold or lacks type annotations"""
+    return any(
+        metrics['lines'] > max_lines
+        or metrics['parameters'] > max_params
+        or metrics['missing_return_type']
+        or metrics['missing_param_types'] > 0
+        for metrics in function_metrics
+    )
+
+
+def format_function_metrics(function_metrics):
+    """Render measured function metrics as prompt lines"""
+    if not function_metrics:
+        return "- No functions found"
+    return '\n'.join(
+        f"- {metrics['function_name']} (line {metrics['line_number']}): {metrics['lines']} lines, "
+        f"{metrics['parameters']} parameters, missing return type: {'yes' if metrics['missing_return_type'] else 'no'}, "
+        f"missing parameter types: {metrics['missing_param_types']}"
+        for metrics in function_metrics
+    )
+
+
+def analyze_code_functions_with_ai(file_content, file_path, api_key, api_proxy, model, max_lines=50, max_params=5, cache=None, function_metrics=None):
     """Analyze code functions using AI"""
     if not OPENAI_AVAILABLE:
         return None
+    
+    # Reuse the cached result if this exact content was analyzed before
+    cache_key = None
+    if cache is not None:
+        cache_key = cache.make_key(
+            file_content, 'function', model, PROMPT_VERSION,
+            {'max_lines': max_lines, 'max_params': max_params, 'measured': function_metrics is not None}
+        )
+        cached_result = cache.get(cache_key)
+        if cached_result is not None:
+            return cached_result
         
     try:
-        # Configure OpenAI client
-        client = openai.OpenAI(
-            api_key=api_key,
-            base_url=api_proxy
-        )
+        # Reuse the shared, connection-pooled OpenAI client
+        client = get_client(api_key, api_proxy)
+        
+        # Give the model exact measurements instead of asking it to estimate them
+        metrics_section = ""
+        if function_metrics is not None:
+            metrics_section = f"""
+Exact function metrics measured by a parser (line numbers refer to the code shown; use these numbers instead of estimating):
+{format_function_metrics(function_metrics)}
+"""
         
         # Build analysis prompt
         prompt = f"""
@@ -79,7 +188,7 @@ Code content:
 ```
 {file_content}
 ```
-
+{metrics_section}
 Please analyze all functions/methods in this code and return results strictly in the following JSON format:
 
 {{
@@ -163,6 +272,8 @@ Return valid JSON only, no additional text.
         
         try:
             result = json.loads(ai_response)
+            if cache_key is not None:
+                cache.put(cache_key, result)
             return result
         except json.JSONDecodeError as e:
             print(f"Warning: Failed to parse AI response as JSON: {e}")
@@ -183,7 +294,32 @@ Return valid JSON only, no additional text.
         return None
 
 
-def analyze_functions_in_directory(path, max_lines=50, max_params=5):
+def plan_function_file(item, api_key, api_proxy, model, max_lines=50, max_params=5, cache=None,
+                       diff_scope=None, chunk_chars=DEFAULT_CHUNK_CHARS):
+    """Plan the analysis of one source file, skipping the AI call when static metrics show no candidate issue"""
+    file_path, _, file_content = item
+    _, ext = os.path.splitext(file_path)
+    is_python = ext.lower() == '.py'
+
+    # Python functions can be measured exactly; a file with no candidate is clean without asking the model
+    if is_python:
+        function_metrics = measure_python_functions(file_content)
+        if function_metrics is not None and not has_function_candidates(function_metrics, max_lines, max_params):
+            return AnalysisPlan.done(
+                {"has_issues": False, "functions_analyzed": len(function_metrics), "issues": [], "static_check": True}
+            )
+
+    def analyze_text(content, label):
+        return analyze_code_functions_with_ai(
+            content, label, api_key, api_proxy, model,
+            max_lines, max_params, cache=cache,
+            function_metrics=measure_python_functions(content) if is_python else None
+        )
+
+    return plan_file(analyze_text, item, RESULT_FIELDS, diff_scope, chunk_chars)
+
+
+def analyze_functions_in_directory(path, max_lines=50, max_params=5, jobs=1, cache=None, files=None, diff_scope=None, chunk_chars=DEFAULT_CHUNK_CHARS):
     """Analyze function quality in directory using AI"""
     try:
         # Check if openai package is available
@@ -239,99 +375,80 @@ def analyze_functions_in_directory(path, max_lines=50, max_params=5):
         total_files_scanned = 0
         total_functions_analyzed = 0
         files_with_issues = 0
+        files_cleared_statically = 0
+        
+        source_files = iter_source_files(path, SUPPORTED_EXTENSIONS, min_content_length=MIN_CONTENT_LENGTH, files=files)
         
-        # Supported file extensions for function analysis
-        supported_extensions = {'.py', '.js', '.ts', '.java', '.cpp', '.c', '.cs', '.php', '.rb', '.go', '.kt', '.swift', '.rs'}
+        def plan(item):
+            return plan_function_file(
+                item, api_key, api_proxy, model, max_lines, max_params,
+                cache, diff_scope, chunk_chars
+            )
         
-        for root, dirs, files in os.walk(path):
-            for file in files:
-                file_path = os.path.join(root, file)
+        for (file_path, relative_path, file_content), analysis_result in run_planned(plan, source_files, jobs):
+            try:
+                total_files_scanned += 1
                 
-                # Skip non-code files
-                if should_skip_file(file):
-                    continue
-                    
-                # Only analyze supported file types
-                _, ext = os.path.splitext(file)
-                if ext.lower() not in supported_extensions:
+                print(f"Analyzing: {relative_path}...", end=" ")
+                
+                if analysis_result is None:
+                    print(f"{Colors.BRIGHT_ORANGE_RED}Failed{Colors.RESET}")
                     continue
                 
-                try:
-                    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                        file_content = f.read()
-                    
-                    # Skip empty files or too small files
-                    if len(file_content.strip()) < 20:
-                        continue
-                    
-                    total_files_scanned += 1
-                    relative_path = os.path.relpath(file_path, path)
-                    
-                    print(f"Analyzing: {relative_path}...", end=" ")
-                    
-                    # Analyze file with AI
-                    analysis_result = analyze_code_functions_with_ai(
-                        file_content, relative_path, api_key, api_proxy, model, 
-                        max_lines, max_params
-                    )
-                    
-                    if analysis_result is None:
-                        print(f"{Colors.BRIGHT_ORANGE_RED}Failed{Colors.RESET}")
-                        continue
-                    
-                    # Update function count
-                    total_functions_analyzed += analysis_result.get('functions_analyzed', 0)
+                # Update function count
+                total_functions_analyzed += analysis_result.get('functions_analyzed', 0)
+                if analysis_result.get('static_check'):
+                    files_cleared_statically += 1
+                
+                if analysis_result.get('has_issues', False) and analysis_result.get('issues'):
+                    files_with_issues += 1
+                    print(f"{Colors.BRIGHT_ORANGE_RED}Issues found{Colors.RESET}")
                     
-                    if analysis_result.get('has_issues', False) and analysis_result.get('issues'):
-                        files_with_issues += 1
-                        print(f"{Colors.BRIGHT_ORANGE_RED}Issues found{Colors.RESET}")
+                    # Display found issues
+                    for issue in analysis_result['issues']:
+                        print(f"\n{Colors.YELLOW}Function: {issue.get('function_name', 'Unknown')}(){Colors.RESET}")
+                        print(f"   File: {relative_path}")
+                        print(f"   Line: {issue.get('line_number', '?')}")
                         
-                        # Display found issues
-                        for issue in analysis_result['issues']:
-                            print(f"\n{Colors.YELLOW}Function: {issue.get('function_name', 'Unknown')}(){Colors.RESET}")
-                            print(f"   File: {relative_path}")
-                            print(f"   Line: {issue.get('line_number', '?')}")
-                            
-                            # Display metrics if available
-                            metrics = issue.get('metrics', {})
-                            if metrics:
-                                if 'estimated_lines' in metrics:
-                                    print(f"   Estimated Lines: {metrics.get('estimated_lines', '?')}")
-                                if 'estimated_parameters' in metrics:
-                                    print(f"   Estimated Parameters: {metrics.get('estimated_parameters', '?')}")
-                                if 'missing_return_type' in metrics and metrics.get('missing_return_type'):
-                                    print(f"   Missing Return Type: Yes")
-                                if 'missing_param_types' in metrics and metrics.get('missing_param_types', 0) > 0:
-                                    print(f"   Missing Parameter Types: {metrics.get('missing_param_types', 0)}")
-                            
-                            severity_color = Colors.BRIGHT_ORANGE_RED if issue.get('severity') == 'high' else Colors.YELLOW
-                            print(f"   {severity_color}⚠️  {issue.get('issue_type', 'Quality Issue')}: {issue.get('description', '')}{Colors.RESET}")
-                            if issue.get('suggestion'):
-                                print(f"   💡 {issue.get('suggestion', '')}")
-                            
-                            # Add to total results
-                            all_issues.append({
-                                'file': relative_path,
-                                'function': issue.get('function_name'),
-                                'line': issue.get('line_number'),
-                                'type': issue.get('issue_type'),
-                                'severity': issue.get('severity'),
-                                'description': issue.get('description'),
-                                'suggestion': issue.get('suggestion')
-                            })
-                    else:
-                        print(f"{Colors.YELLOW}Clean{Colors.RESET}")
-                
-                except (UnicodeDecodeError, PermissionError, IsADirectoryError):
-                    continue
-                except Exception as e:
-                    print(f"Error analyzing file {file_path}: {e}")
+                        # Display metrics if available
+                        metrics = issue.get('metrics', {})
+                        if metrics:
+                            if 'estimated_lines' in metrics:
+                                print(f"   Estimated Lines: {metrics.get('estimated_lines', '?')}")
+                            if 'estimated_parameters' in metrics:
+                                print(f"   Estimated Parameters: {metrics.get('estimated_parameters', '?')}")
+                            if 'missing_return_type' in metrics and metrics.get('missing_return_type'):
+                                print(f"   Missing Return Type: Yes")
+                            if 'missing_param_types' in metrics and metrics.get('missing_param_types', 0) > 0:
+                                print(f"   Missing Parameter Types: {metrics.get('missing_param_types', 0)}")
+                        
+                        severity_color = Colors.BRIGHT_ORANGE_RED if issue.get('severity') == 'high' else Colors.YELLOW
+                        print(f"   {severity_color}⚠️  {issue.get('issue_type', 'Quality Issue')}: {issue.get('description', '')}{Colors.RESET}")
+                        if issue.get('suggestion'):
+                            print(f"   💡 {issue.get('suggestion', '')}")
+                        
+                        # Add to total results
+                        all_issues.append({
+                            'file': relative_path,
+                            'function': issue.get('function_name'),
+                            'line': issue.get('line_number'),
+                            'type': issue.get('issue_type'),
+                            'severity': issue.get('severity'),
+                            'description': issue.get('description'),
+                            'suggestion': issue.get('suggestion')
+                        })
+                else:
+                    print(f"{Colors.YELLOW}Clean{Colors.RESET}")
+            
+            except Exception as e:
+                print(f"Error analyzing file {file_path}: {e}")
         
         print("\n" + "=" * 70)
         print(f"🔍 AI Function Quality Analysis Results:")
         print(f"  Files scanned: {total_files_scanned}")
         print(f"  Functions analyzed: {total_functions_analyzed}")
         print(f"  Files with issues: {files_with_issues}")
+        print(f"  Files cleared by static check (no AI call): {files_cleared_statically}")
         print(f"  Total function issues: {len(all_issues)}")
         
         if all_issues:
@@ -374,6 +491,8 @@ def analyze_functions_in_directory(path, max_lines=50, max_params=5):
         
         # Print token usage summary
         function_token_tracker.print_summary()
+        if cache is not None:
+            cache.print_summary()
         
     except Exception as e:
         print(f"Error: {e}")
\ No newline at end of file
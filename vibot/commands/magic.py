@@ -6,7 +6,10 @@ import json
 import sys
 import subprocess
 import time
-from ..utils import should_skip_file, Colors
+import threading
+from ..utils import Colors
+from ..ai import iter_source_files, run_batched, get_client, plan_file, analyze_batch_with_ai
+from ..chunking import DEFAULT_CHUNK_CHARS
 
 # Try to import openai, provide installation hint if failed
 try:
@@ -15,6 +18,18 @@ try:
 except ImportError:
     OPENAI_AVAILABLE = False
 
+# Bump when the prompt or result format changes to invalidate cached results
+PROMPT_VERSION = 1
+
+# Supported file extensions for this analysis
+SUPPORTED_EXTENSIONS = {'.py', '.js', '.ts', '.java', '.cpp', '.c', '.cs', '.php', '.rb', '.go', '.kt', '.swift', '.rs'}
+
+# Files with less content than this are skipped
+MIN_CONTENT_LENGTH = 20
+
+# Where findings and their line numbers live in the AI result
+RESULT_FIELDS = {'list_key': 'issues', 'flag_key': 'has_issues'}
+
 # Token usage tracking for magic detection analysis
 class MagicTokenTracker:
     def __init__(self):
@@ -24,19 +39,21 @@ class MagicTokenTracker:
         self.total_tokens = 0
         self.model_name = ""
         self.start_time = None
+        self._lock = threading.Lock()
         
     def start_tracking(self, model):
         self.model_name = model
         self.start_time = time.time()
         
     def add_usage(self, usage):
-        self.total_api_calls += 1
-        if hasattr(usage, 'prompt_tokens'):
-            self.total_prompt_tokens += usage.prompt_tokens
-        if hasattr(usage, 'completion_tokens'):
-            self.total_completion_tokens += usage.completion_tokens
-        if hasattr(usage, 'total_tokens'):
-            self.total_tokens += usage.total_tokens
+        with self._lock:
+            self.total_api_calls += 1
+            if hasattr(usage, 'prompt_tokens'):
+                self.total_prompt_tokens += usage.prompt_tokens
+            if hasattr(usage, 'completion_tokens'):
+                self.total_completion_tokens += usage.completion_tokens
+            if hasattr(usage, 'total_tokens'):
+                self.total_tokens += usage.total_tokens
             
     def print_summary(self):
         if self.total_api_calls > 0:
@@ -56,37 +73,15 @@ class MagicTokenTracker:
 # Global token tracker for magic detection analysis
 magic_token_tracker = MagicTokenTracker()
 
+# System prompt for magic analysis requests
+SYSTEM_PROMPT = "You are a professional code quality analysis expert. Analyze code for magic numbers and strings, return results in the specified JSON format only."
 
-def analyze_magic_values_with_ai(file_content, file_path, api_key, api_proxy, model):
-    """Analyze magic numbers and strings using AI"""
-    if not OPENAI_AVAILABLE:
-        return None
-        
-    try:
-        # Configure OpenAI client
-        client = openai.OpenAI(
-            api_key=api_key,
-            base_url=api_proxy
-        )
-        
-        # Build analysis prompt
-        prompt = f"""
-As a code quality expert, analyze the following code file for magic numbers and magic strings.
-
-File path: {file_path}
-
-Code content:
-```
-{file_content}
-```
-
-Please analyze the code and return results strictly in the following JSON format:
-
-{{
+# JSON result format the model returns for each file
+RESULT_FORMAT = """{
   "has_issues": true/false,
   "lines_analyzed": number_of_lines_analyzed,
   "issues": [
-    {{
+    {
       "line_number": line_number,
       "column_start": column_start_position,
       "column_end": column_end_position,
@@ -96,11 +91,12 @@ Please analyze the code and return results strictly in the following JSON format
       "magic_value": "the actual magic value found",
       "description": "detailed description of why this is a magic value",
       "suggestion": "specific suggestion with proposed constant name and value"
-    }}
+    }
   ]
-}}
+}"""
 
-Analysis criteria:
+# Analysis instructions shared by single-file and batched prompts
+ANALYSIS_CRITERIA = """Analysis criteria:
 1. Magic Numbers: Hardcoded numbers without clear meaning (except standard values like 0, 1, -1, 2, 10, 100)
 2. Magic Strings: Hardcoded strings that should be named constants (except simple display strings)
 
@@ -141,7 +137,54 @@ For each magic value found, provide:
 - Exact line and column position
 - The magic value itself
 - Why it's considered magic
-- Suggested constant name and usage
+- Suggested constant name and usage"""
+
+# Prompt pieces used to analyze several small files in one request
+BATCH_PROMPT = {
+    'command': 'magic',
+    'prompt_version': PROMPT_VERSION,
+    'intro': "As a code quality expert, analyze the following code files for magic numbers and magic strings.",
+    'system_prompt': SYSTEM_PROMPT,
+    'result_format': RESULT_FORMAT,
+    'criteria': ANALYSIS_CRITERIA,
+    'max_tokens_per_file': 3000,
+    'tracker': magic_token_tracker
+}
+
+
+def analyze_magic_values_with_ai(file_content, file_path, api_key, api_proxy, model, cache=None):
+    """Analyze magic numbers and strings using AI"""
+    if not OPENAI_AVAILABLE:
+        return None
+    
+    # Reuse the cached result if this exact content was analyzed before
+    cache_key = None
+    if cache is not None:
+        cache_key = cache.make_key(file_content, 'magic', model, PROMPT_VERSION)
+        cached_result = cache.get(cache_key)
+        if cached_result is not None:
+            return cached_result
+        
+    try:
+        # Reuse the shared, connection-pooled OpenAI client
+        client = get_client(api_key, api_proxy)
+        
+        # Build analysis prompt
+        prompt = f"""
+As a code quality expert, analyze the following code file for magic numbers and magic strings.
+
+File path: {file_path}
+
+Code content:
+```
+{file_content}
+```
+
+Please analyze the code and return results strictly in the following JSON format:
+
+{RESULT_FORMAT}
+
+{ANALYSIS_CRITERIA}
 
 Return valid JSON only, no additional text.
 """
@@ -149,7 +192,7 @@ Return valid JSON only, no additional text.
         response = client.chat.completions.create(
             model=model,
             messages=[
-                {"role": "system", "content": "You are a professional code quality analysis expert. Analyze code for magic numbers and strings, return results in the specified JSON format only."},
+                {"role": "system", "content": SYSTEM_PROMPT},
                 {"role": "user", "content": prompt}
             ],
             max_tokens=3000,
@@ -173,6 +216,8 @@ Return valid JSON only, no additional text.
         
         try:
             result = json.loads(ai_response)
+            if cache_key is not None:
+                cache.put(cache_key, result)
             return result
         except json.JSONDecodeError as e:
             print(f"Warning: Failed to parse AI response as JSON: {e}")
@@ -193,7 +238,7 @@ Return valid JSON only, no additional text.
         return None
 
 
-def analyze_magic_in_directory(path):
+def analyze_magic_in_directory(path, jobs=1, cache=None, files=None, diff_scope=None, chunk_chars=DEFAULT_CHUNK_CHARS, batch_tokens=0):
     """Analyze magic numbers and strings in directory using AI"""
     try:
         # Check if openai package is available
@@ -249,83 +294,70 @@ def analyze_magic_in_directory(path):
         total_lines_analyzed = 0
         files_with_issues = 0
         
-        # Supported file extensions for magic values analysis
-        supported_extensions = {'.py', '.js', '.ts', '.java', '.cpp', '.c', '.cs', '.php', '.rb', '.go', '.kt', '.swift', '.rs'}
+        source_files = iter_source_files(path, SUPPORTED_EXTENSIONS, min_content_length=MIN_CONTENT_LENGTH, files=files)
+        
+        def analyze_text(content, label):
+            return analyze_magic_values_with_ai(
+                content, label, api_key, api_proxy, model, cache=cache
+            )
+        
+        def plan(item):
+            return plan_file(analyze_text, item, RESULT_FIELDS, diff_scope, chunk_chars)
+        
+        def analyze_batch(items):
+            return analyze_batch_with_ai(items, BATCH_PROMPT, api_key, api_proxy, model, cache=cache)
         
-        for root, dirs, files in os.walk(path):
-            for file in files:
-                file_path = os.path.join(root, file)
+        # Batches carry whole files, so they are not used when only diff hunks are analyzed
+        if diff_scope is not None:
+            batch_tokens = 0
+        
+        for (file_path, relative_path, file_content), analysis_result in run_batched(plan, analyze_batch, source_files, batch_tokens, jobs):
+            try:
+                total_files_scanned += 1
                 
-                # Skip non-code files
-                if should_skip_file(file):
-                    continue
-                    
-                # Only analyze supported file types
-                _, ext = os.path.splitext(file)
-                if ext.lower() not in supported_extensions:
+                print(f"Analyzing: {relative_path}...", end=" ")
+                
+                if analysis_result is None:
+                    print(f"{Colors.BRIGHT_ORANGE_RED}Failed{Colors.RESET}")
                     continue
                 
-                try:
-                    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                        file_content = f.read()
-                    
-                    # Skip empty files or too small files
-                    if len(file_content.strip()) < 20:
-                        continue
-                    
-                    total_files_scanned += 1
-                    relative_path = os.path.relpath(file_path, path)
-                    
-                    print(f"Analyzing: {relative_path}...", end=" ")
-                    
-                    # Analyze file with AI
-                    analysis_result = analyze_magic_values_with_ai(
-                        file_content, relative_path, api_key, api_proxy, model
-                    )
-                    
-                    if analysis_result is None:
-                        print(f"{Colors.BRIGHT_ORANGE_RED}Failed{Colors.RESET}")
-                        continue
-                    
-                    # Update lines count
-                    total_lines_analyzed += analysis_result.get('lines_analyzed', 0)
+                # Update lines count
+                total_lines_analyzed += analysis_result.get('lines_analyzed', 0)
+                
+                if analysis_result.get('has_issues', False) and analysis_result.get('issues'):
+                    files_with_issues += 1
+                    print(f"{Colors.BRIGHT_ORANGE_RED}Issues found{Colors.RESET}")
                     
-                    if analysis_result.get('has_issues', False) and analysis_result.get('issues'):
-                        files_with_issues += 1
-                        print(f"{Colors.BRIGHT_ORANGE_RED}Issues found{Colors.RESET}")
+                    # Display found issues
+                    for issue in analysis_result['issues']:
+                        print(f"\n{Colors.YELLOW}Line {issue.get('line_number', '?')}:{issue.get('column_start', '?')}-{issue.get('column_end', '?')}:{Colors.RESET}")
+                        print(f"   File: {relative_path}")
+                        print(f"   Code: {issue.get('line_content', '').strip()}")
+                        print(f"   Magic Value: {Colors.BRIGHT_ORANGE_RED}{issue.get('magic_value', 'Unknown')}{Colors.RESET}")
                         
-                        # Display found issues
-                        for issue in analysis_result['issues']:
-                            print(f"\n{Colors.YELLOW}Line {issue.get('line_number', '?')}:{issue.get('column_start', '?')}-{issue.get('column_end', '?')}:{Colors.RESET}")
-                            print(f"   File: {relative_path}")
-                            print(f"   Code: {issue.get('line_content', '').strip()}")
-                            print(f"   Magic Value: {Colors.BRIGHT_ORANGE_RED}{issue.get('magic_value', 'Unknown')}{Colors.RESET}")
-                            
-                            severity_color = Colors.BRIGHT_ORANGE_RED if issue.get('severity') == 'high' else Colors.YELLOW
-                            print(f"   {severity_color}⚠️  {issue.get('issue_type', 'Magic Value')}: {issue.get('description', '')}{Colors.RESET}")
-                            if issue.get('suggestion'):
-                                print(f"   💡 {issue.get('suggestion', '')}")
-                            
-                            # Add to total results
-                            all_issues.append({
-                                'file': relative_path,
-                                'line': issue.get('line_number'),
-                                'column_start': issue.get('column_start'),
-                                'column_end': issue.get('column_end'),
-                                'type': issue.get('issue_type'),
-                                'severity': issue.get('severity'),
-                                'magic_value': issue.get('magic_value'),
-                                'description': issue.get('description'),
-                                'suggestion': issue.get('suggestion'),
-                                'line_content': issue.get('line_content', '')
-                            })
-                    else:
-                        print(f"{Colors.YELLOW}Clean{Colors.RESET}")
-                
-                except (UnicodeDecodeError, PermissionError, IsADirectoryError):
-                    continue
-                except Exception as e:
-                    print(f"Error analyzing file {file_path}: {e}")
+                        severity_color = Colors.BRIGHT_ORANGE_RED if issue.get('severity') == 'high' else Colors.YELLOW
+                        print(f"   {severity_color}⚠️  {issue.get('issue_type', 'Magic Value')}: {issue.get('description', '')}{Colors.RESET}")
+                        if issue.get('suggestion'):
+                            print(f"   💡 {issue.get('suggestion', '')}")
+                        
+                        # Add to total results
+                        all_issues.append({
+                            'file': relative_path,
+                            'line': issue.get('line_number'),
+                            'column_start': issue.get('column_start'),
+                            'column_end': issue.get('column_end'),
+                            'type': issue.get('issue_type'),
+                            'severity': issue.get('severity'),
+                            'magic_value': issue.get('magic_value'),
+                            'description': issue.get('description'),
+                            'suggestion': issue.get('suggestion'),
+                            'line_content': issue.get('line_content', '')
+                        })
+                else:
+                    print(f"{Colors.YELLOW}Clean{Colors.RESET}")
+            
+            except Exception as e:
+                print(f"Error analyzing file {file_path}: {e}")
         
         print("\n" + "=" * 70)
         print(f"🔍 AI Magic Numbers/Strings Detection Results:")
@@ -372,6 +404,8 @@ def analyze_magic_in_directory(path):
         
         # Print token usage summary
         magic_token_tracker.print_summary()
+        if cache is not None:
+            cache.print_summary()
         
     except Exception as e:
         print(f"Error: {e}")
\ No newline at end of file
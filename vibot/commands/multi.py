@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""vibot multi-check command implementation - run several AI analyses in one pass"""
+
+import os
+import sys
+import subprocess
+from ..utils import Colors
+from ..ai import iter_source_files, run_planned, plan_file
+from ..chunking import DEFAULT_CHUNK_CHARS
+from . import ustalony, function, readability, comment, magic, overlap, naming
+
+# Try to import openai, provide installation hint if failed
+try:
+    import openai
+    OPENAI_AVAILABLE = True
+except ImportError:
+    OPENAI_AVAILABLE = False
+
+# Check name -> (report title, command module), in report order
+CHECKS = {
+    'ustalony': ('Hardcoded Secrets', ustalony),
+    'function': ('Function Quality', function),
+    'readability': ('Readability', readability),
+    'comment': ('Comments', comment),
+    'magic': ('Magic Values', magic),
+    'overlap': ('Duplicate Code', overlap),
+    'name': ('Naming', naming),
+}
+
+# Token tracker of each command module
+TOKEN_TRACKERS = {
+    'ustalony': ustalony.token_tracker,
+    'function': function.function_token_tracker,
+    'readability': readability.readability_token_tracker,
+    'comment': comment.comment_token_tracker,
+    'magic': magic.magic_token_tracker,
+    'overlap': overlap.overlap_token_tracker,
+    'name': naming.naming_token_tracker,
+}
+
+
+def parse_checks(checks):
+    """Parse a comma-separated check list into known check names, or None if one is unknown"""
+    if not checks:
+        return list(CHECKS)
+
+    selected = []
+    for check in checks.split(','):
+        check = check.strip().lower()
+        if not check:
+            continue
+        if check not in CHECKS:
+            print(f"Error: Unknown check '{check}'. Available checks: {', '.join(CHECKS)}")
+            return None
+        if check not in selected:
+            selected.append(check)
+
+    if not selected:
+        print(f"Error: No checks selected. Available checks: {', '.join(CHECKS)}")
+        return None
+    # Keep the report order stable regardless of how the checks were listed
+    return [check for check in CHECKS if check in selected]
+
+
+def is_applicable(check, file_path, file_content):
+    """Return True if the check's command would analyze this file on its own"""
+    module = CHECKS[check][1]
+    if module.SUPPORTED_EXTENSIONS is not None:
+        _, ext = os.path.splitext(file_path)
+        if ext.lower() not in module.SUPPORTED_EXTENSIONS:
+            return False
+    return len(file_content.strip()) >= module.MIN_CONTENT_LENGTH
+
+
+def describe_finding(entry, result_fields):
+    """Return (line, issue_type) for a finding of any check"""
+    line_key = result_fields.get('line_key', 'line_number')
+    nested_key = result_fields.get('nested_key')
+    end_key = result_fields.get('end_key')
+
+    if nested_key:
+        lines = [
+            location.get(line_key) for location in entry.get(nested_key) or []
+            if isinstance(location, dict) and location.get(line_key) is not None
+        ]
+        line = ', '.join(str(line) for line in lines) if lines else '?'
+    else:
+        line = entry.get(line_key, '?')
+        end = entry.get(end_key) if end_key else None
+        if end is not None and end != line:
+            line = f"{line}-{end}"
+
+    issue_type = entry.get('issue_type') or entry.get('duplication_type') or 'Issue'
+    return line, issue_type
+
+
+def print_combined_token_summary(checks):
+    """Print one token usage summary summed over the trackers of every check that ran"""
+    combined = ustalony.TokenUsageTracker()
+    for check in checks:
+        tracker = TOKEN_TRACKERS[check]
+        combined.model_name = tracker.model_name
+        if tracker.start_time and (combined.start_time is None or tracker.start_time < combined.start_time):
+            combined.start_time = tracker.start_time
+        combined.total_api_calls += tracker.total_api_calls
+        combined.total_prompt_tokens += tracker.total_prompt_tokens
+        combined.total_completion_tokens += tracker.total_completion_tokens
+        combined.total_tokens += tracker.total_tokens
+    combined.print_summary()
+
+
+def analyze_all_in_directory(path, checks=None, max_lines=50, max_params=5, max_line_length=80,
+                             min_duplicate_lines=3, jobs=1, cache=None, files=None, diff_scope=None,
+                             chunk_chars=DEFAULT_CHUNK_CHARS, offline=False):
+    """Run several AI analyses over a directory, reading every file once
+
+    offline makes the ustalony check report the local scanner's findings without calling the AI.
+    """
+    try:
+        checks = parse_checks(checks)
+        if checks is None:
+            return
+
+        # Only an offline secret scan runs without the AI
+        needs_ai = not (offline and checks == ['ustalony'])
+
+        # Check if openai package is available
+        if not OPENAI_AVAILABLE and needs_ai:
+            print(f"{Colors.BRIGHT_ORANGE_RED}❌ Error: openai package not found{Colors.RESET}")
+            print("The openai package is required for AI-powered code analysis.")
+            print("\nTrying to install openai package...")
+
+            try:
+                # Try to auto-install openai package
+                subprocess.check_call([sys.executable, "-m", "pip", "install", "openai"])
+                print(f"{Colors.YELLOW}✅ Successfully installed openai package{Colors.RESET}")
+                print("Please run the command again to use AI code analysis.")
+                return
+            except subprocess.CalledProcessError:
+                print(f"{Colors.BRIGHT_ORANGE_RED}❌ Failed to install openai package{Colors.RESET}")
+                print("Please install it manually with: pip install openai")
+                return
+
+        # Check required environment variables
+        api_key = os.getenv('VIBOT_API_KEY')
+        api_proxy = os.getenv('VIBOT_API_PROXY')
+        model = os.getenv('VIBOT_API_MODEL', 'deepseek-v3')
+
+        if (not api_key or not api_proxy) and needs_ai:
+            print(f"{Colors.BRIGHT_ORANGE_RED}❌ Error: AI API configuration missing{Colors.RESET}")
+            print("Please set the following environment variables:")
+            print("  VIBOT_API_KEY - Your API key")
+            print("  VIBOT_API_PROXY - API proxy URL")
+            print("  VIBOT_API_MODEL - Model name (optional, default: deepseek-v3)")
+            print("\nExample:")
+            print("  export VIBOT_API_KEY='your-api-key'")
+            print("  export VIBOT_API_PROXY='https://api.deepseek.com'")
+            return
+
+        if not os.path.exists(path):
+            print(f"Error: Path '{path}' does not exist")
+            return
+
+        if not os.path.isdir(path):
+            print(f"Error: '{path}' is not a directory")
+            return
+
+        # Initialize token tracking
+        for check in checks:
+            TOKEN_TRACKERS[check].start_tracking(model)
+
+        print(f"🤖 AI-powered multi-check analysis in: {os.path.abspath(path)}")
+        print(f"Using model: {model}")
+        print(f"Checks: {', '.join(CHECKS[check][0] for check in checks)}")
+        print("=" * 70)
+
+        # Per-file prompt builders for every check
+        analyzers = {
+            'comment': lambda content, label: comment.analyze_code_comments_with_ai(
+                content, label, api_key, api_proxy, model, cache=cache
+            ),
+            'magic': lambda content, label: magic.analyze_magic_values_with_ai(
+                content, label, api_key, api_proxy, model, cache=cache
+            ),
+            'overlap': lambda content, label: overlap.analyze_code_overlap_with_ai(
+                content, label, api_key, api_proxy, model, min_duplicate_lines, cache=cache
+            ),
+            'name': lambda content, label: naming.analyze_naming_with_ai(
+                content, label, api_key, api_proxy, model, cache=cache
+            ),
+        }
+
+        # Checks with a local pre-check plan whole files themselves
+        file_analyzers = {
+            'ustalony': lambda item: ustalony.plan_secrets_file(
+                item, api_key, api_proxy, model, cache, diff_scope, chunk_chars, offline=offline
+            ),
+            'function': lambda item: function.plan_function_file(
+                item, api_key, api_proxy, model, max_lines, max_params,
+                cache, diff_scope, chunk_chars
+            ),
+            'readability': lambda item: readability.plan_readability_file(
+                item, api_key, api_proxy, model, max_line_length,
+                cache, diff_scope, chunk_chars
+            ),
+        }
+
+        # Walk and read once with the widest filter of the selected checks
+        extension_sets = [CHECKS[check][1].SUPPORTED_EXTENSIONS for check in checks]
+        supported_extensions = None if None in extension_sets else set().union(*extension_sets)
+        min_content_length = min(CHECKS[check][1].MIN_CONTENT_LENGTH for check in checks)
+        source_files = iter_source_files(path, supported_extensions, min_content_length=min_content_length, files=files)
+
+        def iter_tasks():
+            for item in source_files:
+                file_path, _, file_content = item
+                file_checks = [check for check in checks if is_applicable(check, file_path, file_content)]
+                for index, check in enumerate(file_checks):
+                    yield item, check, index == len(file_checks) - 1
+
+        def plan(task):
+            item, check, _ = task
+            if check in file_analyzers:
+                return file_analyzers[check](item)
+            return plan_file(analyzers[check], item, CHECKS[check][1].RESULT_FIELDS, diff_scope, chunk_chars)
+
+        all_issues = []
+        total_files_scanned = 0
+        files_with_issues = 0
+        file_results = []
+
+        # Fan every (file, check) pair out to the model; results come back grouped by file in order
+        for (item, check, is_last_check), analysis_result in run_planned(plan, iter_tasks(), jobs):
+            file_results.append((check, analysis_result))
+            if not is_last_check:
+                continue
+
+            file_path, relative_path, _ = item
+            try:
+                total_files_scanned += 1
+
+                print(f"Analyzing: {relative_path}...", end=" ")
+
+                file_issues = []
+                failed_checks = []
+                for result_check, result in file_results:
+                    if result is None:
+                        failed_checks.append(CHECKS[result_check][0])
+                        continue
+                    result_fields = CHECKS[result_check][1].RESULT_FIELDS
+                    if result.get(result_fields['flag_key'], False):
+                        for entry in result.get(result_fields['list_key']) or []:
+                            if isinstance(entry, dict):
+                                file_issues.append((result_check, entry))
+
+                if file_issues:
+                    files_with_issues += 1
+                    print(f"{Colors.BRIGHT_ORANGE_RED}Issues found{Colors.RESET}")
+                elif failed_checks:
+                    print(f"{Colors.BRIGHT_ORANGE_RED}Failed{Colors.RESET}")
+                else:
+                    print(f"{Colors.YELLOW}Clean{Colors.RESET}")
+
+                if failed_checks:
+                    print(f"   {Colors.BRIGHT_ORANGE_RED}Failed checks: {', '.join(failed_checks)}{Colors.RESET}")
+
+                # Display found issues
+                for result_check, entry in file_issues:
+                    line, issue_type = describe_finding(entry, CHECKS[result_check][1].RESULT_FIELDS)
+
+                    print(f"\n{Colors.YELLOW}[{CHECKS[result_check][0]}] {relative_path}:{line}{Colors.RESET}")
+                    severity_color = Colors.BRIGHT_ORANGE_RED if entry.get('severity') == 'high' else Colors.YELLOW
+                    print(f"   {severity_color}⚠️  {issue_type}: {entry.get('description', '')}{Colors.RESET}")
+                    if entry.get('suggestion'):
+                        print(f"   💡 {entry.get('suggestion', '')}")
+
+                    # Add to total results
+                    all_issues.append({
+                        'file': relative_path,
+                        'check': result_check,
+                        'line': line,
+                        'type': issue_type,
+                        'severity': entry.get('severity'),
+                        'description': entry.get('description'),
+                        'suggestion': entry.get('suggestion')
+                    })
+
+            except Exception as e:
+                print(f"Error analyzing file {file_path}: {e}")
+            finally:
+                file_results = []
+
+        print("\n" + "=" * 70)
+        print(f"🔍 AI Multi-Check Analysis Results:")
+        print(f"  Files scanned: {total_files_scanned}")
+        print(f"  Files with issues: {files_with_issues}")
+        print(f"  Total issues: {len(all_issues)}")
+
+        if all_issues:
+            # Statistics by check
+            print(f"\n{Colors.YELLOW}📊 Issues by Check:{Colors.RESET}")
+            for check in checks:
+                count = sum(1 for issue in all_issues if issue['check'] == check)
+                if count:
+                    print(f"  {CHECKS[check][0]}: {count}")
+
+            # Statistics by severity
+            severity_counts = {}
+            for issue in all_issues:
+                severity = issue.get('severity', 'unknown')
+                severity_counts[severity] = severity_counts.get(severity, 0) + 1
+
+            print(f"\n{Colors.YELLOW}📊 Issues by Severity:{Colors.RESET}")
+            for severity, count in severity_counts.items():
+                color = Colors.BRIGHT_ORANGE_RED if severity == 'high' else Colors.YELLOW if severity == 'medium' else Colors.RESET
+                print(f"  {color}{str(severity).upper()}: {count}{Colors.RESET}")
+        else:
+            print(f"\n{Colors.YELLOW}✅ AI analysis complete - No issues detected!{Colors.RESET}")
+
+        # Print token usage summary
+        print_combined_token_summary(checks)
+        if cache is not None:
+            cache.print_summary()
+
+    except Exception as e:
+        print(f"Error: {e}")
\ No newline at end of file
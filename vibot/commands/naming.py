@@ -6,7 +6,10 @@ import json
 import sys
 import subprocess
 import time
-from ..utils import should_skip_file, Colors
+import threading
+from ..utils import Colors
+from ..ai import iter_source_files, run_batched, get_client, plan_file, analyze_batch_with_ai
+from ..chunking import DEFAULT_CHUNK_CHARS
 
 # Try to import openai, provide installation hint if failed
 try:
@@ -15,6 +18,23 @@ try:
 except ImportError:
     OPENAI_AVAILABLE = False
 
+# Bump when the prompt or result format changes to invalidate cached results
+PROMPT_VERSION = 1
+
+# Supported file extensions for this analysis
+SUPPORTED_EXTENSIONS = {'.py', '.js', '.ts', '.java', '.cpp', '.c', '.cs', '.php', '.rb', '.go', '.kt', '.swift', '.rs'}
+
+# Files with less content than this are skipped
+MIN_CONTENT_LENGTH = 50
+
+# Where findings and their line numbers live in the AI result
+RESULT_FIELDS = {
+    'list_key': 'naming_issues',
+    'flag_key': 'has_naming_issues',
+    'count_key': 'total_issues_found',
+    'nested_key': 'examples'
+}
+
 # Token usage tracking for naming analysis
 class NamingTokenTracker:
     def __init__(self):
@@ -24,19 +44,21 @@ class NamingTokenTracker:
         self.total_tokens = 0
         self.model_name = ""
         self.start_time = None
+        self._lock = threading.Lock()
         
     def start_tracking(self, model):
         self.model_name = model
         self.start_time = time.time()
         
     def add_usage(self, usage):
-        self.total_api_calls += 1
-        if hasattr(usage, 'prompt_tokens'):
-            self.total_prompt_tokens += usage.prompt_tokens
-        if hasattr(usage, 'completion_tokens'):
-            self.total_completion_tokens += usage.completion_tokens
-        if hasattr(usage, 'total_tokens'):
-            self.total_tokens += usage.total_tokens
+        with self._lock:
+            self.total_api_calls += 1
+            if hasattr(usage, 'prompt_tokens'):
+                self.total_prompt_tokens += usage.prompt_tokens
+            if hasattr(usage, 'completion_tokens'):
+                self.total_completion_tokens += usage.completion_tokens
+            if hasattr(usage, 'total_tokens'):
+                self.total_tokens += usage.total_tokens
             
     def print_summary(self):
         if self.total_api_calls > 0:
@@ -56,55 +78,34 @@ class NamingTokenTracker:
 # Global token tracker for naming analysis
 naming_token_tracker = NamingTokenTracker()
 
+# System prompt for naming analysis requests
+SYSTEM_PROMPT = "You are a professional code naming convention expert. Analyze code for naming issues and return results in the specified JSON format only."
 
-def analyze_naming_with_ai(file_content, file_path, api_key, api_proxy, model):
-    """Analyze naming conventions and issues using AI"""
-    if not OPENAI_AVAILABLE:
-        return None
-        
-    try:
-        # Configure OpenAI client
-        client = openai.OpenAI(
-            api_key=api_key,
-            base_url=api_proxy
-        )
-        
-        # Build analysis prompt
-        prompt = f"""
-As a code quality expert specializing in naming conventions and best practices, analyze the following code file for naming-related issues.
-
-File path: {file_path}
-
-Code content:
-```
-{file_content}
-```
-
-Please analyze the code and return results strictly in the following JSON format:
-
-{{
+# JSON result format the model returns for each file
+RESULT_FORMAT = """{
   "has_naming_issues": true/false,
   "total_issues_found": number_of_naming_issues,
   "naming_issues": [
-    {{
+    {
       "issue_id": "unique_id_for_this_issue",
       "issue_type": "Oversimplified Names|Obscure Abbreviations|Inconsistent Style|Meaningless Names|Constant Naming|Poor Class Names|Function Naming|Variable Scope",
       "severity": "high|medium|low",
       "description": "detailed description of the naming issue",
       "suggestion": "specific naming improvement suggestion",
       "examples": [
-        {{
+        {
           "line_number": line_number,
           "current_name": "current problematic name",
           "suggested_name": "suggested better name",
           "context": "code context where the issue occurs"
-        }}
+        }
       ]
-    }}
+    }
   ]
-}}
+}"""
 
-Analysis criteria for naming issues:
+# Analysis instructions shared by single-file and batched prompts
+ANALYSIS_CRITERIA = """Analysis criteria for naming issues:
 
 1. **Oversimplified Names**: 
    - Single letter variables (except for short loops): a, b, c, x, y, z
@@ -162,7 +163,54 @@ Ignore:
 - Standard library names and built-in functions
 - Third-party library conventions
 - Domain-specific terminology that is well-established
-- Single-letter variables in very short, obvious contexts (like simple math operations)
+- Single-letter variables in very short, obvious contexts (like simple math operations)"""
+
+# Prompt pieces used to analyze several small files in one request
+BATCH_PROMPT = {
+    'command': 'naming',
+    'prompt_version': PROMPT_VERSION,
+    'intro': "As a code quality expert specializing in naming conventions and best practices, analyze the following code files for naming-related issues.",
+    'system_prompt': SYSTEM_PROMPT,
+    'result_format': RESULT_FORMAT,
+    'criteria': ANALYSIS_CRITERIA,
+    'max_tokens_per_file': 4000,
+    'tracker': naming_token_tracker
+}
+
+
+def analyze_naming_with_ai(file_content, file_path, api_key, api_proxy, model, cache=None):
+    """Analyze naming conventions and issues using AI"""
+    if not OPENAI_AVAILABLE:
+        return None
+    
+    # Reuse the cached result if this exact content was analyzed before
+    cache_key = None
+    if cache is not None:
+        cache_key = cache.make_key(file_content, 'naming', model, PROMPT_VERSION)
+        cached_result = cache.get(cache_key)
+        if cached_result is not None:
+            return cached_result
+        
+    try:
+        # Reuse the shared, connection-pooled OpenAI client
+        client = get_client(api_key, api_proxy)
+        
+        # Build analysis prompt
+        prompt = f"""
+As a code quality expert specializing in naming conventions and best practices, analyze the following code file for naming-related issues.
+
+File path: {file_path}
+
+Code content:
+```
+{file_content}
+```
+
+Please analyze the code and return results strictly in the following JSON format:
+
+{RESULT_FORMAT}
+
+{ANALYSIS_CRITERIA}
 
 Return valid JSON only, no additional text.
 """
@@ -170,7 +218,7 @@ Return valid JSON only, no additional text.
         response = client.chat.completions.create(
             model=model,
             messages=[
-                {"role": "system", "content": "You are a professional code naming convention expert. Analyze code for naming issues and return results in the specified JSON format only."},
+                {"role": "system", "content": SYSTEM_PROMPT},
                 {"role": "user", "content": prompt}
             ],
             max_tokens=4000,
@@ -194,6 +242,8 @@ Return valid JSON only, no additional text.
         
         try:
             result = json.loads(ai_response)
+            if cache_key is not None:
+                cache.put(cache_key, result)
             return result
         except json.JSONDecodeError as e:
             print(f"Warning: Failed to parse AI response as JSON: {e}")
@@ -214,7 +264,7 @@ Return valid JSON only, no additional text.
         return None
 
 
-def analyze_naming_in_directory(path):
+def analyze_naming_in_directory(path, jobs=1, cache=None, files=None, diff_scope=None, chunk_chars=DEFAULT_CHUNK_CHARS, batch_tokens=0):
     """Analyze naming conventions in directory using AI"""
     try:
         # Check if openai package is available
@@ -271,99 +321,86 @@ def analyze_naming_in_directory(path):
         total_issues_found = 0
         files_with_issues = 0
         
-        # Supported file extensions for naming analysis
-        supported_extensions = {'.py', '.js', '.ts', '.java', '.cpp', '.c', '.cs', '.php', '.rb', '.go', '.kt', '.swift', '.rs'}
+        source_files = iter_source_files(path, SUPPORTED_EXTENSIONS, min_content_length=MIN_CONTENT_LENGTH, files=files)
+        
+        def analyze_text(content, label):
+            return analyze_naming_with_ai(
+                content, label, api_key, api_proxy, model, cache=cache
+            )
+        
+        def plan(item):
+            return plan_file(analyze_text, item, RESULT_FIELDS, diff_scope, chunk_chars)
+        
+        def analyze_batch(items):
+            return analyze_batch_with_ai(items, BATCH_PROMPT, api_key, api_proxy, model, cache=cache)
+        
+        # Batches carry whole files, so they are not used when only diff hunks are analyzed
+        if diff_scope is not None:
+            batch_tokens = 0
         
-        for root, dirs, files in os.walk(path):
-            for file in files:
-                file_path = os.path.join(root, file)
+        for (file_path, relative_path, file_content), analysis_result in run_batched(plan, analyze_batch, source_files, batch_tokens, jobs):
+            try:
+                total_files_scanned += 1
                 
-                # Skip non-code files
-                if should_skip_file(file):
-                    continue
-                    
-                # Only analyze supported file types
-                _, ext = os.path.splitext(file)
-                if ext.lower() not in supported_extensions:
+                print(f"Analyzing: {relative_path}...", end=" ")
+                
+                if analysis_result is None:
+                    print(f"{Colors.BRIGHT_ORANGE_RED}Failed{Colors.RESET}")
                     continue
                 
-                try:
-                    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                        file_content = f.read()
-                    
-                    # Skip empty files or too small files
-                    if len(file_content.strip()) < 50:
-                        continue
-                    
-                    total_files_scanned += 1
-                    relative_path = os.path.relpath(file_path, path)
-                    
-                    print(f"Analyzing: {relative_path}...", end=" ")
-                    
-                    # Analyze file with AI
-                    analysis_result = analyze_naming_with_ai(
-                        file_content, relative_path, api_key, api_proxy, model
-                    )
-                    
-                    if analysis_result is None:
-                        print(f"{Colors.BRIGHT_ORANGE_RED}Failed{Colors.RESET}")
-                        continue
-                    
-                    # Update issues count
-                    file_issues = analysis_result.get('total_issues_found', 0)
-                    total_issues_found += file_issues
+                # Update issues count
+                file_issues = analysis_result.get('total_issues_found', 0)
+                total_issues_found += file_issues
+                
+                if analysis_result.get('has_naming_issues', False) and analysis_result.get('naming_issues'):
+                    files_with_issues += 1
+                    print(f"{Colors.BRIGHT_ORANGE_RED}Issues found{Colors.RESET}")
                     
-                    if analysis_result.get('has_naming_issues', False) and analysis_result.get('naming_issues'):
-                        files_with_issues += 1
-                        print(f"{Colors.BRIGHT_ORANGE_RED}Issues found{Colors.RESET}")
+                    # Display found naming issues
+                    for issue in analysis_result['naming_issues']:
+                        print(f"\n{Colors.YELLOW}Naming Issue: {issue.get('issue_id', 'Unknown')}{Colors.RESET}")
+                        print(f"   File: {relative_path}")
+                        print(f"   Type: {issue.get('issue_type', 'Unknown')}")
                         
-                        # Display found naming issues
-                        for issue in analysis_result['naming_issues']:
-                            print(f"\n{Colors.YELLOW}Naming Issue: {issue.get('issue_id', 'Unknown')}{Colors.RESET}")
-                            print(f"   File: {relative_path}")
-                            print(f"   Type: {issue.get('issue_type', 'Unknown')}")
-                            
-                            severity_color = Colors.BRIGHT_ORANGE_RED if issue.get('severity') == 'high' else Colors.YELLOW
-                            print(f"   {severity_color}⚠️  {issue.get('description', '')}{Colors.RESET}")
-                            
-                            # Show all examples of this naming issue
-                            examples = issue.get('examples', [])
-                            print(f"   Found {len(examples)} examples:")
-                            
-                            for i, example in enumerate(examples, 1):
-                                line_number = example.get('line_number', '?')
-                                current_name = example.get('current_name', '')
-                                suggested_name = example.get('suggested_name', '')
-                                context = example.get('context', '').strip()
-                                
-                                print(f"   Example {i}: Line {line_number}")
-                                print(f"     Current: {current_name}")
-                                print(f"     Suggested: {suggested_name}")
-                                if context:
-                                    # Show context (first line only to keep output clean)
-                                    context_line = context.split('\n')[0][:80]
-                                    print(f"     Context: {context_line}")
-                            
-                            if issue.get('suggestion'):
-                                print(f"   💡 {issue.get('suggestion', '')}")
+                        severity_color = Colors.BRIGHT_ORANGE_RED if issue.get('severity') == 'high' else Colors.YELLOW
+                        print(f"   {severity_color}⚠️  {issue.get('description', '')}{Colors.RESET}")
+                        
+                        # Show all examples of this naming issue
+                        examples = issue.get('examples', [])
+                        print(f"   Found {len(examples)} examples:")
+                        
+                        for i, example in enumerate(examples, 1):
+                            line_number = example.get('line_number', '?')
+                            current_name = example.get('current_name', '')
+                            suggested_name = example.get('suggested_name', '')
+                            context = example.get('context', '').strip()
                             
-                            # Add to total results
-                            all_naming_issues.append({
-                                'file': relative_path,
-                                'issue_id': issue.get('issue_id'),
-                                'type': issue.get('issue_type'),
-                                'severity': issue.get('severity'),
-                                'description': issue.get('description'),
-                                'suggestion': issue.get('suggestion'),
-                                'examples': examples
-                            })
-                    else:
-                        print(f"{Colors.YELLOW}Clean{Colors.RESET}")
-                
-                except (UnicodeDecodeError, PermissionError, IsADirectoryError):
-                    continue
-                except Exception as e:
-                    print(f"Error analyzing file {file_path}: {e}")
+                            print(f"   Example {i}: Line {line_number}")
+                            print(f"     Current: {current_name}")
+                            print(f"     Suggested: {suggested_name}")
+                            if context:
+                                # Show context (first line only to keep output clean)
+                                context_line = context.split('\n')[0][:80]
+                                print(f"     Context: {context_line}")
+                        
+                        if issue.get('suggestion'):
+                            print(f"   💡 {issue.get('suggestion', '')}")
+                        
+                        # Add to total results
+                        all_naming_issues.append({
+                            'file': relative_path,
+                            'issue_id': issue.get('issue_id'),
+                            'type': issue.get('issue_type'),
+                            'severity': issue.get('severity'),
+                            'description': issue.get('description'),
+                            'suggestion': issue.get('suggestion'),
+                            'examples': examples
+                        })
+                else:
+                    print(f"{Colors.YELLOW}Clean{Colors.RESET}")
+            
+            except Exception as e:
+                print(f"Error analyzing file {file_path}: {e}")
         
         print("\n" + "=" * 70)
         print(f"🔍 AI Naming Convention Analysis Results:")
@@ -411,6 +448,8 @@ def analyze_naming_in_directory(path):
         
         # Print token usage summary
         naming_token_tracker.print_summary()
+        if cache is not None:
+            cache.print_summary()
         
     except Exception as e:
         print(f"Error: {e}")
\ No newline at end of file
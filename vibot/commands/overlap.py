@@ -6,7 +6,10 @@ import json
 import sys
 import subprocess
 import time
-from ..utils import should_skip_file, Colors
+import threading
+from ..utils import Colors
+from ..ai import iter_source_files, run_planned, get_client, plan_file
+from ..chunking import DEFAULT_CHUNK_CHARS
 
 # Try to import openai, provide installation hint if failed
 try:
@@ -15,6 +18,25 @@ try:
 except ImportError:
     OPENAI_AVAILABLE = False
 
+# Bump when the prompt or result format changes to invalidate cached results
+PROMPT_VERSION = 1
+
+# Supported file extensions for this analysis
+SUPPORTED_EXTENSIONS = {'.py', '.js', '.ts', '.java', '.cpp', '.c', '.cs', '.php', '.rb', '.go', '.kt', '.swift', '.rs'}
+
+# Files with less content than this are skipped
+MIN_CONTENT_LENGTH = 50
+
+# Where findings and their line numbers live in the AI result
+RESULT_FIELDS = {
+    'list_key': 'duplications',
+    'flag_key': 'has_duplications',
+    'count_key': 'total_duplications_found',
+    'line_key': 'start_line',
+    'end_key': 'end_line',
+    'nested_key': 'instances'
+}
+
 # Token usage tracking for overlap analysis
 class OverlapTokenTracker:
     def __init__(self):
@@ -24,19 +46,21 @@ class OverlapTokenTracker:
         self.total_tokens = 0
         self.model_name = ""
         self.start_time = None
+        self._lock = threading.Lock()
         
     def start_tracking(self, model):
         self.model_name = model
         self.start_time = time.time()
         
     def add_usage(self, usage):
-        self.total_api_calls += 1
-        if hasattr(usage, 'prompt_tokens'):
-            self.total_prompt_tokens += usage.prompt_tokens
-        if hasattr(usage, 'completion_tokens'):
-            self.total_completion_tokens += usage.completion_tokens
-        if hasattr(usage, 'total_tokens'):
-            self.total_tokens += usage.total_tokens
+        with self._lock:
+            self.total_api_calls += 1
+            if hasattr(usage, 'prompt_tokens'):
+                self.total_prompt_tokens += usage.prompt_tokens
+            if hasattr(usage, 'completion_tokens'):
+                self.total_completion_tokens += usage.completion_tokens
+            if hasattr(usage, 'total_tokens'):
+                self.total_tokens += usage.total_tokens
             
     def print_summary(self):
         if self.total_api_calls > 0:
@@ -57,17 +81,22 @@ class OverlapTokenTracker:
 overlap_token_tracker = OverlapTokenTracker()
 
 
-def analyze_code_overlap_with_ai(file_content, file_path, api_key, api_proxy, model, min_lines=3):
+def analyze_code_overlap_with_ai(file_content, file_path, api_key, api_proxy, model, min_lines=3, cache=None):
     """Analyze code overlap and duplication using AI"""
     if not OPENAI_AVAILABLE:
         return None
+    
+    # Reuse the cached result if this exact content was analyzed before
+    cache_key = None
+    if cache is not None:
+        cache_key = cache.make_key(file_content, 'overlap', model, PROMPT_VERSION, {'min_duplicate_lines': min_lines})
+        cached_result = cache.get(cache_key)
+        if cached_result is not None:
+            return cached_result
         
     try:
-        # Configure OpenAI client
-        client = openai.OpenAI(
-            api_key=api_key,
-            base_url=api_proxy
-        )
+        # Reuse the shared, connection-pooled OpenAI client
+        client = get_client(api_key, api_proxy)
         
         # Build analysis prompt
         prompt = f"""
@@ -165,6 +194,8 @@ Return valid JSON only, no additional text.
         
         try:
             result = json.loads(ai_response)
+            if cache_key is not None:
+                cache.put(cache_key, result)
             return result
         except json.JSONDecodeError as e:
             print(f"Warning: Failed to parse AI response as JSON: {e}")
@@ -186,7 +217,7 @@ Return valid JSON only, no additional text.
 
 
 
-def analyze_overlap_in_directory(path, min_duplicate_lines=3):
+def analyze_overlap_in_directory(path, min_duplicate_lines=3, jobs=1, cache=None, files=None, diff_scope=None, chunk_chars=DEFAULT_CHUNK_CHARS):
     """Analyze code overlap and duplication in directory using AI"""
     try:
         # Check if openai package is available
@@ -244,99 +275,80 @@ def analyze_overlap_in_directory(path, min_duplicate_lines=3):
         total_duplications_found = 0
         files_with_duplications = 0
         
-        # Supported file extensions for overlap analysis
-        supported_extensions = {'.py', '.js', '.ts', '.java', '.cpp', '.c', '.cs', '.php', '.rb', '.go', '.kt', '.swift', '.rs'}
+        source_files = iter_source_files(path, SUPPORTED_EXTENSIONS, min_content_length=MIN_CONTENT_LENGTH, files=files)
+        
+        def analyze_text(content, label):
+            return analyze_code_overlap_with_ai(
+                content, label, api_key, api_proxy, model, min_duplicate_lines, cache=cache
+            )
+        
+        def plan(item):
+            return plan_file(analyze_text, item, RESULT_FIELDS, diff_scope, chunk_chars)
         
-        for root, dirs, files in os.walk(path):
-            for file in files:
-                file_path = os.path.join(root, file)
+        for (file_path, relative_path, file_content), analysis_result in run_planned(plan, source_files, jobs):
+            try:
+                total_files_scanned += 1
                 
-                # Skip non-code files
-                if should_skip_file(file):
-                    continue
-                    
-                # Only analyze supported file types
-                _, ext = os.path.splitext(file)
-                if ext.lower() not in supported_extensions:
+                print(f"Analyzing: {relative_path}...", end=" ")
+                
+                if analysis_result is None:
+                    print(f"{Colors.BRIGHT_ORANGE_RED}Failed{Colors.RESET}")
                     continue
                 
-                try:
-                    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                        file_content = f.read()
-                    
-                    # Skip empty files or too small files
-                    if len(file_content.strip()) < 50:
-                        continue
-                    
-                    total_files_scanned += 1
-                    relative_path = os.path.relpath(file_path, path)
-                    
-                    print(f"Analyzing: {relative_path}...", end=" ")
-                    
-                    # Analyze file with AI
-                    analysis_result = analyze_code_overlap_with_ai(
-                        file_content, relative_path, api_key, api_proxy, model, min_duplicate_lines
-                    )
-                    
-                    if analysis_result is None:
-                        print(f"{Colors.BRIGHT_ORANGE_RED}Failed{Colors.RESET}")
-                        continue
-                    
-                    # Update duplications count
-                    file_duplications = analysis_result.get('total_duplications_found', 0)
-                    total_duplications_found += file_duplications
+                # Update duplications count
+                file_duplications = analysis_result.get('total_duplications_found', 0)
+                total_duplications_found += file_duplications
+                
+                if analysis_result.get('has_duplications', False) and analysis_result.get('duplications'):
+                    files_with_duplications += 1
+                    print(f"{Colors.BRIGHT_ORANGE_RED}Duplications found{Colors.RESET}")
                     
-                    if analysis_result.get('has_duplications', False) and analysis_result.get('duplications'):
-                        files_with_duplications += 1
-                        print(f"{Colors.BRIGHT_ORANGE_RED}Duplications found{Colors.RESET}")
-                        
-                        # Display found duplications
-                        for duplication in analysis_result['duplications']:
-                                print(f"\n{Colors.YELLOW}Duplication Group: {duplication.get('duplication_id', 'Unknown')}{Colors.RESET}")
-                                print(f"   File: {relative_path}")
-                                print(f"   Type: {duplication.get('duplication_type', 'Unknown')}")
-                                
-                                severity_color = Colors.BRIGHT_ORANGE_RED if duplication.get('severity') == 'high' else Colors.YELLOW
-                                print(f"   {severity_color}⚠️  {duplication.get('description', '')}{Colors.RESET}")
+                    # Display found duplications
+                    for duplication in analysis_result['duplications']:
+                            print(f"\n{Colors.YELLOW}Duplication Group: {duplication.get('duplication_id', 'Unknown')}{Colors.RESET}")
+                            print(f"   File: {relative_path}")
+                            print(f"   Type: {duplication.get('duplication_type', 'Unknown')}")
+                            
+                            severity_color = Colors.BRIGHT_ORANGE_RED if duplication.get('severity') == 'high' else Colors.YELLOW
+                            print(f"   {severity_color}⚠️  {duplication.get('description', '')}{Colors.RESET}")
+                            
+                            # Show all instances of this duplication
+                            instances = duplication.get('instances', [])
+                            print(f"   Found {len(instances)} instances:")
+                            
+                            for i, instance in enumerate(instances, 1):
+                                start_line = instance.get('start_line', '?')
+                                end_line = instance.get('end_line', '?')
+                                code_snippet = instance.get('code_snippet', '').strip()
                                 
-                                # Show all instances of this duplication
-                                instances = duplication.get('instances', [])
-                                print(f"   Found {len(instances)} instances:")
-                                
-                                for i, instance in enumerate(instances, 1):
-                                    start_line = instance.get('start_line', '?')
-                                    end_line = instance.get('end_line', '?')
-                                    code_snippet = instance.get('code_snippet', '').strip()
-                                    
-                                    print(f"   Instance {i}: Lines {start_line}-{end_line}")
-                                    if code_snippet:
-                                        # Show first few lines of the code snippet
-                                        snippet_lines = code_snippet.split('\n')[:3]
-                                        for line in snippet_lines:
-                                            print(f"     {line}")
-                                        if len(code_snippet.split('\n')) > 3:
-                                            print(f"     ... ({len(code_snippet.split('\n')) - 3} more lines)")
-                                
-                                if duplication.get('suggestion'):
-                                    print(f"   💡 {duplication.get('suggestion', '')}")
-                                
-                                # Add to total results
-                                all_duplications.append({
-                                    'file': relative_path,
-                                    'duplication_id': duplication.get('duplication_id'),
-                                    'type': duplication.get('duplication_type'),
-                                    'severity': duplication.get('severity'),
-                                    'description': duplication.get('description'),
-                                    'suggestion': duplication.get('suggestion'),
-                                    'instances': instances
-                                })
-                    else:
-                        print(f"{Colors.YELLOW}Clean{Colors.RESET}")
-                
-                except (UnicodeDecodeError, PermissionError, IsADirectoryError):
-                    continue
-                except Exception as e:
-                    print(f"Error analyzing file {file_path}: {e}")
+                                print(f"   Instance {i}: Lines {start_line}-{end_line}")
+                                if code_snippet:
+                                    # Show first few lines of the code snippet
+                                    all_snippet_lines = code_snippet.split('\n')
+                                    snippet_lines = all_snippet_lines[:3]
+                                    for line in snippet_lines:
+                                        print(f"     {line}")
+                                    if len(all_snippet_lines) > 3:
+                                        print(f"     ... ({len(all_snippet_lines) - 3} more lines)")
+                            
+                            if duplication.get('suggestion'):
+                                print(f"   💡 {duplication.get('suggestion', '')}")
+                            
+                            # Add to total results
+                            all_duplications.append({
+                                'file': relative_path,
+                                'duplication_id': duplication.get('duplication_id'),
+                                'type': duplication.get('duplication_type'),
+                                'severity': duplication.get('severity'),
+                                'description': duplication.get('description'),
+                                'suggestion': duplication.get('suggestion'),
+                                'instances': instances
+                            })
+                else:
+                    print(f"{Colors.YELLOW}Clean{Colors.RESET}")
+            
+            except Exception as e:
+                print(f"Error analyzing file {file_path}: {e}")
         
         print("\n" + "=" * 70)
         print(f"🔍 AI Code Overlap Analysis Results:")
@@ -382,6 +394,8 @@ def analyze_overlap_in_directory(path, min_duplicate_lines=3):
         
         # Print token usage summary
         overlap_token_tracker.print_summary()
+        if cache is not None:
+            cache.print_summary()
         
     except Exception as e:
         print(f"Error: {e}")
\ No newline at end of file
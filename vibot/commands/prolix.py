@@ -2,10 +2,70 @@
 """vibot prolix command implementation"""
 
 import os
-from ..utils import should_skip_file
+import heapq
+from concurrent.futures import ThreadPoolExecutor
+from ..utils import should_skip_file, sniff_binary
+from ..discovery import iter_file_entries
+from ..manifest import get_manifest
 
+# Bytes read per call when counting newlines
+COUNT_BLOCK_SIZE = 1024 * 1024
 
-def find_prolix_files(path, max_lines=200):
+
+def count_file_lines(file_path):
+    """Count lines by counting b'\\n' over large binary blocks; return None for binary files"""
+    with open(file_path, 'rb') as f:
+        is_binary, head = sniff_binary(f, file_path)
+        if is_binary:
+            return None
+        
+        line_count = head.count(b'\n')
+        last_byte = head[-1:]
+        while True:
+            block = f.read(COUNT_BLOCK_SIZE)
+            if not block:
+                break
+            line_count += block.count(b'\n')
+            last_byte = block[-1:]
+    
+    # A final line without a trailing newline still counts
+    if last_byte and last_byte != b'\n':
+        line_count += 1
+    return line_count
+
+
+def count_candidate_lines(entry, max_lines=200, manifest=None):
+    """Return the line count of a file from the walk, or None if it is skipped
+
+    With a manifest, counts stored by an earlier run are reused while the file is unchanged.
+    """
+    # Skip binary files and special files
+    if should_skip_file(entry.name):
+        return None
+    
+    try:
+        # Every line takes at least one byte, so small files cannot exceed the threshold
+        stat = entry.stat()
+        if stat.st_size <= max_lines:
+            return None
+        if manifest is None:
+            return count_file_lines(entry.path)
+        
+        line_count = manifest.get(entry.path, stat, 'lines')
+        if line_count is None and not manifest.get(entry.path, stat, 'binary'):
+            line_count = count_file_lines(entry.path)
+            if line_count is not None:
+                manifest.put(entry.path, stat, lines=line_count)
+        return line_count
+    except (PermissionError, IsADirectoryError, FileNotFoundError):
+        # Skip unreadable files
+        return None
+    except Exception as e:
+        print(f"Error reading file {entry.path}: {e}")
+        return None
+
+
+def find_prolix_files(path, max_lines=200, files=None, top=None):
     """Find verbose files with lines exceeding specified value in given path"""
     try:
         if not os.path.exists(path):
@@ -16,41 +76,47 @@ def find_prolix_files(path, max_lines=200):
             print(f"Error: '{path}' is not a directory")
             return
         
+        if top is not None and top < 1:
+            print("Error: --top must be at least 1")
+            return
+        
         print(f"Searching for files with more than {max_lines} lines in: {os.path.abspath(path)}")
         print("=" * 60)
         
         prolix_files = []
+        total_prolix_files = 0
         
-        for root, dirs, files in os.walk(path):
-            for file in files:
-                file_path = os.path.join(root, file)
-                
-                # Skip binary files and special files
-                if should_skip_file(file):
+        # Count files on a thread pool; with --top only the N longest files are kept in a min-heap
+        entries = list(iter_file_entries(path, files))
+        manifest = get_manifest()
+        with ThreadPoolExecutor() as executor:
+            line_counts = executor.map(count_candidate_lines, entries, [max_lines] * len(entries),
+                                       [manifest] * len(entries))
+            for index, (entry, line_count) in enumerate(zip(entries, line_counts)):
+                if line_count is None or line_count <= max_lines:
                     continue
                 
-                try:
-                    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                        line_count = sum(1 for _ in f)
-                    
-                    if line_count > max_lines:
-                        relative_path = os.path.relpath(file_path, path)
-                        prolix_files.append((relative_path, line_count))
-                        
-                except (UnicodeDecodeError, PermissionError, IsADirectoryError):
-                    # Skip unreadable files
-                    continue
-                except Exception as e:
-                    print(f"Error reading file {file_path}: {e}")
+                total_prolix_files += 1
+                # Earlier files win ties, as with a stable sort
+                record = (line_count, -index, os.path.relpath(entry.path, path))
+                if top is None:
+                    prolix_files.append(record)
+                elif len(prolix_files) < top:
+                    heapq.heappush(prolix_files, record)
+                else:
+                    heapq.heappushpop(prolix_files, record)
         
         if prolix_files:
             # Sort by line count in descending order
-            prolix_files.sort(key=lambda x: x[1], reverse=True)
+            prolix_files.sort(reverse=True)
             
-            print(f"Found {len(prolix_files)} files with more than {max_lines} lines:")
+            if top is not None and total_prolix_files > len(prolix_files):
+                print(f"Found {total_prolix_files} files with more than {max_lines} lines, showing the top {len(prolix_files)}:")
+            else:
+                print(f"Found {total_prolix_files} files with more than {max_lines} lines:")
             print("-" * 60)
             
-            for file_path, line_count in prolix_files:
+            for line_count, _, file_path in prolix_files:
                 print(f"{file_path:<50} {line_count:>6} lines")
         else:
             print(f"No files found with more than {max_lines} lines.")
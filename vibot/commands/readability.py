@@ -2,11 +2,16 @@
 """vibot readability command implementation - AI-powered code readability analysis"""
 
 import os
+import re
+import ast
 import json
 import sys
 import subprocess
 import time
-from ..utils import should_skip_file, Colors
+import threading
+from ..utils import Colors
+from ..ai import iter_source_files, run_planned, get_client, AnalysisPlan, plan_file
+from ..chunking import DEFAULT_CHUNK_CHARS
 
 # Try to import openai, provide installation hint if failed
 try:
@@ -15,6 +20,32 @@ try:
 except ImportError:
     OPENAI_AVAILABLE = False
 
+# Bump when the prompt or result format changes to invalidate cached results
+PROMPT_VERSION = 2
+
+# Supported file extensions for this analysis
+SUPPORTED_EXTENSIONS = {'.py', '.js', '.ts', '.java', '.cpp', '.c', '.cs', '.php', '.rb', '.go', '.kt', '.swift', '.rs', '.html', '.css', '.scss', '.less'}
+
+# Files with less content than this are skipped
+MIN_CONTENT_LENGTH = 20
+
+# Runs of this many consecutive non-blank lines may be missing a line separation
+DENSE_BLOCK_LINES = 10
+
+# Lines that start a function or class definition, or import a module
+DEFINITION_PATTERN = re.compile(r'(?:export\s+)?(?:async\s+)?(?:def|class|function|func|fn)\s')
+IMPORT_PATTERN = re.compile(r'(?:import|from\s+\S+\s+import)\s')
+
+# Lines after which a definition or import needs no blank line: comments, decorators and block openers
+SEPARATOR_PREFIXES = ('#', '//', '/*', '*', '@')
+SEPARATOR_SUFFIXES = (':', '{', '(', '"""', "'''")
+
+# A ternary operator outside Python: '?' that is not '?.' or '??', followed by ':'
+TERNARY_PATTERN = re.compile(r'\?(?![.?])[^\n]*:')
+
+# Where findings and their line numbers live in the AI result
+RESULT_FIELDS = {'list_key': 'issues', 'flag_key': 'has_issues', 'end_key': 'line_end'}
+
 # Token usage tracking for readability analysis
 class ReadabilityTokenTracker:
     def __init__(self):
@@ -24,19 +55,21 @@ class ReadabilityTokenTracker:
         self.total_tokens = 0
         self.model_name = ""
         self.start_time = None
+        self._lock = threading.Lock()
         
     def start_tracking(self, model):
         self.model_name = model
         self.start_time = time.time()
         
     def add_usage(self, usage):
-        self.total_api_calls += 1
-        if hasattr(usage, 'prompt_tokens'):
-            self.total_prompt_tokens += usage.prompt_tokens
-        if hasattr(usage, 'completion_tokens'):
-            self.total_completion_tokens += usage.completion_tokens
-        if hasattr(usage, 'total_tokens'):
-            self.total_tokens += usage.total_tokens
+        with self._lock:
+            self.total_api_calls += 1
+            if hasattr(usage, 'prompt_tokens'):
+                self.total_prompt_tokens += usage.prompt_tokens
+            if hasattr(usage, 'completion_tokens'):
+                self.total_completion_tokens += usage.completion_tokens
+            if hasattr(usage, 'total_tokens'):
+                self.total_tokens += usage.total_tokens
             
     def print_summary(self):
         if self.total_api_calls > 0:
@@ -57,17 +90,106 @@ class ReadabilityTokenTracker:
 readability_token_tracker = ReadabilityTokenTracker()
 
 
-def analyze_code_readability_with_ai(file_content, file_path, api_key, api_proxy, model, max_line_length=80):
+def find_long_lines(file_content, max_line_length=80):
+    """Return [(line_number, length), ...] for lines longer than max_line_length"""
+    return [
+        (line_number, len(line))
+        for line_number, line in enumerate(file_content.split('\n'), 1)
+        if len(line) > max_line_length
+    ]
+
+
+def has_complex_ternary(file_path, file_content):
+    """Return True if the file may contain a nested or multi-line ternary expression"""
+    _, ext = os.path.splitext(file_path)
+    if ext.lower() != '.py':
+        return any(TERNARY_PATTERN.search(line) for line in file_content.split('\n'))
+
+    try:
+        tree = ast.parse(file_content)
+    except (SyntaxError, ValueError):
+        return any(' if ' in line and ' else ' in line for line in file_content.split('\n'))
+
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.IfExp):
+            continue
+        if getattr(node, 'end_lineno', node.lineno) != node.lineno:
+            return True
+        if any(isinstance(child, ast.IfExp) for child in ast.walk(node) if child is not node):
+            return True
+    return False
+
+
+def has_dense_block(file_content):
+    """Return True if the file has a run of DENSE_BLOCK_LINES consecutive non-blank lines"""
+    run_length = 0
+    for line in file_content.split('\n'):
+        run_length = run_length + 1 if line.strip() else 0
+        if run_length >= DENSE_BLOCK_LINES:
+            return True
+    return False
+
+
+def has_missing_separation(file_content):
+    """Return True if a definition or import directly follows code with no blank line in between
+
+    A definition counts when the line before it is at the same or a deeper indent, i.e. not the line
+    opening its enclosing block; an import counts when the line before it is code rather than another
+    import, and code directly after an import counts as well.
+    """
+    lines = file_content.split('\n')
+    for previous, line in zip(lines, lines[1:]):
+        stripped, previous_stripped = line.strip(), previous.strip()
+        if not stripped or not previous_stripped:
+            continue
+        if previous_stripped.startswith(SEPARATOR_PREFIXES) or previous_stripped.endswith(SEPARATOR_SUFFIXES):
+            continue
+        
+        indent = len(line) - len(line.lstrip())
+        previous_indent = len(previous) - len(previous.lstrip())
+        if DEFINITION_PATTERN.match(stripped) and previous_indent >= indent:
+            return True
+        # Imports and the code around them are only checked at module level
+        if indent or previous_indent or stripped.startswith(SEPARATOR_PREFIXES):
+            continue
+        if bool(IMPORT_PATTERN.match(stripped)) != bool(IMPORT_PATTERN.match(previous_stripped)):
+            return True
+    return False
+
+
+def has_readability_candidates(file_path, file_content, max_line_length=80):
+    """Return True if a static scan finds anything the model could report"""
+    return (
+        bool(find_long_lines(file_content, max_line_length))
+        or has_complex_ternary(file_path, file_content)
+        or has_dense_block(file_content)
+        or has_missing_separation(file_content)
+    )
+
+
+def format_long_lines(long_lines, max_line_length=80):
+    """Render measured long lines as prompt lines"""
+    if not long_lines:
+        return f"- None: no line is longer than {max_line_length} characters, do not report Long Line issues"
+    return '\n'.join(f"- Line {line_number}: {length} characters" for line_number, length in long_lines)
+
+
+def analyze_code_readability_with_ai(file_content, file_path, api_key, api_proxy, model, max_line_length=80, cache=None):
     """Analyze code readability using AI"""
     if not OPENAI_AVAILABLE:
         return None
+    
+    # Reuse the cached result if this exact content was analyzed before
+    cache_key = None
+    if cache is not None:
+        cache_key = cache.make_key(file_content, 'readability', model, PROMPT_VERSION, {'max_line_length': max_line_length})
+        cached_result = cache.get(cache_key)
+        if cached_result is not None:
+            return cached_result
         
     try:
-        # Configure OpenAI client
-        client = openai.OpenAI(
-            api_key=api_key,
-            base_url=api_proxy
-        )
+        # Reuse the shared, connection-pooled OpenAI client
+        client = get_client(api_key, api_proxy)
         
         # Build analysis prompt
         prompt = f"""
@@ -80,6 +202,9 @@ Code content:
 {file_content}
 ```
 
+Lines longer than {max_line_length} characters, measured exactly (line numbers refer to the code shown; use these instead of counting):
+{format_long_lines(find_long_lines(file_content, max_line_length), max_line_length)}
+
 Please analyze the code and return results strictly in the following JSON format:
 
 {{
@@ -163,6 +288,8 @@ Return valid JSON only, no additional text.
         
         try:
             result = json.loads(ai_response)
+            if cache_key is not None:
+                cache.put(cache_key, result)
             return result
         except json.JSONDecodeError as e:
             print(f"Warning: Failed to parse AI response as JSON: {e}")
@@ -183,7 +310,25 @@ Return valid JSON only, no additional text.
         return None
 
 
-def analyze_readability_in_directory(path, max_line_length=80):
+def plan_readability_file(item, api_key, api_proxy, model, max_line_length=80, cache=None,
+                          diff_scope=None, chunk_chars=DEFAULT_CHUNK_CHARS):
+    """Plan the analysis of one source file, skipping the AI call when a static scan finds no candidate issue"""
+    file_path, _, file_content = item
+
+    if not has_readability_candidates(file_path, file_content, max_line_length):
+        return AnalysisPlan.done(
+            {"has_issues": False, "lines_analyzed": len(file_content.split('\n')), "issues": [], "static_check": True}
+        )
+
+    def analyze_text(content, label):
+        return analyze_code_readability_with_ai(
+            content, label, api_key, api_proxy, model, max_line_length, cache=cache
+        )
+
+    return plan_file(analyze_text, item, RESULT_FIELDS, diff_scope, chunk_chars)
+
+
+def analyze_readability_in_directory(path, max_line_length=80, jobs=1, cache=None, files=None, diff_scope=None, chunk_chars=DEFAULT_CHUNK_CHARS):
     """Analyze code readability in directory using AI"""
     try:
         # Check if openai package is available
@@ -239,107 +384,89 @@ def analyze_readability_in_directory(path, max_line_length=80):
         total_files_scanned = 0
         total_lines_analyzed = 0
         files_with_issues = 0
+        files_cleared_statically = 0
         
-        # Supported file extensions for readability analysis
-        supported_extensions = {'.py', '.js', '.ts', '.java', '.cpp', '.c', '.cs', '.php', '.rb', '.go', '.kt', '.swift', '.rs', '.html', '.css', '.scss', '.less'}
+        source_files = iter_source_files(path, SUPPORTED_EXTENSIONS, min_content_length=MIN_CONTENT_LENGTH, files=files)
         
-        for root, dirs, files in os.walk(path):
-            for file in files:
-                file_path = os.path.join(root, file)
+        def plan(item):
+            return plan_readability_file(
+                item, api_key, api_proxy, model, max_line_length,
+                cache, diff_scope, chunk_chars
+            )
+        
+        for (file_path, relative_path, file_content), analysis_result in run_planned(plan, source_files, jobs):
+            try:
+                total_files_scanned += 1
                 
-                # Skip non-code files
-                if should_skip_file(file):
-                    continue
-                    
-                # Only analyze supported file types
-                _, ext = os.path.splitext(file)
-                if ext.lower() not in supported_extensions:
+                print(f"Analyzing: {relative_path}...", end=" ")
+                
+                if analysis_result is None:
+                    print(f"{Colors.BRIGHT_ORANGE_RED}Failed{Colors.RESET}")
                     continue
                 
-                try:
-                    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                        file_content = f.read()
-                    
-                    # Skip empty files or too small files
-                    if len(file_content.strip()) < 20:
-                        continue
-                    
-                    total_files_scanned += 1
-                    relative_path = os.path.relpath(file_path, path)
-                    
-                    print(f"Analyzing: {relative_path}...", end=" ")
-                    
-                    # Analyze file with AI
-                    analysis_result = analyze_code_readability_with_ai(
-                        file_content, relative_path, api_key, api_proxy, model, max_line_length
-                    )
-                    
-                    if analysis_result is None:
-                        print(f"{Colors.BRIGHT_ORANGE_RED}Failed{Colors.RESET}")
-                        continue
-                    
-                    # Update lines count
-                    total_lines_analyzed += analysis_result.get('lines_analyzed', 0)
+                # Update lines count
+                total_lines_analyzed += analysis_result.get('lines_analyzed', 0)
+                if analysis_result.get('static_check'):
+                    files_cleared_statically += 1
+                
+                if analysis_result.get('has_issues', False) and analysis_result.get('issues'):
+                    files_with_issues += 1
+                    print(f"{Colors.BRIGHT_ORANGE_RED}Issues found{Colors.RESET}")
                     
-                    if analysis_result.get('has_issues', False) and analysis_result.get('issues'):
-                        files_with_issues += 1
-                        print(f"{Colors.BRIGHT_ORANGE_RED}Issues found{Colors.RESET}")
+                    # Display found issues
+                    for issue in analysis_result['issues']:
+                        issue_type = issue.get('issue_type', 'Readability Issue')
                         
-                        # Display found issues
-                        for issue in analysis_result['issues']:
-                            issue_type = issue.get('issue_type', 'Readability Issue')
-                            
-                            # Handle single-line vs multi-line issues
-                            if issue_type in ['Long Line', 'Complex Ternary']:
-                                # Single-line issues with column positions
-                                col_start = issue.get('column_start', '?')
-                                col_end = issue.get('column_end', '?')
-                                print(f"\n{Colors.YELLOW}Line {issue.get('line_number', '?')}:{col_start}-{col_end}:{Colors.RESET}")
-                                print(f"   File: {relative_path}")
-                                print(f"   Code: {issue.get('line_content', '').strip()}")
+                        # Handle single-line vs multi-line issues
+                        if issue_type in ['Long Line', 'Complex Ternary']:
+                            # Single-line issues with column positions
+                            col_start = issue.get('column_start', '?')
+                            col_end = issue.get('column_end', '?')
+                            print(f"\n{Colors.YELLOW}Line {issue.get('line_number', '?')}:{col_start}-{col_end}:{Colors.RESET}")
+                            print(f"   File: {relative_path}")
+                            print(f"   Code: {issue.get('line_content', '').strip()}")
+                        else:
+                            # Multi-line issues with start and end lines
+                            line_start = issue.get('line_number', '?')
+                            line_end = issue.get('line_end', line_start)
+                            if line_end and line_end != line_start:
+                                print(f"\n{Colors.YELLOW}Lines {line_start}-{line_end}:{Colors.RESET}")
                             else:
-                                # Multi-line issues with start and end lines
-                                line_start = issue.get('line_number', '?')
-                                line_end = issue.get('line_end', line_start)
-                                if line_end and line_end != line_start:
-                                    print(f"\n{Colors.YELLOW}Lines {line_start}-{line_end}:{Colors.RESET}")
-                                else:
-                                    print(f"\n{Colors.YELLOW}Line {line_start}:{Colors.RESET}")
-                                print(f"   File: {relative_path}")
-                                if issue.get('line_content'):
-                                    print(f"   Code: {issue.get('line_content', '').strip()}")
-                            
-                            severity_color = Colors.BRIGHT_ORANGE_RED if issue.get('severity') == 'high' else Colors.YELLOW
-                            print(f"   {severity_color}⚠️  {issue_type}: {issue.get('description', '')}{Colors.RESET}")
-                            if issue.get('suggestion'):
-                                print(f"   💡 {issue.get('suggestion', '')}")
-                            
-                            # Add to total results
-                            all_issues.append({
-                                'file': relative_path,
-                                'line': issue.get('line_number'),
-                                'line_end': issue.get('line_end'),
-                                'column_start': issue.get('column_start'),
-                                'column_end': issue.get('column_end'),
-                                'type': issue_type,
-                                'severity': issue.get('severity'),
-                                'description': issue.get('description'),
-                                'suggestion': issue.get('suggestion'),
-                                'line_content': issue.get('line_content', '')
-                            })
-                    else:
-                        print(f"{Colors.YELLOW}Clean{Colors.RESET}")
-                
-                except (UnicodeDecodeError, PermissionError, IsADirectoryError):
-                    continue
-                except Exception as e:
-                    print(f"Error analyzing file {file_path}: {e}")
+                                print(f"\n{Colors.YELLOW}Line {line_start}:{Colors.RESET}")
+                            print(f"   File: {relative_path}")
+                            if issue.get('line_content'):
+                                print(f"   Code: {issue.get('line_content', '').strip()}")
+                        
+                        severity_color = Colors.BRIGHT_ORANGE_RED if issue.get('severity') == 'high' else Colors.YELLOW
+                        print(f"   {severity_color}⚠️  {issue_type}: {issue.get('description', '')}{Colors.RESET}")
+                        if issue.get('suggestion'):
+                            print(f"   💡 {issue.get('suggestion', '')}")
+                        
+                        # Add to total results
+                        all_issues.append({
+                            'file': relative_path,
+                            'line': issue.get('line_number'),
+                            'line_end': issue.get('line_end'),
+                            'column_start': issue.get('column_start'),
+                            'column_end': issue.get('column_end'),
+                            'type': issue_type,
+                            'severity': issue.get('severity'),
+                            'description': issue.get('description'),
+                            'suggestion': issue.get('suggestion'),
+                            'line_content': issue.get('line_content', '')
+                        })
+                else:
+                    print(f"{Colors.YELLOW}Clean{Colors.RESET}")
+            
+            except Exception as e:
+                print(f"Error analyzing file {file_path}: {e}")
         
         print("\n" + "=" * 70)
         print(f"🔍 AI Code Readability Analysis Results:")
         print(f"  Files scanned: {total_files_scanned}")
         print(f"  Lines analyzed: {total_lines_analyzed}")
         print(f"  Files with issues: {files_with_issues}")
+        print(f"  Files cleared by static check (no AI call): {files_cleared_statically}")
         print(f"  Total readability issues: {len(all_issues)}")
         
         if all_issues:
@@ -379,6 +506,8 @@ def analyze_readability_in_directory(path, max_line_length=80):
         
         # Print token usage summary
         readability_token_tracker.print_summary()
+        if cache is not None:
+            cache.print_summary()
         
     except Exception as e:
         print(f"Error: {e}")
\ No newline at end of file
@@ -2,11 +2,273 @@
 """vibot search command implementation"""
 
 import os
-from ..utils import should_skip_file
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from ..utils import should_skip_file, read_universal_bytes, is_ascii, BufferedOutput
+from ..discovery import iter_file_entries
+from ..manifest import get_manifest
 
+# Searches over fewer files than this run in-process; starting worker processes costs more than it saves
+PARALLEL_SEARCH_MIN_FILES = 64
 
-def search_keyword_in_files(path, keyword):
-    """Search for keyword in all files under specified path"""
+# Files sent to a worker process per task
+SEARCH_CHUNK_FILES = 32
+
+# Tasks kept in flight per worker, so a search that stops early leaves little work behind
+SEARCH_TASKS_PER_WORKER = 4
+
+# Inline flags such as (?i) at the start of a --regex keyword
+LEADING_FLAGS_PATTERN = re.compile(r'\(\?([aiLmsux]+)\)')
+
+# Inline flags that can be scoped to one keyword; the others apply to the whole pattern, except u,
+# which str patterns have anyway
+SCOPED_FLAGS = 'imsx'
+
+
+def compile_search_pattern(keywords, regex=False, ignore_case=False, word=False):
+    """Compile one or more keywords into a single regular expression, or return None if one is invalid
+
+    Literal keywords are escaped and tried longest first, so every line is scanned once no matter
+    how many keywords are given and the longest keyword wins where several start at the same column.
+    """
+    if regex:
+        alternatives = []
+        global_flags = ''
+        for keyword in keywords:
+            try:
+                re.compile(keyword)
+            except re.error as e:
+                print(f"Error: Invalid regular expression '{keyword}': {e}")
+                return None
+            
+            # Inline flags are only allowed at the start of the combined pattern, so scope them to their keyword
+            scoped_flags = ''
+            flags_match = LEADING_FLAGS_PATTERN.match(keyword)
+            while flags_match:
+                scoped_flags += ''.join(flag for flag in flags_match.group(1) if flag in SCOPED_FLAGS)
+                global_flags += ''.join(flag for flag in flags_match.group(1) if flag not in SCOPED_FLAGS + 'u')
+                keyword = keyword[flags_match.end():]
+                flags_match = LEADING_FLAGS_PATTERN.match(keyword)
+            if scoped_flags:
+                # A verbose keyword may end in a comment, which must not swallow the closing parenthesis
+                keyword = f'(?{scoped_flags}:{keyword}\n)' if 'x' in scoped_flags else f'(?{scoped_flags}:{keyword})'
+            alternatives.append(keyword)
+    else:
+        alternatives = [re.escape(keyword) for keyword in sorted(set(keywords), key=len, reverse=True)]
+    
+    body = '|'.join(f'(?:{alternative})' for alternative in alternatives)
+    if word:
+        body = rf'\b(?:{body})\b'
+    if regex and global_flags:
+        body = f'(?{"".join(sorted(set(global_flags)))}){body}'
+    # Multiline so that ^ and $ anchor to lines when a whole file is searched at once
+    flags = re.MULTILINE | (re.IGNORECASE if ignore_case else 0)
+    try:
+        return re.compile(body, flags)
+    except re.error as e:
+        print(f"Error: Invalid regular expression {describe_keywords(keywords)}: {e}")
+        return None
+
+
+def compile_byte_pattern(pattern):
+    """Return the bytes version of an ASCII-only search pattern, or None
+
+    On ASCII content the bytes pattern matches exactly where the text pattern does, so such files
+    can be ruled out before they are decoded. Patterns using syntax only text patterns support, such
+    as \\u00e9, \\N{...} or (?u), have no bytes version.
+    """
+    try:
+        return re.compile(pattern.pattern.encode('ascii'), pattern.flags & ~re.UNICODE)
+    except (UnicodeEncodeError, re.error):
+        return None
+
+
+def find_match_spans(pattern, line):
+    """Return the (start, end) columns of every match in a line, or an empty list"""
+    return [match.span() for match in pattern.finditer(line)]
+
+
+def render_carets(spans, indent):
+    """Return a line of carets under the given match spans"""
+    pointer_line = " " * indent
+    column = 0
+    for start, end in spans:
+        pointer_line += " " * (start - column) + "^" * (end - start)
+        column = end
+    return pointer_line
+
+
+def describe_keywords(keywords):
+    """Return the keywords quoted for headers and summaries"""
+    return ', '.join(f"'{keyword}'" for keyword in keywords)
+
+
+def search_file(file_path, pattern, byte_pattern=None, max_count=None, before=0, after=0):
+    """Search one file, returning (file_path, records, error)
+
+    Records are (line_num, line, spans) for matching lines and (line_num, line, None) for up to before
+    and after context lines around them. The whole file is read and searched at once; splitting it
+    into lines starts at the first match and stops once max_count matching lines and their trailing
+    context were found.
+    """
+    try:
+        # Binary files are rejected after reading their first few KB
+        data = read_universal_bytes(file_path)
+        if data is None:
+            return file_path, [], None
+        
+        # Most files contain no match at all; rule them out before decoding where possible
+        if byte_pattern is not None and is_ascii(data):
+            if not byte_pattern.search(data):
+                return file_path, [], None
+        content = data.decode('utf-8', errors='ignore')
+        first_match = pattern.search(content)
+        if not first_match:
+            return file_path, [], None
+        
+        # No line before the one holding the first match can match; only its context is needed
+        start = content.rfind('\n', 0, first_match.start()) + 1
+        for _ in range(before):
+            if start == 0:
+                break
+            start = content.rfind('\n', 0, start - 1) + 1
+        first_line_num = content.count('\n', 0, start) + 1
+        
+        # With --files-with-matches and -q the line holding the first match is all that is needed
+        if max_count == 1 and not before and not after and start < len(content):
+            end = content.find('\n', start)
+            line = content[start:end] if end != -1 else content[start:]
+            spans = find_match_spans(pattern, line)
+            if spans:
+                return file_path, [(first_line_num, line, spans)], None
+        
+        records = []
+        match_count = 0
+        after_remaining = 0
+        # Ring buffer of the latest non-matching lines, emitted as context before the next match
+        before_lines = deque(maxlen=before) if before else None
+        lines = content[start:].split('\n')
+        if not lines[-1]:
+            # The text after a final newline is not a line
+            lines.pop()
+        for line_num, line in enumerate(lines, first_line_num):
+            if max_count is not None and match_count >= max_count and after_remaining == 0:
+                break
+            # Match positions are found once and reused for the carets
+            spans = find_match_spans(pattern, line)
+            if spans and (max_count is None or match_count < max_count):
+                if before_lines:
+                    records.extend(before_lines)
+                    before_lines.clear()
+                records.append((line_num, line, spans))
+                match_count += 1
+                after_remaining = after
+            elif spans:
+                # Trailing context ends at the next match past max_count
+                break
+            elif after_remaining:
+                records.append((line_num, line, None))
+                after_remaining -= 1
+            elif before_lines is not None:
+                before_lines.append((line_num, line, None))
+        return file_path, records, None
+    
+    except (UnicodeDecodeError, PermissionError, IsADirectoryError):
+        # Skip unreadable files
+        return file_path, [], None
+    except Exception as e:
+        return file_path, [], str(e)
+
+
+def search_chunk(file_paths, pattern, byte_pattern=None, max_count=None, before=0, after=0):
+    """Search several files in one worker task"""
+    return [search_file(file_path, pattern, byte_pattern, max_count, before, after) for file_path in file_paths]
+
+
+def search_files(file_paths, pattern, max_count=None, before=0, after=0):
+    """Yield search_file results in input order, spreading large searches across all CPU cores
+
+    Only a few tasks per worker are queued ahead of the consumer; when it stops early the tasks that
+    have not started are cancelled.
+    """
+    file_paths = list(file_paths)
+    byte_pattern = compile_byte_pattern(pattern)
+    workers = os.cpu_count() or 1
+    if len(file_paths) < PARALLEL_SEARCH_MIN_FILES or workers < 2:
+        for file_path in file_paths:
+            yield search_file(file_path, pattern, byte_pattern, max_count, before, after)
+        return
+    
+    search = partial(search_chunk, pattern=pattern, byte_pattern=byte_pattern, max_count=max_count,
+                     before=before, after=after)
+    with ProcessPoolExecutor(workers) as executor:
+        pending = deque()
+        try:
+            for start in range(0, len(file_paths), SEARCH_CHUNK_FILES):
+                pending.append(executor.submit(search, file_paths[start:start + SEARCH_CHUNK_FILES]))
+                if len(pending) >= workers * SEARCH_TASKS_PER_WORKER:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def truncate_records(records, limit, after=0):
+    """Keep the first limit matching lines of a file's records and the context that follows them"""
+    kept = []
+    match_count = 0
+    for record in records:
+        if record[2] is not None:
+            if match_count == limit:
+                break
+            match_count += 1
+            after_remaining = after
+        elif match_count == limit:
+            if after_remaining == 0:
+                break
+            after_remaining -= 1
+        kept.append(record)
+    return kept
+
+
+def write_records(output, records, context):
+    """Write a file's matching lines, with carets when decorating and '--' between context groups"""
+    previous_line_num = None
+    for line_num, line, spans in records:
+        if context and previous_line_num is not None and line_num != previous_line_num + 1:
+            output.line("--")
+        previous_line_num = line_num
+        
+        if spans is None:
+            # Context lines are marked with '-' instead of ':'
+            output.line(f"Line {line_num}- {line.rstrip()}")
+            continue
+        
+        # Print match information
+        prefix = f"Line {line_num}: "
+        output.line(f"{prefix}{line.rstrip()}")
+        
+        # Use caret to indicate keyword position
+        if output.decorate:
+            output.line(render_carets(spans, len(prefix)))
+
+
+def search_keyword_in_files(path, keyword, files=None, regex=False, ignore_case=False, word=False, index=None,
+                            files_with_matches=False, max_count=None, max_total=None, quiet=False,
+                            before=0, after=0):
+    """Search for one or more keywords (or regular expressions) in all files under specified path
+
+    files_with_matches lists the matching files only, max_count limits the matches reported per file
+    and max_total those reported overall; quiet prints nothing and stops at the first match. before
+    and after add context lines around every match. Output is buffered, and caret lines and colors
+    are left out when stdout is not a terminal. Returns the number of matches reported, or None if
+    the search could not run.
+    """
+    output = BufferedOutput()
     try:
         if not os.path.exists(path):
             print(f"Error: Path '{path}' does not exist")
@@ -16,63 +278,88 @@ def search_keyword_in_files(path, keyword):
             print(f"Error: '{path}' is not a directory")
             return
         
-        print(f"Searching for keyword '{keyword}' in: {os.path.abspath(path)}")
-        print("=" * 60)
+        for option, limit in (('--max-count', max_count), ('--max-total', max_total)):
+            if limit is not None and limit < 1:
+                print(f"Error: {option} must be at least 1")
+                return
+        if before < 0 or after < 0:
+            print("Error: Context line counts cannot be negative")
+            return
+        
+        keywords = [keyword] if isinstance(keyword, str) else list(keyword)
+        pattern = compile_search_pattern(keywords, regex, ignore_case, word)
+        if pattern is None:
+            return
+        
+        # A file's first match is enough to list it or to answer a quiet search
+        if files_with_matches or quiet:
+            max_count = 1
+            before = after = 0
+        if quiet:
+            max_total = 1
+        
+        label = "pattern" if regex else "keyword"
+        if len(keywords) > 1:
+            label += "s"
+        if not quiet:
+            output.line(f"Searching for {label} {describe_keywords(keywords)} in: {os.path.abspath(path)}")
+            output.line("=" * 60)
         
         total_matches = 0
-        files_with_matches = 0
-        
-        for root, dirs, files in os.walk(path):
-            for file in files:
-                file_path = os.path.join(root, file)
-                
-                # Skip binary files and special files
-                if should_skip_file(file):
-                    continue
-                
-                try:
-                    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                        lines = f.readlines()
-                        
-                    file_matches = 0
-                    for line_num, line in enumerate(lines, 1):
-                        if keyword in line:
-                            if file_matches == 0:
-                                # First match found in this file, print file path
-                                print(f"\nFile: {os.path.relpath(file_path, path)}")
-                                print("-" * 40)
-                            
-                            # Print match information
-                            print(f"Line {line_num}: {line.rstrip()}")
-                            
-                            # Use caret to indicate keyword position
-                            pointer_line = " " * (len(f"Line {line_num}: "))
-                            start_pos = 0
-                            while True:
-                                pos = line.find(keyword, start_pos)
-                                if pos == -1:
-                                    break
-                                pointer_line += " " * (pos - start_pos) + "^" * len(keyword)
-                                start_pos = pos + len(keyword)
-                            
-                            print(pointer_line)
-                            file_matches += 1
-                            total_matches += 1
-                    
-                    if file_matches > 0:
-                        files_with_matches += 1
-                        
-                except (UnicodeDecodeError, PermissionError, IsADirectoryError):
-                    # Skip unreadable files
-                    continue
-                except Exception as e:
-                    print(f"Error reading file {file_path}: {e}")
-        
-        print("\n" + "=" * 60)
-        print(f"Search completed:")
-        print(f"  Keyword: '{keyword}'")
-        print(f"  Files with matches: {files_with_matches}")
-        print(f"  Total matches: {total_matches}")
+        matched_files = 0
+        
+        # Skip binary files and special files
+        entries = (entry for entry in iter_file_entries(path, files) if not should_skip_file(entry.name))
+        manifest = get_manifest()
+        if manifest is not None:
+            # Files an earlier run found to be binary are not opened again
+            entries = (entry for entry in entries if not manifest.is_known_binary(entry))
+        if index is not None:
+            # Only read the files whose trigrams can contain a keyword
+            file_paths = index.select(entries, keywords, regex)
+        else:
+            file_paths = (entry.path for entry in entries)
+        
+        # Files are searched in parallel but reported in walk order
+        for file_path, records, error in search_files(file_paths, pattern, max_count, before, after):
+            if error is not None:
+                if not quiet:
+                    output.line(f"Error reading file {file_path}: {error}")
+                continue
+            if not records:
+                continue
+            
+            if max_total is not None:
+                records = truncate_records(records, max_total - total_matches, after)
+            matched_files += 1
+            total_matches += sum(1 for record in records if record[2] is not None)
+            
+            if files_with_matches:
+                output.line(os.path.relpath(file_path, path))
+            elif not quiet:
+                # Print file path once, followed by every match
+                output.line(f"\nFile: {os.path.relpath(file_path, path)}")
+                output.line("-" * 40)
+                write_records(output, records, before or after)
+            
+            # Stop reading further files once the overall limit is reached
+            if max_total is not None and total_matches >= max_total:
+                break
+        
+        if quiet:
+            return total_matches
         
+        output.line("\n" + "=" * 60)
+        output.line(f"Search completed:")
+        output.line(f"  {label.capitalize()}: {describe_keywords(keywords)}")
+        output.line(f"  Files with matches: {matched_files}")
+        if not files_with_matches:
+            output.line(f"  Total matches: {total_matches}")
+        if index is not None:
+            index.print_summary(output)
+        output.flush()
+        return total_matches
+    
     except Exception as e:
+        output.flush()
         print(f"Error: {e}")
\ No newline at end of file
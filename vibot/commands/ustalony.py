@@ -2,11 +2,19 @@
 """vibot ustalony command implementation - AI-powered hardcoded secrets detection"""
 
 import os
+import re
 import json
+import math
 import sys
+import bisect
 import subprocess
 import time
-from ..utils import should_skip_file, Colors
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from ..utils import Colors
+from ..ai import iter_source_paths, read_source_file, run_planned, get_client, AnalysisPlan, plan_file
+from ..chunking import DEFAULT_CHUNK_CHARS
+from ..gitdiff import DiffScope
 
 # Try to import openai, provide installation hint if failed
 try:
@@ -15,6 +23,52 @@ try:
 except ImportError:
     OPENAI_AVAILABLE = False
 
+# Bump when the prompt or result format changes to invalidate cached results
+PROMPT_VERSION = 1
+
+# File extensions analyzed by this command (None: every text file)
+SUPPORTED_EXTENSIONS = None
+
+# Files with less content than this are skipped
+MIN_CONTENT_LENGTH = 10
+
+# Where findings and their line numbers live in the AI result
+RESULT_FIELDS = {'list_key': 'issues', 'flag_key': 'has_issues'}
+
+# Provider-specific secret formats: (issue type, pattern, severity)
+SECRET_PATTERNS = [
+    ('AWS Access Key', re.compile(r'\b(?:AKIA|ASIA)[0-9A-Z]{16}\b'), 'high'),
+    ('GitHub Token', re.compile(r'\b(?:gh[pousr]_[A-Za-z0-9]{36,}|github_pat_[A-Za-z0-9_]{60,})\b'), 'high'),
+    ('GitLab Token', re.compile(r'\bglpat-[A-Za-z0-9_\-]{20,}'), 'high'),
+    ('Slack Token', re.compile(r'\bxox[abposr]-[A-Za-z0-9\-]{10,}'), 'high'),
+    ('Slack Webhook', re.compile(r'https://hooks\.slack\.com/services/[A-Za-z0-9/]+'), 'high'),
+    ('Google API Key', re.compile(r'\bAIza[0-9A-Za-z_\-]{35}'), 'high'),
+    ('Stripe Key', re.compile(r'\b(?:sk|rk)_(?:live|test)_[0-9A-Za-z]{16,}'), 'high'),
+    ('OpenAI API Key', re.compile(r'\bsk-(?:proj-)?[A-Za-z0-9_\-]{20,}'), 'high'),
+    ('Private Key', re.compile(r'-----BEGIN (?:[A-Z]+ )*PRIVATE KEY-----'), 'high'),
+    ('JSON Web Token', re.compile(r'\beyJ[A-Za-z0-9_\-]{10,}\.eyJ[A-Za-z0-9_\-]{10,}\.[A-Za-z0-9_\-]{10,}'), 'medium'),
+    ('Connection String Credentials', re.compile(r'\b[a-zA-Z][a-zA-Z0-9+.\-]*://[^\s:/@\'"]+:[^\s@/\'"]+@[^\s\'"]+'), 'high'),
+    # The name may carry any prefix or suffix, as in DB_PASSWORD or api_token
+    ('Hardcoded Credential', re.compile(
+        r'(?i)(?:password|passwd|pwd|secret|token|api[_\-]?key|access[_\-]?key)[A-Za-z0-9_]*'
+        r'[\'"]?\]?\s*(?::|=|:=|=>)\s*[\'"][^\'"\s]{4,}[\'"]'
+    ), 'medium'),
+]
+
+# Quoted strings long enough to be a random key or token
+SECRET_LITERAL_PATTERN = re.compile(r'[\'"]([A-Za-z0-9+/=_\-]{20,})[\'"]')
+HEX_CHARACTERS = set('0123456789abcdefABCDEF')
+
+# Shannon entropy (bits per character) above which a literal looks random
+BASE64_ENTROPY_THRESHOLD = 4.5
+HEX_ENTROPY_THRESHOLD = 3.0
+
+# Lines of code sent to the model around each candidate line
+SECRET_CONTEXT_LINES = 3
+
+# Below this many files the local scan runs in-process instead of on a process pool
+PARALLEL_SCAN_MIN_FILES = 64
+
 # Token usage tracking
 class TokenUsageTracker:
     def __init__(self):
@@ -24,19 +78,21 @@ class TokenUsageTracker:
         self.total_tokens = 0
         self.model_name = ""
         self.start_time = None
+        self._lock = threading.Lock()
         
     def start_tracking(self, model):
         self.model_name = model
         self.start_time = time.time()
         
     def add_usage(self, usage):
-        self.total_api_calls += 1
-        if hasattr(usage, 'prompt_tokens'):
-            self.total_prompt_tokens += usage.prompt_tokens
-        if hasattr(usage, 'completion_tokens'):
-            self.total_completion_tokens += usage.completion_tokens
-        if hasattr(usage, 'total_tokens'):
-            self.total_tokens += usage.total_tokens
+        with self._lock:
+            self.total_api_calls += 1
+            if hasattr(usage, 'prompt_tokens'):
+                self.total_prompt_tokens += usage.prompt_tokens
+            if hasattr(usage, 'completion_tokens'):
+                self.total_completion_tokens += usage.completion_tokens
+            if hasattr(usage, 'total_tokens'):
+                self.total_tokens += usage.total_tokens
             
     def print_summary(self):
         if self.total_api_calls > 0:
@@ -57,17 +113,97 @@ class TokenUsageTracker:
 token_tracker = TokenUsageTracker()
 
 
-def analyze_code_with_ai(file_content, file_path, api_key, api_proxy, model):
+def shannon_entropy(text):
+    """Return the Shannon entropy of text in bits per character"""
+    counts = {}
+    for char in text:
+        counts[char] = counts.get(char, 0) + 1
+    length = len(text)
+    return -sum(count / length * math.log2(count / length) for count in counts.values())
+
+
+def scan_for_secrets(file_content):
+    """Return secret candidates found by the local regex and entropy scanner, one per line, ordered by line"""
+    line_starts = [0] + [match.end() for match in re.finditer('\n', file_content)]
+    lines = file_content.split('\n')
+    candidates = {}
+
+    def add_candidate(offset, issue_type, severity, description):
+        line_number = bisect.bisect_right(line_starts, offset)
+        # Provider-specific matches run first and win over entropy matches on the same line
+        if line_number in candidates:
+            return
+        candidates[line_number] = {
+            'line_number': line_number,
+            'line_content': lines[line_number - 1].strip()[:200],
+            'issue_type': issue_type,
+            'description': description,
+            'severity': severity,
+            'suggestion': 'Move this value to an environment variable or a secret manager'
+        }
+
+    for issue_type, pattern, severity in SECRET_PATTERNS:
+        for match in pattern.finditer(file_content):
+            add_candidate(match.start(), issue_type, severity, f"Value matches the {issue_type} format")
+
+    for match in SECRET_LITERAL_PATTERN.finditer(file_content):
+        literal = match.group(1)
+        threshold = HEX_ENTROPY_THRESHOLD if set(literal) <= HEX_CHARACTERS else BASE64_ENTROPY_THRESHOLD
+        entropy = shannon_entropy(literal)
+        if entropy > threshold:
+            add_candidate(
+                match.start(1), 'High Entropy String', 'medium',
+                f"Random-looking string literal ({entropy:.2f} bits per character) may be a key or token"
+            )
+
+    return [candidates[line_number] for line_number in sorted(candidates)]
+
+
+def scan_source_file(file_path):
+    """Read and scan one file, returning (file_path, file_content, candidates) or None if the file is skipped
+
+    The content is only returned when there are candidates, so clean files are not sent back from worker processes;
+    plan_secrets_file reads them again when they go to the AI.
+    """
+    file_content = read_source_file(file_path, MIN_CONTENT_LENGTH)
+    if file_content is None:
+        return None
+    candidates = scan_for_secrets(file_content)
+    return file_path, file_content if candidates else None, candidates
+
+
+def scan_files_for_secrets(file_paths):
+    """Yield scan_source_file results in input order, spreading large scans across all CPU cores"""
+    file_paths = list(file_paths)
+    if len(file_paths) < PARALLEL_SCAN_MIN_FILES or (os.cpu_count() or 1) < 2:
+        scan_results = map(scan_source_file, file_paths)
+        for scan_result in scan_results:
+            if scan_result is not None:
+                yield scan_result
+        return
+
+    with ProcessPoolExecutor() as executor:
+        for scan_result in executor.map(scan_source_file, file_paths, chunksize=32):
+            if scan_result is not None:
+                yield scan_result
+
+
+def analyze_code_with_ai(file_content, file_path, api_key, api_proxy, model, cache=None):
     """Analyze code for sensitive information using AI"""
     if not OPENAI_AVAILABLE:
         return None
+    
+    # Reuse the cached result if this exact content was analyzed before
+    cache_key = None
+    if cache is not None:
+        cache_key = cache.make_key(file_content, 'ustalony', model, PROMPT_VERSION)
+        cached_result = cache.get(cache_key)
+        if cached_result is not None:
+            return cached_result
         
     try:
-        # Configure OpenAI client
-        client = openai.OpenAI(
-            api_key=api_key,
-            base_url=api_proxy
-        )
+        # Reuse the shared, connection-pooled OpenAI client
+        client = get_client(api_key, api_proxy)
         
         # Build analysis prompt
         prompt = f"""
@@ -139,6 +275,8 @@ Notes:
         
         try:
             result = json.loads(ai_response)
+            if cache_key is not None:
+                cache.put(cache_key, result)
             return result
         except json.JSONDecodeError as e:
             print(f"Warning: Failed to parse AI response as JSON: {e}")
@@ -159,11 +297,52 @@ Notes:
         return None
 
 
-def detect_hardcoded_secrets(path):
-    """Detect hardcoded sensitive information using AI"""
+def plan_secrets_file(item, api_key, api_proxy, model, cache=None, diff_scope=None,
+                      chunk_chars=DEFAULT_CHUNK_CHARS, candidates=None, offline=False):
+    """Plan confirming the local scanner's candidates in one file with the AI, or report them as-is when offline"""
+    file_path, _, file_content = item
+    if candidates is None:
+        candidates = scan_for_secrets(file_content)
+
+    # With --hunks-only, only candidates on changed lines matter
+    if diff_scope is not None:
+        changed_ranges = diff_scope.line_ranges.get(file_path, [])
+        candidates = [
+            candidate for candidate in candidates
+            if any(start <= candidate['line_number'] <= end for start, end in changed_ranges)
+        ]
+
+    if offline:
+        return AnalysisPlan.done({"has_issues": bool(candidates), "issues": candidates, "static_check": True})
+
+    def analyze_text(content, label):
+        return analyze_code_with_ai(content, label, api_key, api_proxy, model, cache=cache)
+
+    # The scanner only knows common formats, so a file it found nothing in is still read by the model
+    if not candidates:
+        if file_content is None:
+            # The scan does not send clean files back from its worker processes
+            file_content = read_source_file(file_path, MIN_CONTENT_LENGTH)
+            if file_content is None:
+                return AnalysisPlan.done({"has_issues": False, "issues": []})
+            item = (file_path, item[1], file_content)
+        return plan_file(analyze_text, item, RESULT_FIELDS, diff_scope, chunk_chars)
+
+    # Send only the windows around candidate lines and keep findings on those lines
+    candidate_scope = DiffScope(
+        {file_path: [(candidate['line_number'], candidate['line_number']) for candidate in candidates]},
+        SECRET_CONTEXT_LINES,
+        'lines flagged by a local secret scanner'
+    )
+
+    return plan_file(analyze_text, item, RESULT_FIELDS, candidate_scope, chunk_chars)
+
+
+def detect_hardcoded_secrets(path, jobs=1, cache=None, files=None, diff_scope=None, chunk_chars=DEFAULT_CHUNK_CHARS, offline=False):
+    """Detect hardcoded sensitive information with a local scanner, confirmed by AI unless offline"""
     try:
         # Check if openai package is available
-        if not OPENAI_AVAILABLE:
+        if not OPENAI_AVAILABLE and not offline:
             print(f"{Colors.BRIGHT_ORANGE_RED}❌ Error: openai package not found{Colors.RESET}")
             print("The openai package is required for AI-powered security scanning.")
             print("\nTrying to install openai package...")
@@ -184,7 +363,7 @@ def detect_hardcoded_secrets(path):
         api_proxy = os.getenv('VIBOT_API_PROXY')
         model = os.getenv('VIBOT_API_MODEL', 'deepseek-v3')
         
-        if not api_key or not api_proxy:
+        if (not api_key or not api_proxy) and not offline:
             print(f"{Colors.BRIGHT_ORANGE_RED}❌ Error: AI API configuration missing{Colors.RESET}")
             print("Please set the following environment variables:")
             print("  VIBOT_API_KEY - Your API key")
@@ -206,81 +385,83 @@ def detect_hardcoded_secrets(path):
         # Initialize token tracking
         token_tracker.start_tracking(model)
         
-        print(f"🤖 AI-powered security scan in: {os.path.abspath(path)}")
-        print(f"Using model: {model}")
+        if offline:
+            print(f"🔍 Offline security scan in: {os.path.abspath(path)}")
+            print("Using local regex and entropy scanner only (no AI confirmation)")
+        else:
+            print(f"🤖 AI-powered security scan in: {os.path.abspath(path)}")
+            print(f"Using model: {model}")
         print("=" * 60)
         
         all_issues = []
         total_files_scanned = 0
         files_with_issues = 0
+        files_cleared_locally = 0
+        
+        # Scan every file locally first; files with candidates only send the lines around them to the model
+        scan_results = scan_files_for_secrets(iter_source_paths(path, SUPPORTED_EXTENSIONS, files))
         
-        for root, dirs, files in os.walk(path):
-            for file in files:
-                file_path = os.path.join(root, file)
+        def plan(scan_result):
+            file_path, file_content, candidates = scan_result
+            item = (file_path, os.path.relpath(file_path, path), file_content)
+            return plan_secrets_file(
+                item, api_key, api_proxy, model, cache, diff_scope, chunk_chars,
+                candidates=candidates, offline=offline
+            )
+        
+        for (file_path, file_content, candidates), analysis_result in run_planned(plan, scan_results, jobs):
+            try:
+                total_files_scanned += 1
+                relative_path = os.path.relpath(file_path, path)
+                
+                print(f"Analyzing: {relative_path}...", end=" ")
                 
-                # Skip binary files and special files
-                if should_skip_file(file):
+                if analysis_result is None:
+                    print(f"{Colors.BRIGHT_ORANGE_RED}Failed{Colors.RESET}")
                     continue
                 
-                try:
-                    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                        file_content = f.read()
-                    
-                    # Skip empty files or too small files
-                    if len(file_content.strip()) < 10:
-                        continue
-                    
-                    total_files_scanned += 1
-                    relative_path = os.path.relpath(file_path, path)
-                    
-                    print(f"Analyzing: {relative_path}...", end=" ")
-                    
-                    # Analyze file with AI
-                    analysis_result = analyze_code_with_ai(file_content, relative_path, api_key, api_proxy, model)
-                    
-                    if analysis_result is None:
-                        print(f"{Colors.BRIGHT_ORANGE_RED}Failed{Colors.RESET}")
-                        continue
+                if analysis_result.get('static_check') and not analysis_result.get('has_issues', False):
+                    files_cleared_locally += 1
+                
+                if analysis_result.get('has_issues', False) and analysis_result.get('issues'):
+                    files_with_issues += 1
+                    print(f"{Colors.BRIGHT_ORANGE_RED}Issues found{Colors.RESET}")
                     
-                    if analysis_result.get('has_issues', False) and analysis_result.get('issues'):
-                        files_with_issues += 1
-                        print(f"{Colors.BRIGHT_ORANGE_RED}Issues found{Colors.RESET}")
+                    # Display found issues
+                    for issue in analysis_result['issues']:
+                        print(f"\n{Colors.BRIGHT_ORANGE_RED}⚠️  {issue.get('issue_type', 'Security Issue')} detected:{Colors.RESET}")
+                        print(f"   File: {Colors.YELLOW}{relative_path}{Colors.RESET}")
+                        print(f"   Line {issue.get('line_number', '?')}: {issue.get('line_content', '').strip()}")
+                        print(f"   Severity: {Colors.BRIGHT_ORANGE_RED}{issue.get('severity', 'unknown').upper()}{Colors.RESET}")
+                        print(f"   Description: {issue.get('description', '')}")
+                        if issue.get('suggestion'):
+                            print(f"   Suggestion: {Colors.YELLOW}{issue.get('suggestion', '')}{Colors.RESET}")
                         
-                        # Display found issues
-                        for issue in analysis_result['issues']:
-                            print(f"\n{Colors.BRIGHT_ORANGE_RED}⚠️  {issue.get('issue_type', 'Security Issue')} detected:{Colors.RESET}")
-                            print(f"   File: {Colors.YELLOW}{relative_path}{Colors.RESET}")
-                            print(f"   Line {issue.get('line_number', '?')}: {issue.get('line_content', '').strip()}")
-                            print(f"   Severity: {Colors.BRIGHT_ORANGE_RED}{issue.get('severity', 'unknown').upper()}{Colors.RESET}")
-                            print(f"   Description: {issue.get('description', '')}")
-                            if issue.get('suggestion'):
-                                print(f"   Suggestion: {Colors.YELLOW}{issue.get('suggestion', '')}{Colors.RESET}")
-                            
-                            # Add to total results
-                            all_issues.append({
-                                'file': relative_path,
-                                'line': issue.get('line_number'),
-                                'type': issue.get('issue_type'),
-                                'description': issue.get('description'),
-                                'severity': issue.get('severity'),
-                                'suggestion': issue.get('suggestion')
-                            })
-                    else:
-                        print(f"{Colors.YELLOW}Clean{Colors.RESET}")
-                
-                except (UnicodeDecodeError, PermissionError, IsADirectoryError):
-                    continue
-                except Exception as e:
-                    print(f"Error reading file {file_path}: {e}")
+                        # Add to total results
+                        all_issues.append({
+                            'file': relative_path,
+                            'line': issue.get('line_number'),
+                            'type': issue.get('issue_type'),
+                            'description': issue.get('description'),
+                            'severity': issue.get('severity'),
+                            'suggestion': issue.get('suggestion')
+                        })
+                else:
+                    print(f"{Colors.YELLOW}Clean{Colors.RESET}")
+            
+            except Exception as e:
+                print(f"Error analyzing file {file_path}: {e}")
         
         print("\n" + "=" * 60)
-        print(f"🔍 AI Security Scan Results:")
+        print(f"🔍 {'Offline' if offline else 'AI'} Security Scan Results:")
         print(f"  Files scanned: {total_files_scanned}")
+        if offline:
+            print(f"  Files cleared by local scan: {files_cleared_locally}")
         print(f"  Files with issues: {files_with_issues}")
         print(f"  Total issues found: {len(all_issues)}")
         
         if all_issues:
-            print(f"\n{Colors.BRIGHT_ORANGE_RED}🚨 Security Issues Detected by AI!{Colors.RESET}")
+            print(f"\n{Colors.BRIGHT_ORANGE_RED}🚨 Security Issues Detected{'' if offline else ' by AI'}!{Colors.RESET}")
             
             # Classify by severity
             severity_counts = {}
@@ -293,7 +474,7 @@ def detect_hardcoded_secrets(path):
                 color = Colors.BRIGHT_ORANGE_RED if severity == 'high' else Colors.YELLOW if severity == 'medium' else Colors.RESET
                 print(f"  {color}{severity.upper()}: {count}{Colors.RESET}")
             
-            print(f"\n{Colors.YELLOW}💡 AI Recommendations:{Colors.RESET}")
+            print(f"\n{Colors.YELLOW}💡 {'' if offline else 'AI '}Recommendations:{Colors.RESET}")
             print("1. Review all HIGH severity issues immediately")
             print("2. Use environment variables for sensitive configuration")
             print("3. Implement proper secret management practices")
@@ -301,11 +482,13 @@ def detect_hardcoded_secrets(path):
             print("5. Add sensitive files to .gitignore to prevent accidental commits")
             
         else:
-            print(f"\n{Colors.YELLOW}✅ AI analysis complete - No security issues detected!{Colors.RESET}")
+            print(f"\n{Colors.YELLOW}✅ {'Local scan' if offline else 'AI analysis'} complete - No security issues detected!{Colors.RESET}")
             print("Your code appears to follow good security practices.")
         
         # Print token usage summary
         token_tracker.print_summary()
+        if cache is not None:
+            cache.print_summary()
         
     except Exception as e:
         print(f"Error: {e}")
\ No newline at end of file
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""vibot file discovery - one pruning, scandir-based directory walk shared by every command"""
+
+import os
+from .ignore import IgnoreMatcher
+
+# Directories that never contain code worth analyzing; they are not descended into
+PRUNED_DIRECTORIES = {
+    '.git', '.hg', '.svn',
+    'node_modules', 'bower_components',
+    'venv', '.venv',
+    'dist',
+    '__pycache__', '.mypy_cache', '.pytest_cache', '.tox',
+}
+
+# Walk settings chosen on the command line, shared by every command
+walk_options = {
+    'exclude': [],
+    'use_ignore_files': True,
+}
+
+
+def configure_walk(exclude=None, use_ignore_files=True):
+    """Set the --exclude globs and whether .gitignore / .vibotignore files are honoured"""
+    walk_options['exclude'] = list(exclude or [])
+    walk_options['use_ignore_files'] = use_ignore_files
+
+
+def make_ignore_matcher(path):
+    """Return the IgnoreMatcher for a walk rooted at path under the current walk settings"""
+    return IgnoreMatcher(path, walk_options['exclude'], walk_options['use_ignore_files'])
+
+
+def is_pruned_directory(name):
+    """Return True if a directory with this name is skipped by the walk"""
+    return name in PRUNED_DIRECTORIES
+
+
+class FileEntry:
+    """Minimal os.DirEntry stand-in for explicitly listed files, with a cached stat"""
+
+    def __init__(self, path):
+        self.path = path
+        self.name = os.path.basename(path)
+        self._stat = None
+
+    def stat(self):
+        if self._stat is None:
+            self._stat = os.stat(self.path)
+        return self._stat
+
+    def is_symlink(self):
+        return os.path.islink(self.path)
+
+
+def iter_directories(path, on_error=None):
+    """Yield (relative_dir, file_entries, subdirectories) for every directory under path, parents first
+
+    relative_dir is '' for path itself and '/'-separated below it. file_entries are the directory's
+    files and subdirectories its DirEntry objects for the directories that will be visited next, both
+    sorted by name. Pruned directories and paths excluded by ignore files or --exclude globs are never
+    entered, directory symlinks are not followed and a file reached twice through hard links or
+    symlinks is listed once. Directories that cannot be read are passed to on_error(relative_dir, error)
+    and skipped.
+    """
+    ignore_matcher = make_ignore_matcher(path)
+    seen = set()
+    # Stack of (directory, path relative to the root) still to visit; popped last-in-first-out
+    # so the order matches a sorted os.walk
+    stack = [(path, '')]
+    while stack:
+        directory, relative_dir = stack.pop()
+        try:
+            with os.scandir(directory) as scanner:
+                entries = sorted(scanner, key=lambda entry: entry.name)
+            device = os.stat(directory).st_dev
+        except OSError as e:
+            if on_error is not None:
+                on_error(relative_dir, e)
+            continue
+        
+        file_entries = []
+        subdirectories = []
+        for entry in entries:
+            relative_path = f"{relative_dir}/{entry.name}" if relative_dir else entry.name
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if not is_pruned_directory(entry.name) and not ignore_matcher.is_ignored(relative_path, True, relative_dir):
+                        subdirectories.append(entry)
+                    continue
+                if entry.is_symlink():
+                    # Identify a symlink by the file it points to; broken links are skipped
+                    if not entry.is_file():
+                        continue
+                    target = entry.stat()
+                    key = (target.st_dev, target.st_ino)
+                elif entry.is_file(follow_symlinks=False):
+                    key = (device, entry.inode())
+                else:
+                    continue
+            except OSError:
+                continue
+            
+            if key in seen or ignore_matcher.is_ignored(relative_path, False, relative_dir):
+                continue
+            seen.add(key)
+            file_entries.append(entry)
+        
+        yield relative_dir, file_entries, subdirectories
+        
+        stack.extend(
+            (entry.path, f"{relative_dir}/{entry.name}" if relative_dir else entry.name)
+            for entry in reversed(subdirectories)
+        )
+
+
+def iter_file_entries(path, files=None):
+    """Yield a DirEntry-like object for every file under path, in sorted order
+
+    The walk is the one of iter_directories. The entries' stat() results are cached, so callers can
+    read sizes and mtimes without another system call. When files is given, only those files (minus
+    excluded ones) are yielded.
+    """
+    if files is not None:
+        ignore_matcher = make_ignore_matcher(path)
+        for file_path in sorted(files):
+            if not ignore_matcher.is_path_ignored(file_path):
+                yield FileEntry(file_path)
+        return
+    
+    for _, file_entries, _ in iter_directories(path):
+        yield from file_entries
\ No newline at end of file
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""vibot git helpers - restrict analysis to files changed in a diff"""
+
+import os
+import re
+import subprocess
+
+# Matches the new-file side of a unified diff hunk header: @@ -a,b +c,d @@
+HUNK_HEADER_PATTERN = re.compile(r'^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@')
+
+# Placeholder line sent to the model in place of unchanged code
+OMITTED_LINES_MARKER = '[... unchanged lines omitted ...]'
+
+# Default number of unchanged lines sent around each changed hunk
+DEFAULT_DIFF_CONTEXT = 5
+
+# Single-character escapes git uses in C-quoted path names
+C_ESCAPES = {
+    'a': b'\a', 'b': b'\b', 't': b'\t', 'n': b'\n', 'v': b'\v', 'f': b'\f', 'r': b'\r',
+    '"': b'"', '\\': b'\\',
+}
+
+
+def run_git(path, *git_args):
+    """Run a git command inside path and return its stdout, or None if git fails"""
+    try:
+        completed = subprocess.run(
+            ['git', '-C', path] + list(git_args),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+    except OSError as e:
+        print(f"Error: Unable to run git: {e}")
+        return None
+
+    if completed.returncode != 0:
+        message = completed.stderr.decode('utf-8', errors='ignore').strip()
+        print(f"Error: git {' '.join(git_args)} failed: {message}")
+        return None
+
+    return completed.stdout.decode('utf-8', errors='surrogateescape')
+
+
+def build_diff_args(since=None, staged=False):
+    """Build the common `git diff` arguments for a --since / --staged selection"""
+    diff_args = []
+    if staged:
+        diff_args.append('--cached')
+    if since:
+        diff_args.append(since)
+    return diff_args
+
+
+def get_changed_files(path, since=None, staged=False):
+    """Return sorted absolute paths of files under path that were added or modified in the diff"""
+    if not os.path.isdir(path):
+        print(f"Error: '{path}' is not a directory")
+        return None
+
+    top_level = run_git(path, 'rev-parse', '--show-toplevel')
+    if top_level is None:
+        return None
+    top_level = top_level.strip()
+
+    output = run_git(path, 'diff', '--name-only', '-z', '--diff-filter=ACMR', *build_diff_args(since, staged), '--')
+    if output is None:
+        return None
+
+    changed_files = []
+    for name in output.split('\0'):
+        if not name:
+            continue
+        file_path = resolve_diff_path(path, top_level, name)
+        if file_path is not None:
+            changed_files.append(file_path)
+
+    return sorted(changed_files)
+
+
+def resolve_diff_path(path, top_level, name):
+    """Map a repository-relative diff path to a file path under path, or None if it lies outside"""
+    base_path = os.path.realpath(path)
+    real_path = os.path.realpath(os.path.join(top_level, name))
+    # Only keep files inside the analyzed path that still exist on disk
+    if os.path.commonpath([base_path, real_path]) != base_path or not os.path.isfile(real_path):
+        return None
+    return os.path.join(os.path.abspath(path), os.path.relpath(real_path, base_path))
+
+
+def unquote_c_path(name):
+    """Undo git's C-style quoting of a path name ("a\\tb\\303\\251"), leaving unquoted names as they are"""
+    if not (len(name) >= 2 and name.startswith('"') and name.endswith('"')):
+        return name
+
+    raw = bytearray()
+    index = 1
+    while index < len(name) - 1:
+        char = name[index]
+        if char != '\\':
+            raw += char.encode('utf-8', errors='surrogateescape')
+            index += 1
+            continue
+        escape = name[index + 1:index + 4]
+        if escape[:1] in C_ESCAPES:
+            raw += C_ESCAPES[escape[:1]]
+            index += 2
+        elif len(escape) == 3 and all(digit in '01234567' for digit in escape):
+            # Octal escapes are raw bytes of the UTF-8 encoded name
+            raw.append(int(escape, 8))
+            index += 4
+        else:
+            raw += b'\\'
+            index += 1
+    return raw.decode('utf-8', errors='surrogateescape')
+
+
+def get_changed_line_ranges(path, since=None, staged=False):
+    """Return {file_path: [(start_line, end_line), ...]} for lines added or modified in the diff"""
+    if not os.path.isdir(path):
+        print(f"Error: '{path}' is not a directory")
+        return None
+
+    top_level = run_git(path, 'rev-parse', '--show-toplevel')
+    if top_level is None:
+        return None
+    top_level = top_level.strip()
+
+    # Fixed prefixes, so diff.noprefix or diff.mnemonicPrefix in the user's git config cannot
+    # change the paths on the +++ lines
+    output = run_git(
+        path, '-c', 'core.quotePath=false', 'diff', '-U0', '--no-color', '--no-ext-diff',
+        '--src-prefix=a/', '--dst-prefix=b/', '--diff-filter=ACMR', *build_diff_args(since, staged), '--'
+    )
+    if output is None:
+        return None
+
+    line_ranges = {}
+    current_ranges = None
+    for line in output.split('\n'):
+        if line.startswith('+++ '):
+            # git ends names that contain spaces with a tab; names with real tabs are always quoted
+            name = unquote_c_path(line[4:].rstrip('\t'))
+            if name.startswith('b/'):
+                name = name[2:]
+            file_path = resolve_diff_path(path, top_level, name) if name != '/dev/null' else None
+            current_ranges = line_ranges.setdefault(file_path, []) if file_path else None
+            continue
+
+        match = HUNK_HEADER_PATTERN.match(line)
+        if match and current_ranges is not None:
+            start = int(match.group(1))
+            count = int(match.group(2)) if match.group(2) is not None else 1
+            # Pure deletions leave nothing on the new side to analyze
+            if count > 0:
+                current_ranges.append((start, start + count - 1))
+
+    return {file_path: ranges for file_path, ranges in line_ranges.items() if ranges}
+
+
+class DiffExcerpt:
+    """Changed hunks of one file plus context, with a map from excerpt lines back to file lines"""
+
+    def __init__(self, file_content, ranges, context=DEFAULT_DIFF_CONTEXT, reason='changed lines'):
+        lines = file_content.split('\n')
+        total_lines = len(lines)
+        self.ranges = sorted(ranges)
+        self.reason = reason
+
+        # Merge the context windows of neighbouring hunks
+        windows = []
+        for start, end in self.ranges:
+            window_start = max(1, start - context)
+            window_end = min(total_lines, end + context)
+            if window_start > window_end:
+                continue
+            if windows and window_start <= windows[-1][1] + 1:
+                windows[-1] = (windows[-1][0], max(windows[-1][1], window_end))
+            else:
+                windows.append((window_start, window_end))
+
+        excerpt_lines = []
+        self.line_map = []
+        last_end = 0
+        for window_start, window_end in windows:
+            if window_start > last_end + 1:
+                excerpt_lines.append(OMITTED_LINES_MARKER)
+                self.line_map.append(None)
+            for line_number in range(window_start, window_end + 1):
+                excerpt_lines.append(lines[line_number - 1])
+                self.line_map.append(line_number)
+            last_end = window_end
+        if last_end < total_lines:
+            excerpt_lines.append(OMITTED_LINES_MARKER)
+            self.line_map.append(None)
+
+        self.text = '\n'.join(excerpt_lines)
+        self.is_partial = len(windows) != 1 or windows[0] != (1, total_lines)
+
+    def describe(self, relative_path):
+        """Label the file path shown to the model so it knows it is reading an excerpt"""
+        if not self.is_partial:
+            return relative_path
+        return f"{relative_path} (excerpt of {self.reason}; '{OMITTED_LINES_MARKER}' marks skipped code)"
+
+    def to_file_line(self, excerpt_line):
+        """Translate a 1-based excerpt line number reported by the model into a file line number"""
+        try:
+            index = int(excerpt_line) - 1
+        except (TypeError, ValueError):
+            return None
+        if 0 <= index < len(self.line_map):
+            return self.line_map[index]
+        return None
+
+    def touches_changes(self, start_line, end_line=None):
+        """Return True if the file line span overlaps any changed range"""
+        if end_line is None or end_line < start_line:
+            end_line = start_line
+        return any(start <= end_line and start_line <= end for start, end in self.ranges)
+
+
+class DiffScope:
+    """Per-file changed line ranges used to send only diff hunks to the model"""
+
+    def __init__(self, line_ranges, context=DEFAULT_DIFF_CONTEXT, reason='changed lines'):
+        self.line_ranges = line_ranges
+        self.context = context
+        self.reason = reason
+
+    @property
+    def files(self):
+        return sorted(self.line_ranges)
+
+    def excerpt_for(self, file_path, file_content):
+        """Return the DiffExcerpt for a file, or None when the file has no changed lines"""
+        ranges = self.line_ranges.get(file_path)
+        if not ranges:
+            return None
+        return DiffExcerpt(file_content, ranges, self.context, self.reason)
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""vibot ignore rules - .gitignore / .vibotignore files and --exclude globs compiled into matchers"""
+
+import os
+import re
+
+# Files whose rules apply to their directory and everything below it
+IGNORE_FILE_NAMES = ('.gitignore', '.vibotignore')
+
+
+def translate_glob(pattern):
+    """Translate a gitignore glob into a regular expression body matching '/'-separated paths"""
+    regex = ''
+    i = 0
+    n = len(pattern)
+    while i < n:
+        char = pattern[i]
+        if char == '*':
+            if pattern.startswith('**', i):
+                # '**/' matches zero or more directories, any other '**' matches everything
+                if i + 2 < n and pattern[i + 2] == '/':
+                    regex += '(?:.*/)?'
+                    i += 3
+                else:
+                    regex += '.*'
+                    i += 2
+                continue
+            regex += '[^/]*'
+        elif char == '?':
+            regex += '[^/]'
+        elif char == '[':
+            j = i + 1
+            if j < n and pattern[j] in '!^':
+                j += 1
+            if j < n and pattern[j] == ']':
+                j += 1
+            while j < n and pattern[j] != ']':
+                j += 1
+            if j >= n:
+                regex += '\\['
+            else:
+                members = pattern[i + 1:j].replace('\\', '\\\\')
+                if members[0] in '!^':
+                    members = '^' + members[1:]
+                regex += f'[{members}]'
+                i = j
+        elif char == '\\' and i + 1 < n:
+            i += 1
+            regex += re.escape(pattern[i])
+        else:
+            regex += re.escape(char)
+        i += 1
+    return regex
+
+
+def parse_rule(line):
+    """Parse one ignore-file line into (regex, negated, directory_only), or None for blanks and comments"""
+    line = line.rstrip('\r\n')
+    if not line or line.startswith('#'):
+        return None
+
+    # Trailing spaces are ignored unless escaped
+    while line.endswith(' ') and not line.endswith('\\ '):
+        line = line[:-1]
+
+    negated = line.startswith('!')
+    if negated:
+        line = line[1:]
+
+    directory_only = line.endswith('/')
+    line = line.rstrip('/')
+    if not line:
+        return None
+
+    # A slash anywhere but the end anchors the pattern to the ignore file's directory
+    anchored = '/' in line
+    body = translate_glob(line.lstrip('/'))
+    regex = f'^{body}$' if anchored else f'^(?:.*/)?{body}$'
+    return regex, negated, directory_only
+
+
+class IgnoreFile:
+    """Compiled rules of one ignore file (or of --exclude globs) rooted at a directory"""
+
+    def __init__(self, lines, base='', prefix=''):
+        # base: directory of the rules relative to the walk root ('' for the root itself)
+        # prefix: path of the walk root relative to the rules' directory, for ignore files above the root
+        self.base = base
+        self.prefix = prefix
+        self.rules = []
+        for line in lines:
+            rule = parse_rule(line)
+            if rule is not None:
+                regex, negated, directory_only = rule
+                self.rules.append((re.compile(regex), negated, directory_only))
+        # One combined pattern rejects paths that match no rule with a single regex call
+        self.any_rule = re.compile('|'.join(f'(?:{rule.pattern})' for rule, _, _ in self.rules)) if self.rules else None
+
+    @classmethod
+    def load(cls, file_path, base='', prefix=''):
+        """Compile an ignore file, or return None if it does not exist or has no rules"""
+        try:
+            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+                ignore_file = cls(f.readlines(), base, prefix)
+        except OSError:
+            return None
+        return ignore_file if ignore_file.rules else None
+
+    def match(self, relative_path, is_dir):
+        """Return True (ignored), False (re-included) or None (no rule matches) for a walk-relative path"""
+        if self.prefix:
+            path = self.prefix + relative_path
+        elif self.base:
+            path = relative_path[len(self.base) + 1:]
+        else:
+            path = relative_path
+
+        if self.any_rule is None or not self.any_rule.match(path):
+            return None
+        # The last matching rule wins
+        for regex, negated, directory_only in reversed(self.rules):
+            if directory_only and not is_dir:
+                continue
+            if regex.match(path):
+                return not negated
+        return None
+
+
+def find_repository_root(path):
+    """Return the nearest directory at or above path that contains .git, or None"""
+    directory = os.path.abspath(path)
+    while True:
+        if os.path.exists(os.path.join(directory, '.git')):
+            return directory
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return None
+        directory = parent
+
+
+class IgnoreMatcher:
+    """Decide whether paths under a walk root are excluded by ignore files or --exclude globs
+
+    Paths are given relative to the root with '/' separators. Rules are loaded and compiled once per
+    directory; rules in deeper directories override those of their parents, as in git.
+    """
+
+    def __init__(self, root, exclude=None, use_ignore_files=True):
+        self.root = root
+        self.use_ignore_files = use_ignore_files
+        self.exclude = IgnoreFile(exclude) if exclude else None
+        self._rules = {'': self._inherited_rules() + self._load_rules('')}
+
+    def _inherited_rules(self):
+        """Load ignore files between the repository root and the walk root"""
+        if not self.use_ignore_files:
+            return []
+        root = os.path.abspath(self.root)
+        repository_root = find_repository_root(root)
+        if repository_root is None or repository_root == root:
+            return []
+
+        rules = []
+        directory = repository_root
+        for part in os.path.relpath(root, repository_root).split(os.sep):
+            prefix = os.path.relpath(root, directory).replace(os.sep, '/') + '/'
+            for name in IGNORE_FILE_NAMES:
+                ignore_file = IgnoreFile.load(os.path.join(directory, name), prefix=prefix)
+                if ignore_file is not None:
+                    rules.append(ignore_file)
+            directory = os.path.join(directory, part)
+        return rules
+
+    def _load_rules(self, relative_dir):
+        if not self.use_ignore_files:
+            return []
+        directory = os.path.join(self.root, relative_dir) if relative_dir else self.root
+        rules = []
+        for name in IGNORE_FILE_NAMES:
+            ignore_file = IgnoreFile.load(os.path.join(directory, name), base=relative_dir)
+            if ignore_file is not None:
+                rules.append(ignore_file)
+        return rules
+
+    def rules_for(self, relative_dir):
+        """Return the ignore files that apply to entries of a directory, deepest last"""
+        rules = self._rules.get(relative_dir)
+        if rules is None:
+            parent = relative_dir.rpartition('/')[0]
+            rules = self.rules_for(parent) + self._load_rules(relative_dir)
+            self._rules[relative_dir] = rules
+        return rules
+
+    def is_ignored(self, relative_path, is_dir, relative_dir=None):
+        """Return True if the entry at relative_path is excluded"""
+        if self.exclude is not None and self.exclude.match(relative_path, is_dir):
+            return True
+        if relative_dir is None:
+            relative_dir = relative_path.rpartition('/')[0]
+        for ignore_file in reversed(self.rules_for(relative_dir)):
+            ignored = ignore_file.match(relative_path, is_dir)
+            if ignored is not None:
+                return ignored
+        return False
+
+    def is_path_ignored(self, file_path):
+        """Return True if a file, or any directory containing it, is excluded"""
+        relative_path = os.path.relpath(file_path, self.root).replace(os.sep, '/')
+        if relative_path.startswith('../'):
+            return False
+        parts = relative_path.split('/')
+        for depth in range(1, len(parts)):
+            if self.is_ignored('/'.join(parts[:depth]), True):
+                return True
+        return self.is_ignored(relative_path, False)
\ No newline at end of file
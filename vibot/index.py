@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""vibot persistent trigram index - lets repeated searches read only the files that can match"""
+
+import os
+import re
+import sys
+import json
+import struct
+import hashlib
+import tempfile
+from array import array
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from .utils import Colors, read_universal_bytes, is_ascii
+from .cache import default_cache_dir
+
+# Bump when the on-disk layout or the content normalization changes
+INDEX_VERSION = 3
+
+# An index file is this magic, the header length, a JSON header and then every file's trigrams back to back
+INDEX_MAGIC = b'VIBOTIDX'
+HEADER_LENGTH = struct.Struct('<Q')
+
+# Indexing fewer changed files than this runs in-process
+PARALLEL_INDEX_MIN_FILES = 64
+
+
+def normalize_text(text):
+    """Fold case the same way for file contents and keywords
+
+    Any two strings that match exactly or case-insensitively fold to the same string; dotless i and
+    dotted capital I are mapped to i because the re module treats them as case variants of I, while
+    casefold turns dotted capital I into i and a combining dot.
+    """
+    return text.replace('İ', 'i').casefold().replace('ı', 'i')
+
+
+def normalize_content(data):
+    """Return the case-folded UTF-8 bytes of file contents read by read_universal_bytes"""
+    if is_ascii(data):
+        return data.lower()
+    return normalize_text(data.decode('utf-8', errors='ignore')).encode('utf-8')
+
+
+def extract_trigrams(data):
+    """Return the sorted array of every distinct three-byte substring, each packed into an integer"""
+    count = len(data) - 2
+    if count <= 0:
+        return array('I')
+    # Spread the three shifted copies over 4-byte slots so the trigrams are read back as integers in C
+    packed = bytearray(4 * count)
+    packed[0::4] = data[:count]
+    packed[1::4] = data[1:count + 1]
+    packed[2::4] = data[2:]
+    return array('I', sorted(set(memoryview(packed).cast('I'))))
+
+
+def contains_trigrams(file_trigrams, trigrams):
+    """Return True if a sorted trigram array contains every given trigram"""
+    size = len(file_trigrams)
+    for trigram in trigrams:
+        position = bisect_left(file_trigrams, trigram)
+        if position == size or file_trigrams[position] != trigram:
+            return False
+    return True
+
+
+def index_file(file_path):
+    """Return (file_path, trigrams) for one file, with no trigrams for binary files, or None if unreadable"""
+    try:
+        data = read_universal_bytes(file_path)
+    except OSError:
+        return None
+    if data is None:
+        return file_path, array('I')
+    return file_path, extract_trigrams(normalize_content(data))
+
+
+def index_files(file_paths):
+    """Yield index_file results, spreading large batches across all CPU cores"""
+    if len(file_paths) < PARALLEL_INDEX_MIN_FILES or (os.cpu_count() or 1) < 2:
+        yield from map(index_file, file_paths)
+        return
+    
+    with ProcessPoolExecutor() as executor:
+        yield from executor.map(index_file, file_paths, chunksize=32)
+
+
+def keyword_trigrams(keyword, regex=False):
+    """Return the trigrams every match of a keyword contains, or None if the keyword cannot be narrowed
+
+    Keywords are case-folded like file contents, so the trigrams hold with and without --ignore-case.
+    """
+    if regex:
+        # Only regular expressions without special characters are plain literals
+        if re.escape(keyword) != keyword:
+            return None
+    data = normalize_text(keyword).encode('utf-8')
+    if len(data) < 3:
+        return None
+    return extract_trigrams(data)
+
+
+def default_index_path(root, cache_dir=None):
+    """Return the index file of a search root, stored next to the AI result cache"""
+    cache_dir = os.path.abspath(os.path.expanduser(cache_dir or default_cache_dir()))
+    root_hash = hashlib.sha256(os.path.abspath(root).encode('utf-8', errors='surrogatepass')).hexdigest()
+    return os.path.join(cache_dir, 'index', root_hash[:16] + '.idx')
+
+
+def encode_index(root, files):
+    """Serialize an index's files; the trigram arrays are stored as raw bytes, so loading runs no code"""
+    entries = []
+    trigrams = array('I')
+    for file_path, (size, mtime_ns, file_trigrams) in files.items():
+        entries.append([file_path, size, mtime_ns, len(file_trigrams)])
+        trigrams.extend(file_trigrams)
+    header = json.dumps({
+        'version': INDEX_VERSION, 'root': root, 'byteorder': sys.byteorder,
+        'itemsize': trigrams.itemsize, 'files': entries
+    }).encode('utf-8')
+    return INDEX_MAGIC + HEADER_LENGTH.pack(len(header)) + header + trigrams.tobytes()
+
+
+def decode_index(data, root):
+    """Return the files of a serialized index of root, raising ValueError if it is corrupt or out of date"""
+    if not data.startswith(INDEX_MAGIC):
+        raise ValueError("not a vibot index")
+    offset = len(INDEX_MAGIC)
+    header_length, = HEADER_LENGTH.unpack_from(data, offset)
+    offset += HEADER_LENGTH.size
+    header = json.loads(data[offset:offset + header_length].decode('utf-8'))
+    offset += header_length
+    
+    trigrams = array('I')
+    if header['version'] != INDEX_VERSION or header['root'] != root:
+        raise ValueError("index of another version or root")
+    # Trigrams are packed in native byte order, so an index from another machine does not match local keywords
+    if header['byteorder'] != sys.byteorder or header['itemsize'] != trigrams.itemsize:
+        raise ValueError("index of another platform")
+    trigrams.frombytes(memoryview(data)[offset:])
+    
+    files = {}
+    position = 0
+    for file_path, size, mtime_ns, count in header['files']:
+        if not isinstance(count, int) or count < 0:
+            raise ValueError("invalid trigram count")
+        files[file_path] = (size, mtime_ns, trigrams[position:position + count])
+        position += count
+    if position != len(trigrams):
+        raise ValueError("trigram count does not match the index size")
+    return files
+
+
+class SearchIndex:
+    """On-disk trigram index of the files under a search root, updated incrementally by size and mtime
+
+    Each file keeps the sorted array of its trigrams, so a changed file is re-indexed on its own and a
+    lookup is a few binary searches per file.
+    """
+    
+    def __init__(self, root, cache_dir=None):
+        self.root = os.path.abspath(root)
+        self.index_path = default_index_path(root, cache_dir)
+        # path -> (size, mtime_ns, sorted trigram array)
+        self.files = {}
+        self.indexed = 0
+        self.candidates = 0
+        self.total = 0
+        self._changed = False
+        self._load()
+    
+    def _load(self):
+        # A missing, corrupt or foreign index file only costs a rebuild
+        try:
+            with open(self.index_path, 'rb') as f:
+                self.files = decode_index(f.read(), self.root)
+        except (OSError, ValueError, KeyError, TypeError, struct.error):
+            return
+    
+    def save(self):
+        """Write the index back to disk if it changed"""
+        if not self._changed:
+            return
+        data = encode_index(self.root, self.files)
+        try:
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.index_path), suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self.index_path)
+        except OSError:
+            return
+        self._changed = False
+    
+    def update(self, entries):
+        """Re-index the walked entries whose size or mtime changed since they were last indexed"""
+        seen = set()
+        changed = {}
+        for entry in entries:
+            file_path = os.path.abspath(entry.path)
+            seen.add(file_path)
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            record = self.files.get(file_path)
+            if record is None or record[:2] != (stat.st_size, stat.st_mtime_ns):
+                changed[file_path] = stat
+        
+        # Forget files that were deleted since the last run
+        for file_path in [file_path for file_path in self.files if file_path not in seen]:
+            if not os.path.exists(file_path):
+                del self.files[file_path]
+                self._changed = True
+        
+        for result in index_files(list(changed)):
+            if result is None:
+                continue
+            file_path, trigrams = result
+            stat = changed[file_path]
+            self.files[file_path] = (stat.st_size, stat.st_mtime_ns, trigrams)
+            self.indexed += 1
+            self._changed = True
+    
+    def may_contain(self, file_path, keyword_trigram_sets):
+        """Return True unless the index shows that a file contains none of the keywords"""
+        record = self.files.get(os.path.abspath(file_path))
+        # Files that could not be indexed are always searched
+        if record is None:
+            return True
+        return any(contains_trigrams(record[2], trigrams) for trigrams in keyword_trigram_sets)
+    
+    def select(self, entries, keywords, regex=False):
+        """Update the index from the walked entries and return the paths of the files worth searching"""
+        entries = list(entries)
+        self.update(entries)
+        self.save()
+        
+        self.total = len(entries)
+        keyword_trigram_sets = [keyword_trigrams(keyword, regex) for keyword in keywords]
+        if any(trigrams is None for trigrams in keyword_trigram_sets):
+            file_paths = [entry.path for entry in entries]
+        else:
+            file_paths = [entry.path for entry in entries if self.may_contain(entry.path, keyword_trigram_sets)]
+        self.candidates = len(file_paths)
+        return file_paths
+    
+    def print_summary(self, output=None):
+        """Print the index statistics, through a BufferedOutput if one is given"""
+        write = output.line if output is not None else print
+        write(f"\n{Colors.YELLOW}🗂️  Search Index:{Colors.RESET}")
+        write(f"  Files indexed this run: {self.indexed}")
+        write(f"  Files searched: {self.candidates} of {self.total}")
+        write(f"  Index File: {self.index_path}")
\ No newline at end of file
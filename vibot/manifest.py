@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""vibot persistent file manifest - what earlier runs learned about each file, shared by every command"""
+
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from .utils import export_binary_verdicts, import_binary_verdicts
+from .cache import default_cache_dir
+
+# Bump when the on-disk layout or the meaning of a stored field changes
+MANIFEST_VERSION = 2
+
+# Type of every field a record may hold; records with anything else are rejected on load
+FIELD_TYPES = {
+    'binary': bool,
+    'lines': int,
+    'line_stats': list,
+    'content_hash': str,
+    'partial_hash': str,
+    'file_hash': str,
+}
+
+# Manifest settings chosen on the command line, shared by every command
+manifest_options = {
+    'root': None,
+    'cache_dir': None,
+    'enabled': False,
+}
+
+_active_manifest = None
+
+
+def configure_manifest(root, cache_dir=None, enabled=True):
+    """Set the root and cache directory of the manifest, or disable it with --no-manifest"""
+    global _active_manifest
+    manifest_options['root'] = root
+    manifest_options['cache_dir'] = cache_dir
+    manifest_options['enabled'] = enabled
+    _active_manifest = None
+
+
+def get_manifest():
+    """Return the manifest of the configured root, loading it on first use, or None when disabled"""
+    global _active_manifest
+    if not manifest_options['enabled']:
+        return None
+    if _active_manifest is None:
+        _active_manifest = FileManifest(manifest_options['root'], manifest_options['cache_dir'])
+    return _active_manifest
+
+
+def save_manifest():
+    """Write the manifest back to disk if a command used it"""
+    if _active_manifest is not None:
+        _active_manifest.save()
+
+
+def stat_signature(stat):
+    """Return the (size, mtime_ns, inode) triple a manifest record is valid for"""
+    return stat.st_size, stat.st_mtime_ns, stat.st_ino
+
+
+def default_manifest_path(root, cache_dir=None):
+    """Return the manifest file of a root, stored next to the AI result cache"""
+    cache_dir = os.path.abspath(os.path.expanduser(cache_dir or default_cache_dir()))
+    root_hash = hashlib.sha256(os.path.abspath(root).encode('utf-8', errors='surrogatepass')).hexdigest()
+    return os.path.join(cache_dir, 'manifest', root_hash[:16] + '.json')
+
+
+def decode_manifest(data, root):
+    """Return the records of a parsed manifest of root, raising ValueError if it is corrupt or out of date"""
+    if not isinstance(data, dict) or data.get('version') != MANIFEST_VERSION or data.get('root') != root:
+        raise ValueError("manifest of another version or root")
+    
+    files = {}
+    for file_path, record in data['files'].items():
+        stat = tuple(record['stat'])
+        if len(stat) != 3 or not all(type(value) is int for value in stat):
+            raise ValueError("invalid manifest record")
+        for field, value in record.items():
+            if field != 'stat' and type(value) is not FIELD_TYPES.get(field):
+                raise ValueError("invalid manifest record")
+        if 'line_stats' in record:
+            line_stats = tuple(record['line_stats'])
+            if len(line_stats) != 4 or not all(value is None or type(value) is int for value in line_stats):
+                raise ValueError("invalid manifest record")
+            record['line_stats'] = line_stats
+        record['stat'] = stat
+        files[file_path] = record
+    return files
+
+
+class FileManifest:
+    """On-disk record of per-file facts under a root, each valid for one (size, mtime_ns, inode)
+
+    Records are filled in as commands compute their fields: 'binary' (the binary verdict), 'lines'
+    (line count), 'line_stats' ((lines, code, comment, blank) from --detect), 'content_hash' (the
+    hash of the decoded text the AI result cache is keyed by) and 'partial_hash' / 'file_hash' (sha256
+    of the first bytes and of the whole file, from --duplicates). A record is dropped as soon as the stat
+    from the walk no longer matches it, so a warm run only reads the files that changed.
+    """
+    
+    def __init__(self, root, cache_dir=None):
+        self.walk_root = root
+        self.root = os.path.abspath(root)
+        self.manifest_path = default_manifest_path(root, cache_dir)
+        # absolute path -> {'stat': (size, mtime_ns, inode), field: value, ...}
+        self.files = {}
+        self._seen = set()
+        self._imported = {}
+        self._changed = False
+        self._lock = threading.Lock()
+        self._load()
+    
+    def _load(self):
+        # A missing, corrupt or foreign manifest only costs reading the files again
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                self.files = decode_manifest(json.load(f), self.root)
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return
+        
+        # Binary verdicts are checked where files are opened, under the paths the walk produces
+        prefix = os.path.join(self.root, '')
+        self._imported = {
+            os.path.join(self.walk_root, file_path[len(prefix):]): record['stat'] + (record['binary'],)
+            for file_path, record in self.files.items()
+            if 'binary' in record and file_path.startswith(prefix)
+        }
+        import_binary_verdicts(self._imported)
+    
+    def save(self):
+        """Merge the binary verdicts found this run and write the manifest back to disk if it changed"""
+        for file_path, verdict in export_binary_verdicts().items():
+            if self._imported.get(file_path) == verdict:
+                continue
+            self._put(os.path.abspath(file_path), verdict[:3], {'binary': verdict[3]})
+        
+        # Forget files that were deleted since the last run
+        for file_path in [file_path for file_path in self.files if file_path not in self._seen]:
+            if not os.path.exists(file_path):
+                del self.files[file_path]
+                self._changed = True
+        
+        if not self._changed:
+            return
+        data = {'version': MANIFEST_VERSION, 'root': self.root, 'files': self.files}
+        try:
+            os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.manifest_path), suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(tmp_path, self.manifest_path)
+        except OSError:
+            return
+        self._changed = False
+    
+    def get(self, file_path, stat, field):
+        """Return a stored field of a file if its record still matches stat, else None"""
+        file_path = os.path.abspath(file_path)
+        signature = stat_signature(stat)
+        with self._lock:
+            self._seen.add(file_path)
+            record = self.files.get(file_path)
+            if record is None:
+                return None
+            if record['stat'] != signature:
+                # The file changed; nothing stored about it holds any more
+                del self.files[file_path]
+                self._changed = True
+                return None
+            return record.get(field)
+    
+    def is_known_binary(self, entry):
+        """Return True if a walked file is unchanged since an earlier run found it to be binary"""
+        try:
+            stat = entry.stat()
+        except OSError:
+            return False
+        return bool(self.get(entry.path, stat, 'binary'))
+    
+    def put(self, file_path, stat, **fields):
+        """Store fields of a file as computed for the given stat"""
+        self._put(os.path.abspath(file_path), stat_signature(stat), fields)
+    
+    def _put(self, file_path, signature, fields):
+        with self._lock:
+            self._seen.add(file_path)
+            record = self.files.get(file_path)
+            if record is None or record['stat'] != signature:
+                record = self.files[file_path] = {'stat': signature}
+            elif all(record.get(field) == value for field, value in fields.items()):
+                return
+            record.update(fields)
+            self._changed = True
\ No newline at end of file
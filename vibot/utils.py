@@ -1,7 +1,45 @@
 #!/usr/bin/env python3
 """vibot 公共工具函数"""
 
+import io
 import os
+import re
+import sys
+import threading
+
+
+# 跳过的文件扩展名
+SKIP_EXTENSIONS = {
+    '.exe', '.dll', '.so', '.dylib', '.bin', '.obj', '.o',
+    '.jpg', '.jpeg', '.png', '.gif', '.bmp', '.ico', '.svg',
+    '.mp3', '.mp4', '.avi', '.mov', '.wav', '.flac',
+    '.zip', '.tar', '.gz', '.rar', '.7z',
+    '.pdf', '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx'
+}
+
+# 跳过的文件名
+SKIP_NAMES = {
+    '.DS_Store', 'Thumbs.db', '.gitignore', '.git'
+}
+
+# 判断文件是否为二进制时读取的字节数
+SNIFF_BYTES = 8192
+
+# 非文本字节占比超过该值时视为二进制文件
+NON_TEXT_RATIO = 0.3
+
+# 文本文件中可能出现的字节：常见控制字符和所有可打印字节
+TEXT_BYTES = bytes({7, 8, 9, 10, 11, 12, 13, 27} | set(range(0x20, 0x100)) - {0x7f})
+
+# 缓冲输出攒够该字符数后一次写出
+OUTPUT_BLOCK_CHARS = 64 * 1024
+
+# ANSI 颜色代码
+ANSI_PATTERN = re.compile(r'\033\[[0-9;]*m')
+
+# 二进制判断结果缓存：路径 -> (文件大小, 修改时间, inode, 是否为二进制)
+_binary_verdicts = {}
+_binary_verdicts_lock = threading.Lock()
 
 
 class Colors:
@@ -34,21 +72,152 @@ def print_logo():
     print(logo)
 
 
+class BufferedOutput:
+    """按行缓冲输出，攒成大块后一次写出；输出不是终端时去掉 ANSI 颜色代码
+
+    decorate 表示输出是否为终端，调用方据此决定是否输出 ^ 标记等装饰行。
+    """
+    
+    def __init__(self, stream=None, block_chars=OUTPUT_BLOCK_CHARS):
+        self.stream = stream or sys.stdout
+        try:
+            self.decorate = self.stream.isatty()
+        except (AttributeError, ValueError):
+            self.decorate = False
+        self.block_chars = block_chars
+        self._parts = []
+        self._size = 0
+    
+    def line(self, text=''):
+        """写入一行"""
+        if not self.decorate:
+            text = ANSI_PATTERN.sub('', text)
+        self._parts.append(text)
+        self._parts.append('\n')
+        self._size += len(text) + 1
+        if self._size >= self.block_chars:
+            self.flush()
+    
+    def flush(self):
+        """写出缓冲区中的内容"""
+        if self._parts:
+            self.stream.write(''.join(self._parts))
+            self._parts = []
+            self._size = 0
+        self.stream.flush()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+
+
 def should_skip_file(filename):
     """判断是否应该跳过某个文件"""
-    # 跳过的文件扩展名
-    skip_extensions = {
-        '.exe', '.dll', '.so', '.dylib', '.bin', '.obj', '.o',
-        '.jpg', '.jpeg', '.png', '.gif', '.bmp', '.ico', '.svg',
-        '.mp3', '.mp4', '.avi', '.mov', '.wav', '.flac',
-        '.zip', '.tar', '.gz', '.rar', '.7z',
-        '.pdf', '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx'
-    }
-    
-    # 跳过的文件名
-    skip_names = {
-        '.DS_Store', 'Thumbs.db', '.gitignore', '.git'
-    }
-    
     _, ext = os.path.splitext(filename)
-    return ext.lower() in skip_extensions or filename in skip_names
\ No newline at end of file
+    return ext.lower() in SKIP_EXTENSIONS or filename in SKIP_NAMES
+
+
+def looks_binary(chunk):
+    """根据文件开头的字节判断内容是否为二进制：包含 NUL 字节或非文本字节占比过高"""
+    if not chunk:
+        return False
+    if b'\0' in chunk:
+        return True
+    
+    # 控制字符过多
+    if len(chunk.translate(None, TEXT_BYTES)) / len(chunk) > NON_TEXT_RATIO:
+        return True
+    
+    # 合法的 UTF-8（允许末尾被截断的多字节字符）视为文本
+    try:
+        chunk.decode('utf-8')
+        return False
+    except UnicodeDecodeError as e:
+        if e.start >= len(chunk) - 3 and e.reason == 'unexpected end of data':
+            return False
+    
+    # 非 UTF-8 内容中高位字节过多
+    high_bytes = sum(1 for byte in chunk if byte >= 0x80)
+    return high_bytes / len(chunk) > NON_TEXT_RATIO
+
+
+def _cached_verdict(file_path, stat):
+    """返回缓存的二进制判断结果；文件大小、修改时间或 inode 变化后缓存失效"""
+    with _binary_verdicts_lock:
+        verdict = _binary_verdicts.get(file_path)
+    if verdict is not None and verdict[:3] == (stat.st_size, stat.st_mtime_ns, stat.st_ino):
+        return verdict[3]
+    return None
+
+
+def _store_verdict(file_path, stat, is_binary):
+    with _binary_verdicts_lock:
+        _binary_verdicts[file_path] = (stat.st_size, stat.st_mtime_ns, stat.st_ino, is_binary)
+
+
+def export_binary_verdicts():
+    """返回本进程中得出的二进制判断结果的副本，供文件清单保存"""
+    with _binary_verdicts_lock:
+        return dict(_binary_verdicts)
+
+
+def import_binary_verdicts(verdicts):
+    """载入之前运行保存的二进制判断结果；格式与 export_binary_verdicts 相同"""
+    with _binary_verdicts_lock:
+        for file_path, verdict in verdicts.items():
+            _binary_verdicts.setdefault(file_path, verdict)
+
+
+def sniff_binary(f, file_path):
+    """判断以二进制模式打开的文件是否为二进制文件，返回 (是否为二进制, 已读取的开头字节)
+
+    命中缓存时不读取内容，返回的开头字节为空。
+    """
+    stat = os.fstat(f.fileno())
+    verdict = _cached_verdict(file_path, stat)
+    if verdict is not None:
+        return verdict, b''
+    
+    head = f.read(SNIFF_BYTES)
+    verdict = looks_binary(head)
+    _store_verdict(file_path, stat, verdict)
+    return verdict, head
+
+
+def read_binary_file(file_path):
+    """读取文件的原始字节；二进制文件只读取开头几 KB，返回 None"""
+    with open(file_path, 'rb') as f:
+        is_binary, head = sniff_binary(f, file_path)
+        if is_binary:
+            return None
+        return head + f.read()
+
+
+def read_universal_bytes(file_path):
+    """读取文件的原始字节并统一换行符为 b'\\n'（与文本模式读取一致）；二进制文件返回 None"""
+    data = read_binary_file(file_path)
+    if data is not None and b'\r' in data:
+        data = data.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+    return data
+
+
+def is_ascii(data):
+    """判断字节串是否只包含 ASCII 字符（bytes.isascii 需要 Python 3.7）"""
+    try:
+        data.decode('ascii')
+    except UnicodeDecodeError:
+        return False
+    return True
+
+
+def read_text_file(file_path):
+    """读取文本文件内容（UTF-8，忽略无法解码的字节）；二进制文件只读取开头几 KB，返回 None"""
+    with open(file_path, 'rb') as f:
+        is_binary, _ = sniff_binary(f, file_path)
+        if is_binary:
+            return None
+        
+        f.seek(0)
+        return io.TextIOWrapper(f, encoding='utf-8', errors='ignore').read()
\ No newline at end of file